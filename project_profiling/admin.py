@@ -2,7 +2,7 @@ from django.contrib import admin
 from .models import (
     ProjectProfile, ProjectBudget, ProjectCost, ProjectStaging,
     ProjectType, Expense, SubcontractorExpense, SubcontractorPayment,
-    MobilizationCost, ProjectDocument
+    MobilizationCost, ProjectDocument, BOQCatalogItem
 )
 
 @admin.register(ProjectProfile)
@@ -309,4 +309,11 @@ class ProjectDocumentAdmin(admin.ModelAdmin):
 
     def file_size_display(self, obj):
         return f"{obj.file_size_mb} MB"
-    file_size_display.short_description = 'File Size'
\ No newline at end of file
+    file_size_display.short_description = 'File Size'
+
+@admin.register(BOQCatalogItem)
+class BOQCatalogItemAdmin(admin.ModelAdmin):
+    list_display = ("name", "normalized_name", "default_uom", "section_category", "is_active", "created_at")
+    list_filter = ("is_active", "section_category")
+    search_fields = ("name", "normalized_name")
+    ordering = ("name",)
@@ -0,0 +1,291 @@
+"""
+BOQ Item Catalog Matching
+Resolves free-text BOQ descriptions to canonical BOQCatalogItem entries using
+token-set (Dice) similarity over an in-memory inverted index
+"""
+
+import logging
+import math
+import re
+import threading
+from collections import Counter
+from datetime import timedelta
+from typing import Dict, FrozenSet, Iterable, List, Optional, Tuple
+
+from django.db import transaction
+from django.utils import timezone
+
+from .cache_versions import bump_version, get_version
+from .models import BOQCatalogItem
+
+logger = logging.getLogger(__name__)
+
+VERSION_NAME = 'boq_catalog'
+# New entries are picked up by creation time; the overlap covers rows whose
+# transaction committed after later-created rows were already seen
+CATCH_UP_OVERLAP = timedelta(minutes=5)
+
+MATCH_THRESHOLD = 0.75
+
+# Unit spellings folded to one token before punctuation is stripped
+_UNIT_PATTERNS = [
+    (re.compile(r'(\d+(?:\.\d+)?)\s*(?:"|\'\'|”|inches\b|inch\b|in\b)'), r' \1in '),
+    (re.compile(r'(\d+(?:\.\d+)?)\s*(mm|cm|m|kg|ft)\b'), r' \1\2 '),
+    (re.compile(r'\bsq\.?\s*m\.?(?=\W|$)|\bm2\b|\bsqm\b'), ' sqm '),
+    (re.compile(r'\bcu\.?\s*m\.?(?=\W|$)|\bm3\b|\bcum\b'), ' cum '),
+    (re.compile(r'\blin\.?\s*m\.?(?=\W|$)|\blm\b'), ' lm '),
+    (re.compile(r'\bpcs\b|\bpc\b|\bpieces?\b'), ' pc '),
+    (re.compile(r'\bkgs\b'), ' kg '),
+]
+_NON_TOKEN = re.compile(r'[^a-z0-9.]+')
+_STRAY_DOTS = re.compile(r'(?<!\d)\.|\.(?!\d)')
+
+STOPWORDS = frozenset({'a', 'an', 'and', 'the', 'of', 'for', 'with', 'to', 'in', 'on', 'at', 'by', 'per', 'w'})
+
+
+def _stem(token: str) -> str:
+    if token[0].isdigit():
+        return token
+    if token.endswith('ing') and len(token) > 5:
+        return token[:-3]
+    if token.endswith('s') and len(token) > 3 and not token.endswith('ss'):
+        return token[:-1]
+    return token
+
+
+def tokenize(description) -> FrozenSet[str]:
+    """Normalize case, units and punctuation, then return the description's token set"""
+    text = str(description or '').lower()
+    for pattern, replacement in _UNIT_PATTERNS:
+        text = pattern.sub(replacement, text)
+    text = _STRAY_DOTS.sub(' ', _NON_TOKEN.sub(' ', text))
+    return frozenset(_stem(token) for token in text.split() if token not in STOPWORDS)
+
+
+def canonical_key(tokens: FrozenSet[str]) -> str:
+    return ' '.join(sorted(tokens))[:255]
+
+
+class CatalogMatcher:
+    """
+    Inverted index from token to catalog entries.
+
+    Candidates are generated with prefix filtering. Tokens are ordered rarest first
+    (document frequency when the index was built; tokens first seen later sort before
+    all of them). For a Dice threshold t, an entry of n tokens is only posted under its
+    first n - ceil(t*n / (2 - t)) + 1 tokens and a query probes its own prefix of that
+    length; any pair scoring at least t shares a prefix token. Postings are keyed by
+    (token, entry size, token position), so only entries whose size, and whose tokens
+    left after the first shared one, can still reach the overlap needed for t are
+    visited; exact Dice is computed for those.
+    """
+
+    def __init__(self, version: int = 0, threshold: float = MATCH_THRESHOLD):
+        self.version = version
+        self.threshold = threshold
+        # (token, entry size, token position in the entry) -> entry ids
+        self.postings: Dict[Tuple[str, int, int], List[int]] = {}
+        self.tokens: Dict[int, FrozenSet[str]] = {}
+        self.by_key: Dict[str, int] = {}
+        # Fixed at build time so entries added later use the same order as queries
+        self.rank: Dict[str, int] = {}
+        self.synced_at = None
+
+    @classmethod
+    def build(cls, version: int) -> 'CatalogMatcher':
+        matcher = cls(version)
+        matcher.synced_at = timezone.now()
+        entries = [
+            (item_id, frozenset(normalized_name.split()))
+            for item_id, normalized_name in BOQCatalogItem.objects.filter(is_active=True).values_list('id', 'normalized_name')
+        ]
+        frequency = Counter(token for _, tokens in entries for token in tokens)
+        matcher.rank = {token: rank for rank, (token, _) in enumerate(sorted(frequency.items(), key=lambda kv: (kv[1], kv[0])))}
+        for item_id, tokens in entries:
+            matcher.add(item_id, tokens)
+        return matcher
+
+    def catch_up(self):
+        """Add active entries created since the last sync (by any process)"""
+        now = timezone.now()
+        recent = BOQCatalogItem.objects.filter(
+            is_active=True, created_at__gte=self.synced_at - CATCH_UP_OVERLAP
+        ).values_list('id', flat=True)
+        missing = [item_id for item_id in recent if item_id not in self.tokens]
+        if missing:
+            for item_id, normalized_name in BOQCatalogItem.objects.filter(id__in=missing).values_list('id', 'normalized_name'):
+                self.add(item_id, frozenset(normalized_name.split()))
+        self.synced_at = now
+
+    def _prefix(self, tokens: FrozenSet[str]) -> List[str]:
+        size = len(tokens)
+        min_overlap = math.ceil(self.threshold * size / (2 - self.threshold))
+        ordered = sorted(tokens, key=lambda token: (self.rank.get(token, -1), token))
+        return ordered[:size - min_overlap + 1]
+
+    def add(self, item_id: int, tokens: FrozenSet[str]):
+        if item_id in self.tokens:
+            return
+        self.tokens[item_id] = tokens
+        self.by_key.setdefault(canonical_key(tokens), item_id)
+        size = len(tokens)
+        for position, token in enumerate(self._prefix(tokens)):
+            self.postings.setdefault((token, size, position), []).append(item_id)
+
+    def match(self, tokens: FrozenSet[str]) -> Tuple[Optional[int], float]:
+        """Best catalog id for a token set and its Dice score, or (None, 0.0)"""
+        if not tokens:
+            return None, 0.0
+        exact = self.by_key.get(canonical_key(tokens))
+        if exact is not None:
+            return exact, 1.0
+
+        size = len(tokens)
+        threshold = self.threshold
+        min_size = math.ceil(threshold * size / (2 - threshold))
+        max_size = math.floor((2 - threshold) * size / threshold)
+
+        postings, entries = self.postings, self.tokens
+        seen = set()
+        best_id, best_score = None, 0.0
+        for query_position, token in enumerate(self._prefix(tokens)):
+            for item_size in range(min_size, max_size + 1):
+                required = math.ceil(threshold * (size + item_size) / 2 - 1e-9)
+                if size - query_position < required:
+                    continue
+                # At a pair's first shared token, only the tokens from there on can overlap
+                for position in range(item_size - required + 1):
+                    for item_id in postings.get((token, item_size, position), ()):
+                        if item_id in seen:
+                            continue
+                        seen.add(item_id)
+                        score = 2 * len(tokens & entries[item_id]) / (size + item_size)
+                        if score > best_score or (score == best_score and best_id is not None and item_id < best_id):
+                            best_id, best_score = item_id, score
+        if best_score >= self.threshold:
+            return best_id, best_score
+        return None, 0.0
+
+
+_matcher: Optional[CatalogMatcher] = None
+_lock = threading.Lock()
+
+
+def get_matcher() -> CatalogMatcher:
+    """
+    The live matcher. Edits and deletes (version bumps) rebuild it; entries created
+    since the last call, here or in another process, are added in place.
+    """
+    global _matcher
+    version = get_version(VERSION_NAME)
+    with _lock:
+        if _matcher is None or _matcher.version != version:
+            _matcher = CatalogMatcher.build(version)
+            logger.debug("Built BOQ catalog matcher (%s items)", len(_matcher.tokens))
+        else:
+            _matcher.catch_up()
+        return _matcher
+
+
+def invalidate_matcher():
+    """Rebuild every process's matcher after catalog edits or deletes"""
+    global _matcher
+    bump_version(VERSION_NAME)
+    _matcher = None
+
+
+def _add_to_matcher(entries: Dict[int, FrozenSet[str]]):
+    with _lock:
+        if _matcher is not None:
+            for item_id, tokens in entries.items():
+                _matcher.add(item_id, tokens)
+
+
+def _drop_matcher():
+    """Rebuild this process's matcher on next use, without touching the shared version"""
+    global _matcher
+    with _lock:
+        _matcher = None
+
+
+def resolve_descriptions(
+    lines: Iterable[Tuple[str, str, str]], create_missing: bool = True
+) -> List[Optional[int]]:
+    """
+    Bulk pass over (description, uom, section_category) lines, returning a catalog id
+    per line (None for empty descriptions). Unmatched lines become new catalog entries;
+    a second in-memory index over those lets later lines of the same pass match them.
+
+    New entries are inserted in the caller's transaction, so call this inside it:
+    a failed sync then leaves no catalog rows behind.
+    """
+    lines = list(lines)
+    for attempt in range(2):
+        results, new_items, new_lines, matched = _match_lines(lines, get_matcher(), create_missing)
+        # A caught-up entry whose transaction rolled back no longer exists
+        stale = matched - set(BOQCatalogItem.objects.filter(id__in=matched).values_list('id', flat=True)) if matched else set()
+        if not stale:
+            break
+        logger.warning("BOQ catalog matcher held %s missing entries; rebuilding", len(stale))
+        _drop_matcher()
+
+    if new_items:
+        # ignore_conflicts: another process may have created the same entry meanwhile
+        BOQCatalogItem.objects.bulk_create(new_items, batch_size=1000, ignore_conflicts=True)
+        ids = dict(BOQCatalogItem.objects.filter(
+            normalized_name__in=[item.normalized_name for item in new_items]
+        ).values_list('normalized_name', 'id'))
+        for new_index, indexes in new_lines.items():
+            for index in indexes:
+                results[index] = ids.get(new_items[new_index].normalized_name)
+
+        # Extend the live matcher once the entries are committed; other processes catch up
+        created = {ids[name]: frozenset(name.split()) for name in ids}
+        transaction.on_commit(lambda: _add_to_matcher(created))
+
+    logger.debug("Resolved %s BOQ lines against the catalog (%s new entries)", len(lines), len(new_items))
+    return results
+
+
+def _match_lines(lines: List[Tuple[str, str, str]], matcher: CatalogMatcher, create_missing: bool):
+    results: List[Optional[int]] = [None] * len(lines)
+    resolved: Dict[FrozenSet[str], Tuple[str, int]] = {}
+
+    # New entries of this pass, indexed by their position in `new_items`
+    session = CatalogMatcher(threshold=matcher.threshold)
+    session.rank = matcher.rank
+    new_items: List[BOQCatalogItem] = []
+    new_lines: Dict[int, List[int]] = {}
+
+    for index, (description, uom, category) in enumerate(lines):
+        tokens = tokenize(description)
+        if not tokens:
+            continue
+
+        if tokens not in resolved:
+            item_id, score = matcher.match(tokens)
+            new_index, new_score = session.match(tokens)
+            if new_index is not None and new_score > score:
+                resolved[tokens] = ('new', new_index)
+            elif item_id is not None:
+                resolved[tokens] = ('catalog', item_id)
+            elif create_missing:
+                session.add(len(new_items), tokens)
+                resolved[tokens] = ('new', len(new_items))
+                new_items.append(BOQCatalogItem(
+                    name=str(description).strip()[:255],
+                    normalized_name=canonical_key(tokens),
+                    default_uom=str(uom or '').strip()[:50],
+                    section_category=str(category or 'General')[:100],
+                ))
+            else:
+                resolved[tokens] = ('none', 0)
+
+        kind, value = resolved[tokens]
+        if kind == 'catalog':
+            results[index] = value
+        elif kind == 'new':
+            new_lines.setdefault(value, []).append(index)
+
+    matched = {value for kind, value in resolved.values() if kind == 'catalog'}
+    return results, new_items, new_lines, matched
@@ -0,0 +1,221 @@
+"""
+BOQ Item Rows
+Keeps the relational BOQItem table in step with ProjectProfile.boq_items and
+answers cross-project BOQ questions with grouped SQL
+"""
+
+import hashlib
+import json
+import logging
+import re
+from decimal import Decimal, InvalidOperation
+from typing import Dict, Tuple
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import Avg, Count, Max, Min, Sum
+
+from .boq_catalog import resolve_descriptions
+from .models import BOQItem, ProjectProfile
+from .unit_rates import refresh_unit_rates
+
+logger = logging.getLogger(__name__)
+
+_NON_WORD = re.compile(r'[^a-z0-9]+')
+
+COST_FIELDS = ['unit_cost', 'total_cost', 'material_cost', 'labor_cost', 'equipment_cost', 'subcontractor_cost']
+# Content that identifies a revision of a line; position is excluded so reordering is not a change
+ROW_HASH_FIELDS = ['item_number', 'description', 'section', 'section_category', 'uom', 'quantity'] + COST_FIELDS
+
+DEFAULT_SCOPE_NAME = 'General Items'
+# Budget category of a BOQ line: the first non-zero cost component, Materials when none is
+BUDGET_CATEGORY_FIELDS = [
+    ('material_cost', 'MAT'),
+    ('labor_cost', 'LAB'),
+    ('equipment_cost', 'EQU'),
+    ('subcontractor_cost', 'SUB'),
+]
+
+
+def boq_digest(boq_items) -> str:
+    """Version of a BOQ: hash of its canonical JSON"""
+    payload = json.dumps(boq_items or [], sort_keys=True, cls=DjangoJSONEncoder)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+
+def normalize_description(description) -> str:
+    """Lowercase, punctuation-free, single-spaced description used for grouping"""
+    return _NON_WORD.sub(' ', str(description or '').lower()).strip()[:255]
+
+
+def row_hash(row: BOQItem) -> str:
+    """Content hash of one BOQ line; an unchanged line hashes the same in every revision"""
+    payload = '\x1f'.join(str(getattr(row, field)) for field in ROW_HASH_FIELDS)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+
+def row_key(row: BOQItem) -> Tuple[str, str]:
+    """Identity of a line across revisions: its section plus item number (description when unnumbered)"""
+    return row.section.strip().lower(), row.item_number.strip().lower() or row.normalized_description
+
+
+def scope_name(section) -> str:
+    """ProjectScope name a BOQ section maps to"""
+    return (section or DEFAULT_SCOPE_NAME).strip()
+
+
+def budget_category(item) -> str:
+    """ProjectBudget category of a BOQ line, given as a dict or a BOQItem"""
+    get = item.get if isinstance(item, dict) else lambda field, default=0: getattr(item, field, default)
+    for field, category in BUDGET_CATEGORY_FIELDS:
+        if float(get(field, 0) or 0) > 0:
+            return category
+    return 'MAT'
+
+
+def section_weights(section_costs: Dict[str, float]) -> Dict[str, float]:
+    """Scope weights proportional to section cost, rounded to 2 places and summing to exactly 100"""
+    total_cost = sum(section_costs.values())
+    weights = {
+        section: (cost / total_cost) * 100 if total_cost > 0 else 0
+        for section, cost in section_costs.items()
+    }
+    weight_sum = sum(weights.values())
+    if weight_sum > 0:
+        normalization_factor = 100 / weight_sum
+        for section in weights:
+            weights[section] = round(weights[section] * normalization_factor, 2)
+
+        # Put the rounding remainder on the largest weight
+        difference = 100.0 - sum(weights.values())
+        if abs(difference) > 0.01:
+            largest_section = max(weights.keys(), key=lambda k: weights[k])
+            weights[largest_section] = round(weights[largest_section] + difference, 2)
+    return weights
+
+
+def _decimal(value, places: str = '0.01') -> Decimal:
+    try:
+        return Decimal(str(value or 0)).quantize(Decimal(places))
+    except (InvalidOperation, ValueError):
+        return Decimal('0')
+
+
+def build_boq_item(project: ProjectProfile, position: int, item: Dict) -> BOQItem:
+    row = BOQItem(
+        project=project,
+        project_type_id=project.project_type_id,
+        position=position,
+        item_number=str(item.get('item_number') or '')[:50],
+        description=str(item.get('description') or ''),
+        normalized_description=normalize_description(item.get('description')),
+        section=str(item.get('section') or '')[:255],
+        section_category=str(item.get('section_category') or 'General')[:100],
+        uom=str(item.get('uom') or '').strip()[:50],
+        quantity=_decimal(item.get('quantity'), '0.0001'),
+    )
+    for field in COST_FIELDS:
+        setattr(row, field, _decimal(item.get(field)))
+    row.row_hash = row_hash(row)
+    return row
+
+
+def sync_boq_items(project: ProjectProfile, force: bool = False) -> bool:
+    """
+    Rewrite the project's BOQItem rows from its boq_items JSON when the content hash changed.
+    Returns True if rows were rewritten.
+    """
+    digest = boq_digest(project.boq_items)
+    if not force and digest == project.boq_version:
+        return False
+
+    rows = [
+        build_boq_item(project, position, item)
+        for position, item in enumerate(project.boq_items or [])
+        if isinstance(item, dict)
+    ]
+    with transaction.atomic():
+        # New catalog entries roll back with the rows that reference them
+        catalog_ids = resolve_descriptions((row.description, row.uom, row.section_category) for row in rows)
+        for row, catalog_id in zip(rows, catalog_ids):
+            row.catalog_item_id = catalog_id
+
+        existing = BOQItem.objects.filter(project=project)
+        affected = set(existing.exclude(catalog_item__isnull=True).values_list('catalog_item_id', flat=True))
+        affected.update(catalog_id for catalog_id in catalog_ids if catalog_id)
+        existing.delete()
+        BOQItem.objects.bulk_create(rows, batch_size=1000)
+        ProjectProfile.objects.filter(pk=project.pk).update(boq_version=digest)
+        # Only the unit rates of items this BOQ touched (before or after) are recomputed
+        transaction.on_commit(lambda: refresh_unit_rates(affected))
+    project.boq_version = digest
+
+    logger.info("Synced %s BOQ item rows for project %s", len(rows), project.pk)
+    return True
+
+
+def project_type_boq_breakdown(project_type_id: int, common_limit: int = 10, rate_limit: int = 20) -> Dict:
+    """
+    Category totals, most common items and unit-rate statistics across every project
+    of a type, each from one GROUP BY query.
+    """
+    items = BOQItem.objects.filter(project_type_id=project_type_id)
+    totals = items.aggregate(
+        project_count=Count('project', distinct=True),
+        item_count=Count('id'),
+    )
+    project_count = totals['project_count']
+    if not project_count:
+        return {'total_projects_analyzed': 0, 'total_items_found': 0}
+
+    categories = {}
+    for row in (items.values('section_category')
+                .annotate(category_total=Sum('total_cost'), item_count=Count('id'),
+                          project_count=Count('project', distinct=True))
+                .order_by('-category_total')):
+        total_cost = float(row['category_total'] or 0)
+        categories[row['section_category']] = {
+            'total_cost': total_cost,
+            'item_count': row['item_count'],
+            'project_count': row['project_count'],
+            'avg_cost': total_cost / project_count,
+            'avg_item_cost': total_cost / row['item_count'] if row['item_count'] else 0,
+        }
+
+    # Lines are grouped by canonical catalog item, so differently worded lines count together
+    common_items = [{
+        'catalog_item_id': row['catalog_item_id'],
+        'description': row['catalog_item__name'],
+        'category': row['sample_category'],
+        'count': row['count'],
+        'project_count': row['project_count'],
+        'total_cost': float(row['item_total'] or 0),
+        'avg_cost': float(row['item_average'] or 0),
+    } for row in (items.filter(catalog_item__isnull=False)
+                  .values('catalog_item_id', 'catalog_item__name')
+                  .annotate(sample_category=Min('section_category'),
+                            count=Count('id'), project_count=Count('project', distinct=True),
+                            item_total=Sum('total_cost'), item_average=Avg('total_cost'))
+                  .order_by('-count', '-item_total')[:common_limit])]
+
+    unit_rates = [{
+        'catalog_item_id': row['catalog_item_id'],
+        'description': row['catalog_item__name'],
+        'uom': row['uom'],
+        'samples': row['samples'],
+        'avg_unit_cost': float(row['avg_unit_cost'] or 0),
+        'min_unit_cost': float(row['min_unit_cost'] or 0),
+        'max_unit_cost': float(row['max_unit_cost'] or 0),
+    } for row in (items.filter(catalog_item__isnull=False, unit_cost__gt=0)
+                  .values('catalog_item_id', 'catalog_item__name', 'uom')
+                  .annotate(samples=Count('id'), avg_unit_cost=Avg('unit_cost'),
+                            min_unit_cost=Min('unit_cost'), max_unit_cost=Max('unit_cost'))
+                  .order_by('-samples')[:rate_limit])]
+
+    return {
+        'categories': categories,
+        'common_items': common_items,
+        'unit_rates': unit_rates,
+        'total_projects_analyzed': project_count,
+        'total_items_found': totals['item_count'],
+    }
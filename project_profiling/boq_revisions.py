@@ -0,0 +1,329 @@
+"""
+BOQ Revisions
+Diffs a revised BOQ against the project's stored BOQItem rows by row hash and
+applies only the added, removed and changed lines to the rows, the scopes and
+budgets of the affected sections and the project's cost learning records
+"""
+
+import logging
+from collections import defaultdict, deque
+from decimal import Decimal
+from typing import Dict, List, NamedTuple, Set, Tuple
+
+from django.db import transaction
+from django.db.models import Case, CharField, F, Sum, Value, When
+
+from .boq_catalog import resolve_descriptions
+from .boq_items import (
+    BUDGET_CATEGORY_FIELDS, COST_FIELDS, boq_digest, build_boq_item, row_hash, row_key,
+    scope_name, section_weights,
+)
+from .models import BOQItem, ProjectProfile
+from .unit_rates import refresh_unit_rates
+
+logger = logging.getLogger(__name__)
+
+# Changed lines listed individually in the summary; counts and totals always cover all of them
+MAX_LISTED_CHANGES = 50
+# Shifted rows are parked above this while positions move, so shifted ranges never overlap
+POSITION_PARKING_OFFSET = 10_000_000
+
+ROW_UPDATE_FIELDS = [
+    'position', 'item_number', 'description', 'normalized_description', 'section',
+    'section_category', 'uom', 'quantity', 'row_hash', 'catalog_item', 'project_type',
+] + COST_FIELDS
+
+# project cost breakdown key -> BOQ item field, as stored on approval
+BREAKDOWN_FIELDS = {
+    'materials': 'material_cost',
+    'labor': 'labor_cost',
+    'equipment': 'equipment_cost',
+    'subcontractor': 'subcontractor_cost',
+}
+
+
+class BOQDiff(NamedTuple):
+    added: List[BOQItem]                        # unsaved rows of the revision
+    removed: List[BOQItem]                      # stored rows with no counterpart
+    changed: List[Tuple[BOQItem, BOQItem]]      # (stored row, revised row)
+    moved: List[Tuple[BOQItem, int]]            # (stored row, new position) for unchanged lines that shifted
+    unhashed: List[BOQItem]                     # unchanged rows synced before row hashes existed
+    unchanged: int
+    previous_sections: Set[str]                 # scope names of the stored BOQ
+
+
+def diff_boq(project: ProjectProfile, boq_items: List[Dict]) -> BOQDiff:
+    """
+    Match revised lines to stored rows by (section, item number); duplicates pair up
+    in order. A matched line whose row hash differs is changed.
+    """
+    revised = [
+        build_boq_item(project, position, item)
+        for position, item in enumerate(boq_items or [])
+        if isinstance(item, dict)
+    ]
+
+    stored = defaultdict(deque)
+    previous_sections = set()
+    for row in BOQItem.objects.filter(project=project).order_by('position'):
+        stored[row_key(row)].append(row)
+        previous_sections.add(scope_name(row.section))
+
+    added, changed, moved, unhashed = [], [], [], []
+    unchanged = 0
+    for row in revised:
+        candidates = stored.get(row_key(row))
+        if not candidates:
+            added.append(row)
+            continue
+
+        previous = candidates.popleft()
+        # Rows synced before row hashes existed are hashed on the fly
+        if (previous.row_hash or row_hash(previous)) != row.row_hash:
+            changed.append((previous, row))
+            continue
+
+        unchanged += 1
+        if previous.position != row.position:
+            moved.append((previous, row.position))
+        if not previous.row_hash:
+            previous.row_hash = row.row_hash
+            unhashed.append(previous)
+
+    removed = [row for rows in stored.values() for row in rows]
+    return BOQDiff(added, removed, changed, moved, unhashed, unchanged, previous_sections)
+
+
+def revision_summary(diff: BOQDiff) -> Dict:
+    """Change counts, cost delta per section and the first changed lines, for display"""
+    section_deltas = defaultdict(Decimal)
+    changes = []
+
+    def describe(change: str, previous, revised):
+        row = revised or previous
+        section = scope_name(row.section)
+        old_total = previous.total_cost if previous else Decimal('0')
+        new_total = revised.total_cost if revised else Decimal('0')
+        if previous and revised and scope_name(previous.section) != section:
+            section_deltas[scope_name(previous.section)] -= old_total
+            section_deltas[section] += new_total
+        else:
+            section_deltas[section] += new_total - old_total
+        if len(changes) < MAX_LISTED_CHANGES:
+            changes.append({
+                'change': change,
+                'item_number': row.item_number,
+                'description': row.description[:200],
+                'section': section,
+                'old_total': str(old_total),
+                'new_total': str(new_total),
+            })
+
+    for previous, revised in diff.changed:
+        describe('changed', previous, revised)
+    for revised in diff.added:
+        describe('added', None, revised)
+    for previous in diff.removed:
+        describe('removed', previous, None)
+
+    cost_delta = sum(section_deltas.values(), Decimal('0'))
+    return {
+        'added': len(diff.added),
+        'removed': len(diff.removed),
+        'changed': len(diff.changed),
+        'unchanged': diff.unchanged,
+        'cost_delta': str(cost_delta),
+        'section_deltas': [
+            {'section': section, 'delta': str(delta)}
+            for section, delta in sorted(section_deltas.items(), key=lambda entry: -abs(entry[1]))
+            if delta
+        ],
+        'changes': changes,
+        'changes_truncated': len(diff.changed) + len(diff.added) + len(diff.removed) > len(changes),
+    }
+
+
+def apply_boq_revision(project: ProjectProfile, boq_items: List[Dict], dry_run: bool = False) -> Dict:
+    """
+    Diff a revised BOQ against the stored one and, unless dry_run, write only what changed.
+    Returns the change summary.
+    """
+    diff = diff_boq(project, boq_items)
+    summary = revision_summary(diff)
+    summary['dry_run'] = dry_run
+    if dry_run:
+        return summary
+
+    revised_rows = [revised for _, revised in diff.changed] + diff.added
+    for previous, revised in diff.changed:
+        revised.pk = previous.pk
+
+    affected_sections = {scope_name(row.section) for row in revised_rows + diff.removed}
+    affected_sections.update(scope_name(previous.section) for previous, _ in diff.changed)
+
+    totals = _boq_totals(boq_items)
+    with transaction.atomic():
+        # New catalog entries roll back with the rows that reference them
+        catalog_ids = resolve_descriptions((row.description, row.uom, row.section_category) for row in revised_rows)
+        for row, catalog_id in zip(revised_rows, catalog_ids):
+            row.catalog_item_id = catalog_id
+
+        affected_catalog_ids = {row.catalog_item_id for row in revised_rows if row.catalog_item_id}
+        affected_catalog_ids.update(
+            row.catalog_item_id for row in diff.removed + [previous for previous, _ in diff.changed]
+            if row.catalog_item_id
+        )
+
+        BOQItem.objects.filter(pk__in=[row.pk for row in diff.removed]).delete()
+        _shift_positions(project, diff.moved)
+        BOQItem.objects.bulk_update([revised for _, revised in diff.changed], ROW_UPDATE_FIELDS, batch_size=500)
+        BOQItem.objects.bulk_update(diff.unhashed, ['row_hash'], batch_size=500)
+        BOQItem.objects.bulk_create(diff.added, batch_size=1000)
+
+        # Queryset update, so the post_save full resync does not run
+        version = boq_digest(boq_items)
+        ProjectProfile.objects.filter(pk=project.pk).update(
+            boq_items=boq_items,
+            boq_version=version,
+            boq_file_processed=True,
+            extracted_total_cost=totals['total_cost'],
+            extracted_cost_breakdown=totals['breakdown'],
+        )
+        if affected_sections:
+            _update_scopes_and_budgets(project, affected_sections, diff.previous_sections)
+        if diff.added or diff.removed or diff.changed:
+            _update_learning_records(project, totals)
+        transaction.on_commit(lambda: refresh_unit_rates(affected_catalog_ids))
+
+    project.boq_items = boq_items
+    project.boq_version = version
+    project.extracted_total_cost = totals['total_cost']
+    project.extracted_cost_breakdown = totals['breakdown']
+
+    logger.info(
+        "Applied BOQ revision to project %s: %s added, %s removed, %s changed, %s unchanged",
+        project.pk, summary['added'], summary['removed'], summary['changed'], summary['unchanged']
+    )
+    return summary
+
+
+def _shift_positions(project: ProjectProfile, moved: List[Tuple[BOQItem, int]]):
+    """
+    Renumber unchanged rows that shifted. An insertion or deletion shifts every row after
+    it by the same amount, so rows are moved in runs of consecutive positions with one
+    UPDATE per run: O(edits) statements rather than one row update per shifted line.
+    """
+    runs = []
+    for row, position in sorted(moved, key=lambda entry: entry[0].position):
+        delta = position - row.position
+        if runs and runs[-1][1] == row.position - 1 and runs[-1][2] == delta:
+            runs[-1][1] = row.position
+        else:
+            runs.append([row.position, row.position, delta])
+
+    rows = BOQItem.objects.filter(project=project)
+    for first, last, delta in runs:
+        rows.filter(position__gte=first, position__lte=last).update(
+            position=F('position') + (POSITION_PARKING_OFFSET + delta)
+        )
+    if runs:
+        rows.filter(position__gte=POSITION_PARKING_OFFSET).update(
+            position=F('position') - POSITION_PARKING_OFFSET
+        )
+
+
+def _boq_totals(boq_items: List[Dict]) -> Dict:
+    """Project total and cost breakdown in the form stored on approval"""
+    def total(field):
+        return sum(float(item.get(field) or 0) for item in boq_items if isinstance(item, dict))
+
+    return {
+        'total_cost': Decimal(str(round(total('total_cost'), 2))),
+        'breakdown': {key: total(field) for key, field in BREAKDOWN_FIELDS.items()},
+    }
+
+
+def _update_scopes_and_budgets(project: ProjectProfile, affected_sections: Set[str], previous_sections: Set[str]):
+    """
+    Re-weight the BOQ scopes and recompute the budgets of the affected sections only.
+    Scopes not created from this BOQ (no matching section) are left alone.
+    """
+    from scheduling.models import ProjectScope
+    from .models import ProjectBudget
+
+    scopes = {}
+    for scope in ProjectScope.objects.filter(project=project).order_by('id'):
+        scopes.setdefault(scope.name, scope)
+    if not scopes:
+        # Scopes are created from the BOQ on approval; nothing to update before that
+        return
+
+    # Every weight depends on the total, but section sums come from one grouped query
+    section_costs = defaultdict(float)
+    for row in BOQItem.objects.filter(project=project).values('section').annotate(cost=Sum('total_cost')):
+        section_costs[scope_name(row['section'])] += float(row['cost'] or 0)
+    weights = section_weights(section_costs)
+
+    reweighted = []
+    for name in previous_sections | set(weights):
+        scope = scopes.get(name)
+        weight = Decimal(str(weights.get(name, 0))).quantize(Decimal('0.01'))
+        if scope is not None and scope.weight != weight:
+            scope.weight = weight
+            reweighted.append(scope)
+    ProjectScope.objects.bulk_update(reweighted, ['weight'])
+    new_scopes = ProjectScope.objects.bulk_create([
+        ProjectScope(project=project, name=name, weight=weight)
+        for name, weight in weights.items()
+        if name not in scopes
+    ])
+    scopes.update((scope.name, scope) for scope in new_scopes)
+
+    category = Case(
+        *[When(**{f'{field}__gt': 0}, then=Value(code)) for field, code in BUDGET_CATEGORY_FIELDS],
+        default=Value('MAT'),
+        output_field=CharField(),
+    )
+    category_totals = defaultdict(Decimal)
+    for row in (BOQItem.objects.filter(project=project, total_cost__gt=0)
+                .annotate(category=category)
+                .values('section', 'category')
+                .annotate(amount=Sum('total_cost'))):
+        name = scope_name(row['section'])
+        if name in affected_sections:
+            category_totals[(name, row['category'])] += row['amount'] or Decimal('0')
+
+    ProjectBudget.objects.bulk_create(
+        [
+            ProjectBudget(project=project, scope=scopes[name], category=code, planned_amount=amount)
+            for (name, code), amount in category_totals.items()
+        ],
+        update_conflicts=True,
+        unique_fields=['scope', 'category'],
+        update_fields=['planned_amount', 'updated_at'],
+    )
+
+    # BOQ-derived categories that no longer have lines in an affected section drop to zero
+    affected_scope_ids = [scopes[name].pk for name in affected_sections if name in scopes]
+    emptied = [
+        budget_id
+        for budget_id, scope_id, code, name in ProjectBudget.objects.filter(
+            scope_id__in=affected_scope_ids, category__in=[code for _, code in BUDGET_CATEGORY_FIELDS]
+        ).values_list('id', 'scope_id', 'category', 'scope__name')
+        if (name, code) not in category_totals
+    ]
+    ProjectBudget.objects.filter(pk__in=emptied).update(planned_amount=0)
+
+
+def _update_learning_records(project: ProjectProfile, totals: Dict):
+    """Carry the revised totals into the cost history records this project contributed"""
+    from .models import ProjectTypeCostHistory
+
+    breakdown = totals['breakdown']
+    for record in ProjectTypeCostHistory.objects.filter(project=project):
+        record.total_cost = totals['total_cost']
+        record.materials_cost = Decimal(str(round(breakdown['materials'], 2)))
+        record.labor_cost = Decimal(str(round(breakdown['labor'], 2)))
+        record.equipment_cost = Decimal(str(round(breakdown['equipment'], 2)))
+        # save() recomputes cost_per_sqm; the post_save signal re-learns only if it moved
+        record.save()
@@ -0,0 +1,45 @@
+"""
+Shared Cache Versions
+Version counters kept in the database so an invalidation in one worker reaches
+every other process. Reads are memoized per process for VERSION_CHECK_SECONDS,
+which bounds how long another worker can keep using data that was invalidated.
+"""
+
+import threading
+import time
+from typing import Dict, Tuple
+
+from django.conf import settings
+from django.db.models import F
+
+from .models import CacheVersion
+
+VERSION_CHECK_SECONDS = getattr(settings, 'CACHE_VERSION_CHECK_SECONDS', 2.0)
+
+# name -> (version, monotonic time it was read)
+_seen: Dict[str, Tuple[int, float]] = {}
+_lock = threading.Lock()
+
+
+def get_version(name: str) -> int:
+    """Current version of `name` (0 if it was never bumped)"""
+    now = time.monotonic()
+    seen = _seen.get(name)
+    if seen is not None and now - seen[1] < VERSION_CHECK_SECONDS:
+        return seen[0]
+
+    version = CacheVersion.objects.filter(name=name).values_list('version', flat=True).first() or 0
+    with _lock:
+        _seen[name] = (version, now)
+    return version
+
+
+def bump_version(name: str) -> int:
+    """Increment `name` for every process and return the new version"""
+    if not CacheVersion.objects.filter(name=name).update(version=F('version') + 1):
+        CacheVersion.objects.get_or_create(name=name)
+        CacheVersion.objects.filter(name=name).update(version=F('version') + 1)
+    version = CacheVersion.objects.filter(name=name).values_list('version', flat=True).get()
+    with _lock:
+        _seen[name] = (version, time.monotonic())
+    return version
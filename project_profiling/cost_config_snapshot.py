@@ -0,0 +1,181 @@
+"""
+Cost Configuration Snapshot
+Compiles the cost estimation configuration (size bands, location keywords,
+project type base costs and breakdowns) into an immutable in-memory snapshot
+so estimates only read the shared configuration version from the database
+"""
+
+import logging
+import re
+import threading
+from bisect import bisect_right
+from decimal import Decimal
+from typing import Dict, List, NamedTuple, Optional, Pattern, Tuple
+
+from .cache_versions import bump_version, get_version
+from .cost_configuration import LocationMultiplier, SizeMultiplier
+from .models import ProjectType
+
+logger = logging.getLogger(__name__)
+
+VERSION_NAME = 'cost_config'
+
+COMPLEXITY_LEVELS = ('low_end', 'mid_range', 'high_end')
+
+
+class ProjectTypeCosts(NamedTuple):
+    base_costs: Dict[str, Optional[Decimal]]
+    breakdown: Dict[str, Decimal]
+
+
+class CostConfigSnapshot:
+    """
+    Read-only view of the active cost configuration.
+
+    Size bands are flattened into sorted, non-overlapping breakpoints so a lookup is
+    one bisect. Location keywords are compiled into a single regex whose alternation is
+    ordered by row priority, so the first row that would have matched still wins.
+    """
+
+    def __init__(
+        self,
+        size_breakpoints: List[float],
+        size_values: List[Optional[Decimal]],
+        location_pattern: Optional[Pattern],
+        location_keywords: Dict[str, Tuple[int, Decimal]],
+        default_location: Optional[Decimal],
+        project_types: Dict[str, ProjectTypeCosts],
+        version: int,
+    ):
+        self.size_breakpoints = size_breakpoints
+        self.size_values = size_values
+        self.location_pattern = location_pattern
+        self.location_keywords = location_keywords
+        self.default_location = default_location
+        self.project_types = project_types
+        self.version = version
+
+    @classmethod
+    def build(cls, version: int) -> 'CostConfigSnapshot':
+        size_breakpoints, size_values = cls._compile_size_bands(
+            list(SizeMultiplier.objects.filter(is_active=True).order_by('min_size')
+                 .values_list('min_size', 'max_size', 'multiplier'))
+        )
+
+        locations = LocationMultiplier.objects.filter(is_active=True)
+        location_keywords: Dict[str, Tuple[int, Decimal]] = {}
+        default_location = None
+        for priority, location in enumerate(locations.exclude(is_default=True)):
+            for keyword in location.get_keywords_list():
+                location_keywords.setdefault(keyword, (priority, location.multiplier))
+        default_row = locations.filter(is_default=True).first()
+        if default_row:
+            default_location = default_row.multiplier
+
+        location_pattern = None
+        if location_keywords:
+            # Alternatives in priority order: at any position the captured keyword is the
+            # highest-priority one that matches there. The lookahead allows overlaps.
+            ordered = sorted(location_keywords, key=lambda k: location_keywords[k][0])
+            location_pattern = re.compile(
+                '(?=(' + '|'.join(re.escape(keyword) for keyword in ordered) + '))'
+            )
+
+        project_types: Dict[str, ProjectTypeCosts] = {}
+        for project_type in ProjectType.objects.filter(is_active=True).order_by('id'):
+            project_types.setdefault(project_type.name.strip().lower(), ProjectTypeCosts(
+                base_costs={level: project_type.get_base_cost(level) for level in COMPLEXITY_LEVELS},
+                breakdown=project_type.get_cost_breakdown(),
+            ))
+
+        return cls(
+            size_breakpoints, size_values, location_pattern, location_keywords,
+            default_location, project_types, version
+        )
+
+    @staticmethod
+    def _compile_size_bands(rows) -> Tuple[List[float], List[Optional[Decimal]]]:
+        """
+        Turn possibly overlapping [min, max) bands into disjoint segments. Each segment
+        takes the multiplier of the first band (by min_size) covering it.
+        """
+        points = set()
+        for min_size, max_size, _ in rows:
+            points.add(float(min_size))
+            if max_size is not None:
+                points.add(float(max_size))
+        breakpoints = sorted(points)
+
+        values: List[Optional[Decimal]] = []
+        for point in breakpoints:
+            value = None
+            for min_size, max_size, multiplier in rows:
+                if float(min_size) <= point and (max_size is None or point < float(max_size)):
+                    value = multiplier
+                    break
+            values.append(value)
+        return breakpoints, values
+
+    def size_multiplier(self, lot_size) -> Optional[Decimal]:
+        index = bisect_right(self.size_breakpoints, float(lot_size)) - 1
+        if index < 0:
+            return None
+        return self.size_values[index]
+
+    def location_multiplier(self, location: str) -> Optional[Decimal]:
+        if self.location_pattern is not None and location:
+            best = None
+            for match in self.location_pattern.finditer(location.lower()):
+                candidate = self.location_keywords[match.group(1)]
+                if best is None or candidate[0] < best[0]:
+                    best = candidate
+                    if best[0] == 0:
+                        break
+            if best is not None:
+                return best[1]
+        return self.default_location
+
+    def project_type(self, name: str) -> Optional[ProjectTypeCosts]:
+        return self.project_types.get(name.strip().lower())
+
+
+_snapshot: Optional[CostConfigSnapshot] = None
+_lock = threading.Lock()
+
+
+def _current_version() -> int:
+    return get_version(VERSION_NAME)
+
+
+def get_snapshot() -> Optional[CostConfigSnapshot]:
+    """
+    Return the compiled snapshot, rebuilding it when the shared version has moved.
+    Returns None when the configuration cannot be loaded, so callers fall back to defaults.
+    """
+    global _snapshot
+    try:
+        version = _current_version()
+    except Exception as e:
+        logger.warning("Could not read cost configuration version: %s", e)
+        return None
+    snapshot = _snapshot
+    if snapshot is not None and snapshot.version == version:
+        return snapshot
+
+    with _lock:
+        if _snapshot is not None and _snapshot.version == version:
+            return _snapshot
+        try:
+            _snapshot = CostConfigSnapshot.build(version)
+        except Exception as e:
+            logger.warning("Could not build cost configuration snapshot: %s", e)
+            return None
+        logger.debug("Built cost configuration snapshot (version %s)", version)
+        return _snapshot
+
+
+def invalidate_snapshot():
+    """Bump the shared version so every process rebuilds on its next estimate"""
+    global _snapshot
+    bump_version(VERSION_NAME)
+    _snapshot = None
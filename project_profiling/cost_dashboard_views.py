@@ -11,7 +11,7 @@ from django.db.models import Sum, Q, F, DecimalField, Value
 from django.db.models.functions import Coalesce
 from django.utils import timezone
 from decimal import Decimal
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 
 from authentication.utils.decorators import verified_email_required, role_required
 from authentication.views import verify_user_token
@@ -413,3 +413,310 @@ def api_add_quick_expense(request, project_id):
 
     except Exception as e:
         return JsonResponse({'error': str(e)}, status=500)
+
+
+@login_required
+@verified_email_required
+@require_http_methods(["POST"])
+def api_import_expenses(request, project_id):
+    """
+    Bulk expense import from a CSV/XLSX file (month-end receipts).
+    Expects multipart field 'file'; pass dry_run=1 to validate without saving.
+    """
+    from .expense_import import ExpenseImporter
+
+    try:
+        user_profile = request.user.userprofile
+        project = get_object_or_404(ProjectProfile, id=project_id)
+
+        # Check permissions
+        if user_profile.role not in ['EG', 'OM', 'PM']:
+            return JsonResponse({'error': 'Unauthorized'}, status=403)
+
+        if user_profile.role == 'PM' and project.project_manager != user_profile:
+            return JsonResponse({'error': 'Unauthorized'}, status=403)
+
+        upload = request.FILES.get('file')
+        if not upload:
+            return JsonResponse({'error': 'No file uploaded'}, status=400)
+
+        dry_run = request.POST.get('dry_run') in ('1', 'true', 'True')
+        result = ExpenseImporter(project, user_profile).run(upload, dry_run=dry_run)
+
+        if not result.get('success'):
+            return JsonResponse({'error': result.get('error')}, status=400)
+
+        return JsonResponse(result)
+
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=500)
+
+
+@login_required
+@verified_email_required
+@require_http_methods(["GET"])
+def api_export_cost_summary(request, project_id):
+    """
+    Budget vs actual per scope and category as an XLSX download
+    """
+    from .xlsx_export import ExportSheet, xlsx_response
+
+    try:
+        user_profile = request.user.userprofile
+        project = get_object_or_404(ProjectProfile, id=project_id)
+
+        # Check permissions
+        if user_profile.role not in ['EG', 'OM', 'PM']:
+            return JsonResponse({'error': 'Unauthorized'}, status=403)
+
+        if user_profile.role == 'PM' and project.project_manager != user_profile:
+            return JsonResponse({'error': 'Unauthorized'}, status=403)
+
+        # Allocations and expenses summed per budget in one grouped query each
+        allocated = dict(FundAllocation.objects.filter(
+            project_budget__project=project, is_deleted=False
+        ).values_list('project_budget').annotate(total=Sum('amount')))
+        spent = dict(Expense.objects.filter(project=project).values_list(
+            'budget_category'
+        ).annotate(total=Sum('amount')))
+        categories = dict(CostCategory.choices)
+
+        def rows():
+            budgets = project.budgets.values_list(
+                'id', 'scope__name', 'category', 'planned_amount'
+            ).order_by('scope__name', 'category')
+            for budget_id, scope_name, category, planned in budgets.iterator(chunk_size=2000):
+                budget_allocated = allocated.get(budget_id) or Decimal('0')
+                budget_spent = spent.get(budget_id) or Decimal('0')
+                yield [
+                    scope_name,
+                    categories.get(category, category),
+                    planned,
+                    budget_allocated,
+                    budget_spent,
+                    budget_allocated - budget_spent,
+                    float(budget_spent / budget_allocated * 100) if budget_allocated else 0,
+                ]
+
+        return xlsx_response([ExportSheet(
+            'Budget vs Actual',
+            ['Scope', 'Category', 'Planned', 'Allocated', 'Spent', 'Remaining', 'Spent %'],
+            rows(),
+            widths=[30, 20, 16, 16, 16, 16, 10],
+        )], f'Cost_Summary_{project.project_id}.xlsx')
+
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=500)
+
+
+@login_required
+@verified_email_required
+@require_http_methods(["GET"])
+def api_export_expenses(request, project_id):
+    """
+    All expenses of a project as an XLSX download, streamed from the queryset
+    """
+    from .xlsx_export import ExportSheet, xlsx_response
+
+    try:
+        user_profile = request.user.userprofile
+        project = get_object_or_404(ProjectProfile, id=project_id)
+
+        # Check permissions
+        if user_profile.role not in ['EG', 'OM', 'PM']:
+            return JsonResponse({'error': 'Unauthorized'}, status=403)
+
+        if user_profile.role == 'PM' and project.project_manager != user_profile:
+            return JsonResponse({'error': 'Unauthorized'}, status=403)
+
+        categories = dict(CostCategory.choices)
+        expense_types = dict(Expense.EXPENSE_TYPES)
+
+        def rows():
+            expenses = Expense.objects.filter(project=project).values_list(
+                'expense_date', 'budget_category__scope__name', 'budget_category__category',
+                'expense_type', 'expense_other', 'amount', 'vendor', 'receipt_number', 'description',
+                'created_by__user__first_name', 'created_by__user__last_name', 'created_at',
+            ).order_by('-expense_date', '-created_at')
+            for (expense_date, scope_name, category, expense_type, expense_other, amount, vendor,
+                 receipt_number, description, first_name, last_name, created_at) in expenses.iterator(chunk_size=2000):
+                yield [
+                    expense_date,
+                    scope_name,
+                    categories.get(category, category),
+                    expense_other if expense_type == 'other' and expense_other else expense_types.get(expense_type, expense_type),
+                    amount,
+                    vendor,
+                    receipt_number,
+                    description,
+                    f"{first_name} {last_name}".strip(),
+                    created_at,
+                ]
+
+        return xlsx_response([ExportSheet(
+            'Expenses',
+            ['Date', 'Scope', 'Category', 'Type', 'Amount', 'Vendor', 'Receipt #', 'Description',
+             'Recorded By', 'Recorded At'],
+            rows(),
+            widths=[12, 25, 18, 20, 14, 25, 14, 40, 20, 20],
+        )], f'Expenses_{project.project_id}.xlsx')
+
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=500)
+
+
+@login_required
+@verified_email_required
+@require_http_methods(["GET"])
+def api_export_tasks(request, project_id):
+    """
+    Project tasks as an XLSX download; pass show=archived for archived tasks
+    """
+    from scheduling.models import ProjectTask
+    from .xlsx_export import ExportSheet, xlsx_response
+
+    try:
+        user_profile = request.user.userprofile
+        project = get_object_or_404(ProjectProfile, id=project_id)
+
+        # Check permissions
+        if user_profile.role not in ['EG', 'OM', 'PM']:
+            return JsonResponse({'error': 'Unauthorized'}, status=403)
+
+        if user_profile.role == 'PM' and project.project_manager != user_profile:
+            return JsonResponse({'error': 'Unauthorized'}, status=403)
+
+        statuses = dict(ProjectTask.STATUS_CHOICES)
+        archived = request.GET.get('show') == 'archived'
+
+        def rows():
+            tasks = ProjectTask.objects.filter(project=project, is_archived=archived).values_list(
+                'task_name', 'scope__name', 'assigned_to__user__first_name', 'assigned_to__user__last_name',
+                'start_date', 'end_date', 'duration_days', 'manhours', 'weight', 'progress', 'status',
+            ).order_by('scope__name', 'start_date', 'id')
+            for (task_name, scope_name, first_name, last_name, start_date, end_date, duration_days,
+                 manhours, weight, progress, status) in tasks.iterator(chunk_size=2000):
+                yield [
+                    task_name,
+                    scope_name,
+                    f"{first_name or ''} {last_name or ''}".strip(),
+                    start_date,
+                    end_date,
+                    duration_days,
+                    manhours,
+                    weight,
+                    progress,
+                    statuses.get(status, status),
+                ]
+
+        return xlsx_response([ExportSheet(
+            'Tasks',
+            ['Task', 'Scope', 'Assigned To', 'Start', 'End', 'Duration (days)', 'Manhours',
+             'Weight %', 'Progress %', 'Status'],
+            rows(),
+            widths=[40, 25, 20, 12, 12, 14, 12, 10, 10, 12],
+        )], f'Tasks_{project.project_id}.xlsx')
+
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=500)
+
+
+@login_required
+@verified_email_required
+@require_http_methods(["GET"])
+def api_project_cost_history(request, project_id):
+    """
+    Historical cost position from closed monthly snapshots.
+    ?as_of=YYYY-MM  -> category breakdown at the end of that month
+    ?from=YYYY-MM&to=YYYY-MM[&category=MAT] -> monthly trend
+    """
+    from .cost_snapshots import parse_period, snapshots_as_of, snapshot_trend, SNAPSHOT_FIELDS
+
+    try:
+        project = get_object_or_404(ProjectProfile, id=project_id)
+
+        # Check permissions
+        user_profile = request.user.userprofile
+        if user_profile.role == 'PM' and project.project_manager != user_profile:
+            return JsonResponse({'error': 'Unauthorized'}, status=403)
+
+        try:
+            as_of = request.GET.get('as_of')
+            if as_of:
+                snapshots = snapshots_as_of(project.id, parse_period(as_of))
+                categories = [{
+                    'category': snap.category,
+                    'category_display': snap.get_category_display(),
+                    **{field: float(getattr(snap, field)) for field in SNAPSHOT_FIELDS}
+                } for snap in snapshots]
+                return JsonResponse({
+                    'success': True,
+                    'as_of': as_of,
+                    'period': snapshots[0].period.strftime('%Y-%m') if snapshots else None,
+                    'categories': categories,
+                    'totals': {
+                        field: sum(c[field] for c in categories) for field in SNAPSHOT_FIELDS
+                    },
+                })
+
+            end = parse_period(request.GET['to']) if request.GET.get('to') else timezone.localdate()
+            start = parse_period(request.GET['from']) if request.GET.get('from') else date(end.year - 1, end.month, 1)
+        except ValueError:
+            return JsonResponse({'error': 'Months must be given as YYYY-MM'}, status=400)
+
+        return JsonResponse({
+            'success': True,
+            'trend': snapshot_trend(project.id, start, end, request.GET.get('category')),
+        })
+
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=500)
+
+
+@login_required
+@verified_email_required
+@require_http_methods(["GET"])
+def api_project_cost_risk(request, project_id):
+    """
+    Monte Carlo cost risk for the project's BOQ: P50/P80/P95 totals and
+    recommended contingency. ?iterations= (default 100000)
+
+    The simulation runs in run_workers. Until it finishes the response is 202 with
+    the job state; request the same URL again to get the result.
+    """
+    from .cost_risk import DEFAULT_ITERATIONS, costed_lines, request_risk_analysis
+
+    try:
+        project = get_object_or_404(ProjectProfile, id=project_id)
+
+        # Check permissions
+        user_profile = request.user.userprofile
+        if user_profile.role == 'PM' and project.project_manager != user_profile:
+            return JsonResponse({'error': 'Unauthorized'}, status=403)
+
+        if not project.boq_items:
+            return JsonResponse({'error': 'Project has no BOQ items'}, status=400)
+
+        try:
+            iterations = int(request.GET.get('iterations', DEFAULT_ITERATIONS))
+        except ValueError:
+            return JsonResponse({'error': 'iterations must be a number'}, status=400)
+
+        if not costed_lines(project.boq_items):
+            return JsonResponse({'success': False, 'error': 'Project has no BOQ items with costs to simulate'}, status=400)
+
+        analysis, job = request_risk_analysis(project, iterations, created_by=user_profile)
+        if analysis is not None:
+            return JsonResponse(analysis)
+        if job.status == 'FAILED':
+            return JsonResponse({'success': False, 'error': job.error or 'Cost risk simulation failed'}, status=500)
+        return JsonResponse({
+            'success': True,
+            'job_id': job.id,
+            'status': job.status,
+            'progress': job.progress,
+            'status_url': request.get_full_path(),
+        }, status=202)
+
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=500)
@@ -4,7 +4,8 @@ Calculates project costs based on project type, lot size, and other factors
 """
 
 from decimal import Decimal
-from typing import Dict, List, Optional
+from typing import Any, Dict, List, Optional, Sequence
+import numpy as np
 from django.db import models
 from .models import ProjectProfile, ProjectType
 from .cost_configuration import (
@@ -14,6 +15,7 @@ from .cost_configuration import (
     ComplexityMultiplier,
     CostBreakdownTemplate
 )
+from .cost_config_snapshot import get_snapshot
 
 
 class CostEstimationEngine:
@@ -144,6 +146,116 @@ class CostEstimationEngine:
             }
         }
     
+    # Upper bound on grid size for estimate_scenarios
+    MAX_SCENARIOS = 50000
+    
+    @classmethod
+    def estimate_scenarios(
+        cls,
+        project_type,
+        lot_sizes: Sequence,
+        complexity_levels: Sequence[str] = ('mid_range',),
+        project_categories: Sequence[str] = ('PRI',),
+        locations: Sequence[str] = ('',),
+    ) -> Dict[str, Any]:
+        """
+        Estimate every combination of the given inputs in one broadcast.
+        
+        Each multiplier is resolved once per distinct input value, then the grid
+        lot_size x complexity_level x project_category x location is computed with
+        float64 arithmetic. Results are returned column-wise, flattened in that axis
+        order (row-major), so the caller can rebuild the grid from `shape`.
+        
+        Raises:
+            ValueError: if an input is empty, a lot size is not positive,
+                or the grid exceeds MAX_SCENARIOS
+        """
+        lots = np.asarray([float(size) for size in lot_sizes], dtype=np.float64)
+        complexity_levels = list(complexity_levels)
+        project_categories = list(project_categories)
+        locations = list(locations)
+        
+        shape = (len(lots), len(complexity_levels), len(project_categories), len(locations))
+        if 0 in shape:
+            raise ValueError('Every scenario dimension needs at least one value')
+        if (lots <= 0).any():
+            raise ValueError('Lot sizes must be greater than zero')
+        scenario_count = int(np.prod(shape))
+        if scenario_count > cls.MAX_SCENARIOS:
+            raise ValueError(f'Too many scenarios ({scenario_count}); the limit is {cls.MAX_SCENARIOS}')
+        
+        base_costs = np.asarray(
+            [float(cls._get_base_cost_per_sqm(project_type, level)) for level in complexity_levels]
+        )
+        size_multipliers = cls._get_size_multipliers(lots)
+        category_multipliers = np.asarray(
+            [float(cls.COMPLEXITY_MULTIPLIERS.get(category, Decimal('1.0'))) for category in project_categories]
+        )
+        location_multipliers = np.asarray(
+            [float(cls._get_location_multiplier(location or '')) for location in locations]
+        )
+        
+        percentages = cls._calculate_cost_breakdown(Decimal('1'), project_type)
+        breakdown_share = float(sum(percentages.values()))
+        
+        cost_per_sqm = (
+            size_multipliers[:, None, None, None]
+            * base_costs[None, :, None, None]
+            * category_multipliers[None, None, :, None]
+            * location_multipliers[None, None, None, :]
+        )
+        base_cost = lots[:, None, None, None] * cost_per_sqm
+        total_cost = base_cost * breakdown_share
+        
+        return {
+            'shape': list(shape),
+            'dimensions': {
+                'lot_size': lots.tolist(),
+                'complexity_level': complexity_levels,
+                'project_category': project_categories,
+                'location': locations,
+            },
+            'multipliers': {
+                'base_cost_per_sqm': base_costs.round(2).tolist(),
+                'size': size_multipliers.tolist(),
+                'complexity': category_multipliers.tolist(),
+                'location': location_multipliers.tolist(),
+            },
+            'breakdown_percentages': {category: float(share) for category, share in percentages.items()},
+            'columns': {
+                'cost_per_sqm': cost_per_sqm.round(2).ravel().tolist(),
+                'base_cost': base_cost.round(2).ravel().tolist(),
+                'total_estimated_cost': total_cost.round(2).ravel().tolist(),
+            },
+            'count': scenario_count,
+        }
+    
+    @classmethod
+    def _get_size_multipliers(cls, lot_sizes: np.ndarray) -> np.ndarray:
+        """Vectorized _get_size_multiplier: configured bands first, hardcoded bands for the rest"""
+        result = np.full(lot_sizes.shape, np.nan)
+        
+        snapshot = get_snapshot()
+        if snapshot and snapshot.size_breakpoints:
+            values = np.asarray(
+                [np.nan if value is None else float(value) for value in snapshot.size_values]
+            )
+            index = np.searchsorted(snapshot.size_breakpoints, lot_sizes, side='right') - 1
+            covered = index >= 0
+            result[covered] = values[index[covered]]
+        
+        missing = np.isnan(result)
+        if missing.any():
+            bands = sorted(cls.SIZE_MULTIPLIERS.values(), key=lambda band: band['min'])
+            mins = np.asarray([band['min'] for band in bands], dtype=np.float64)
+            maxes = np.asarray([band['max'] for band in bands], dtype=np.float64)
+            values = np.asarray([float(band['multiplier']) for band in bands])
+            index = np.searchsorted(mins, lot_sizes[missing], side='right') - 1
+            inside = (index >= 0) & (lot_sizes[missing] < maxes[np.maximum(index, 0)])
+            result[missing] = np.where(inside, values[np.maximum(index, 0)], 1.0)
+        
+        return result
+    
     @classmethod
     def _get_base_cost_per_sqm(cls, project_type: str, complexity_level: str) -> Decimal:
         """Get base cost per square meter for project type and complexity"""
@@ -153,16 +265,14 @@ class CostEstimationEngine:
             if base_cost:
                 return base_cost
         
-        # If project_type is a string, try to find the ProjectType
+        # If project_type is a string, look it up in the compiled configuration
         if isinstance(project_type, str):
-            try:
-                from .models import ProjectType
-                project_type_obj = ProjectType.objects.get(name__iexact=project_type, is_active=True)
-                base_cost = project_type_obj.get_base_cost(complexity_level)
+            snapshot = get_snapshot()
+            configured = snapshot.project_type(project_type) if snapshot else None
+            if configured:
+                base_cost = configured.base_costs.get(complexity_level, configured.base_costs['mid_range'])
                 if base_cost:
                     return base_cost
-            except ProjectType.DoesNotExist:
-                pass
         
         # Fallback to hardcoded values
         normalized_type = project_type.lower().replace(' ', '_') if isinstance(project_type, str) else 'residential'
@@ -193,20 +303,12 @@ class CostEstimationEngine:
         """Get size-based cost multiplier"""
         size_value = float(lot_size)
         
-        # Try to get from database configuration first
-        try:
-            multipliers = SizeMultiplier.objects.filter(is_active=True).order_by('min_size')
-            for multiplier in multipliers:
-                if multiplier.max_size is None:
-                    # No upper limit
-                    if size_value >= float(multiplier.min_size):
-                        return multiplier.multiplier
-                else:
-                    # Has upper limit
-                    if float(multiplier.min_size) <= size_value < float(multiplier.max_size):
-                        return multiplier.multiplier
-        except Exception:
-            pass
+        # Try the configured size bands first
+        snapshot = get_snapshot()
+        if snapshot:
+            multiplier = snapshot.size_multiplier(size_value)
+            if multiplier is not None:
+                return multiplier
         
         # Fallback to hardcoded values
         for size_category, config in cls.SIZE_MULTIPLIERS.items():
@@ -220,20 +322,12 @@ class CostEstimationEngine:
         """Get location-based cost multiplier"""
         location_upper = location.upper()
         
-        # Try to get from database configuration first
-        try:
-            multipliers = LocationMultiplier.objects.filter(is_active=True).exclude(is_default=True)
-            for multiplier in multipliers:
-                keywords = multiplier.get_keywords_list()
-                if any(keyword.upper() in location_upper for keyword in keywords):
-                    return multiplier.multiplier
-            
-            # Check for default multiplier
-            default_multiplier = LocationMultiplier.objects.filter(is_default=True, is_active=True).first()
-            if default_multiplier:
-                return default_multiplier.multiplier
-        except Exception:
-            pass
+        # Try the configured location keywords first
+        snapshot = get_snapshot()
+        if snapshot:
+            multiplier = snapshot.location_multiplier(location)
+            if multiplier is not None:
+                return multiplier
         
         # Fallback to hardcoded values
         if any(region in location_upper for region in ['MANILA', 'QUEZON CITY', 'MAKATI', 'TAGUIG', 'PASAY']):
@@ -256,13 +350,13 @@ class CostEstimationEngine:
         # If project_type is a ProjectType instance, use its breakdown
         if hasattr(project_type, 'get_cost_breakdown'):
             percentages = project_type.get_cost_breakdown()
-        # If project_type is a string, try to find the ProjectType
+        # If project_type is a string, use the pre-resolved breakdown for it
         elif isinstance(project_type, str):
-            try:
-                from .models import ProjectType
-                project_type_obj = ProjectType.objects.get(name__iexact=project_type, is_active=True)
-                percentages = project_type_obj.get_cost_breakdown()
-            except ProjectType.DoesNotExist:
+            snapshot = get_snapshot()
+            configured = snapshot.project_type(project_type) if snapshot else None
+            if configured:
+                percentages = configured.breakdown
+            else:
                 # Fallback to hardcoded values
                 percentages = cls._get_fallback_breakdown(project_type)
         else:
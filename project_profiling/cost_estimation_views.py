@@ -15,6 +15,8 @@ from authentication.utils.decorators import verified_email_required, role_requir
 from authentication.utils.tokens import verify_user_token
 from .cost_estimation import CostEstimationEngine, ProjectCostEstimator
 from .cost_learning import CostLearningEngine
+from .cost_similarity import find_comparable_projects
+from .unit_rates import MAX_SUGGESTIONS, suggest_unit_costs
 
 
 @method_decorator([login_required, verified_email_required, role_required('EG', 'OM', 'PM')], name='dispatch')
@@ -231,3 +233,189 @@ def get_estimation_options_api(request, token, role):
         return JsonResponse({
             'error': f'Failed to get options: {str(e)}'
         }, status=500)
+
+
+@login_required
+@verified_email_required
+@role_required('EG', 'OM', 'PM')
+@require_http_methods(["POST"])
+def batch_estimate_api(request):
+    """
+    Estimate a grid of scenarios in one call.
+    
+    Body: project_type plus lists lot_sizes, complexity_levels, project_categories
+    and locations. Every combination is estimated; results come back column-wise.
+    """
+    try:
+        data = json.loads(request.body)
+        
+        project_type = data.get('project_type', 'residential')
+        lot_sizes = data.get('lot_sizes') or []
+        complexity_levels = data.get('complexity_levels') or ['mid_range']
+        project_categories = data.get('project_categories') or ['PRI']
+        locations = data.get('locations') or ['']
+        
+        dimensions = [lot_sizes, complexity_levels, project_categories, locations]
+        if not all(isinstance(values, list) for values in dimensions):
+            return JsonResponse({
+                'error': 'lot_sizes, complexity_levels, project_categories and locations must be lists'
+            }, status=400)
+        
+        if not lot_sizes:
+            return JsonResponse({
+                'error': 'At least one lot size is required for cost estimation'
+            }, status=400)
+        
+        valid_levels = ProjectCostEstimator.get_estimation_options()['complexity_levels']
+        invalid_levels = [level for level in complexity_levels if level not in valid_levels]
+        if invalid_levels:
+            return JsonResponse({
+                'error': f'Invalid complexity level(s): {", ".join(map(str, invalid_levels))}'
+            }, status=400)
+        
+        try:
+            lot_sizes = [Decimal(str(size)) for size in lot_sizes]
+        except (ValueError, TypeError, ArithmeticError):
+            return JsonResponse({
+                'error': 'Invalid lot size format'
+            }, status=400)
+        
+        # Resolve a ProjectType id the same way the single-estimate endpoint does
+        if str(project_type).isdigit():
+            from .models import ProjectType
+            project_type = ProjectType.objects.filter(id=project_type, is_active=True).first() or 'residential'
+        
+        try:
+            scenarios = CostEstimationEngine.estimate_scenarios(
+                project_type=project_type,
+                lot_sizes=lot_sizes,
+                complexity_levels=complexity_levels,
+                project_categories=project_categories,
+                locations=[str(location) for location in locations],
+            )
+        except ValueError as e:
+            return JsonResponse({'error': str(e)}, status=400)
+        
+        return JsonResponse({
+            'success': True,
+            'project_type': str(project_type),
+            'scenarios': scenarios
+        })
+        
+    except json.JSONDecodeError:
+        return JsonResponse({
+            'error': 'Invalid JSON data'
+        }, status=400)
+    except Exception as e:
+        return JsonResponse({
+            'error': f'Estimation failed: {str(e)}'
+        }, status=500)
+
+
+@login_required
+@verified_email_required
+@role_required('EG', 'OM', 'PM')
+@require_http_methods(["GET"])
+def comparable_projects_api(request, project_type_id):
+    """
+    Nearest approved cost-history records for an estimate in progress.
+    
+    Query params: lot_size (required), location, project_category,
+    complexity_level, cost_per_sqm and k (default 10, max 50).
+    """
+    try:
+        from .models import ProjectType
+        
+        project_type = ProjectType.objects.filter(id=project_type_id, is_active=True).first()
+        if not project_type:
+            return JsonResponse({'error': 'Project type not found'}, status=404)
+        
+        try:
+            lot_size = Decimal(request.GET.get('lot_size', ''))
+            cost_per_sqm = Decimal(request.GET['cost_per_sqm']) if request.GET.get('cost_per_sqm') else None
+            k = min(max(int(request.GET.get('k', 10)), 1), 50)
+        except (ArithmeticError, ValueError):
+            return JsonResponse({'error': 'lot_size, cost_per_sqm and k must be numbers'}, status=400)
+        if lot_size <= 0:
+            return JsonResponse({'error': 'Lot size must be greater than zero'}, status=400)
+        
+        matches = find_comparable_projects(
+            project_type.id,
+            lot_size,
+            location=request.GET.get('location', ''),
+            project_category=request.GET.get('project_category', ''),
+            complexity_level=request.GET.get('complexity_level', ''),
+            cost_per_sqm=cost_per_sqm,
+            k=k,
+        )
+        
+        projects = []
+        for record, distance in matches:
+            projects.append({
+                'id': record.id,
+                'project_name': record.project.project_name if record.project else None,
+                'lot_size': str(record.lot_size),
+                'total_cost': str(record.total_cost),
+                'cost_per_sqm': str(record.cost_per_sqm),
+                'location': record.location,
+                'project_category': record.project_category,
+                'complexity_level': record.complexity_level,
+                'uploaded_at': record.uploaded_at.isoformat(),
+                'distance': round(distance, 4),
+                'similarity': round(1 / (1 + distance), 4),
+            })
+        
+        return JsonResponse({
+            'success': True,
+            'project_type': project_type.name,
+            'projects': projects
+        })
+        
+    except Exception as e:
+        return JsonResponse({
+            'error': f'Failed to find comparable projects: {str(e)}'
+        }, status=500)
+
+
+@login_required
+@verified_email_required
+@role_required('EG', 'OM', 'PM')
+@require_http_methods(["POST"])
+def suggest_unit_cost_api(request):
+    """
+    Suggested unit costs for many BOQ rows in one call.
+    
+    Body: {"items": [{"description": ..., "uom": ...}, ...]}. Suggestions come back
+    in request order, null where no priced history matches the description.
+    """
+    try:
+        data = json.loads(request.body)
+        items = data.get('items')
+        
+        if not isinstance(items, list) or not items:
+            return JsonResponse({'error': 'items must be a non-empty list'}, status=400)
+        if len(items) > MAX_SUGGESTIONS:
+            return JsonResponse({
+                'error': f'At most {MAX_SUGGESTIONS} items can be priced per request'
+            }, status=400)
+        if not all(isinstance(item, dict) for item in items):
+            return JsonResponse({'error': 'Each item must be an object with description and uom'}, status=400)
+        
+        suggestions = suggest_unit_costs([
+            (str(item.get('description') or ''), str(item.get('uom') or '')) for item in items
+        ])
+        
+        return JsonResponse({
+            'success': True,
+            'suggestions': suggestions,
+            'matched': sum(1 for suggestion in suggestions if suggestion)
+        })
+        
+    except json.JSONDecodeError:
+        return JsonResponse({
+            'error': 'Invalid JSON data'
+        }, status=400)
+    except Exception as e:
+        return JsonResponse({
+            'error': f'Failed to suggest unit costs: {str(e)}'
+        }, status=500)
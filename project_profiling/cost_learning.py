@@ -5,10 +5,12 @@ Handles learning from actual project BOQ data to build cost intelligence
 
 from decimal import Decimal
 from typing import Dict, List, Optional, Tuple
-from django.db import models
+from django.db import models, transaction
 from django.utils import timezone
 from django.db.models import Avg, Count, Q
 from .models import ProjectType, ProjectTypeCostHistory, ProjectProfile
+from .cost_similarity import find_comparable_projects
+from .cost_statistics import get_cost_statistics as get_cached_cost_statistics
 
 
 class CostLearningEngine:
@@ -34,56 +36,100 @@ class CostLearningEngine:
         'NEW': Decimal('1.0'),    # Use actual company project data
     }
     
+    # Exponential recency decay: each newer approved record multiplies the weight
+    # of everything learned before it by this factor (most recent = weight 1.0)
+    DECAY_FACTOR = Decimal('0.9')
+    STATE_PRECISION = Decimal('0.0000000001')
+    COMPLEXITY_LEVELS = ('low_end', 'mid_range', 'high_end')
+    
     @staticmethod
-    def calculate_project_type_costs(project_type: ProjectType) -> Dict[str, Decimal]:
-        """
-        Calculate average costs from all approved history records
-        """
-        # Get all approved cost history for this project type
-        history_records = ProjectTypeCostHistory.objects.filter(
-            project_type=project_type,
-            is_approved=True
-        ).order_by('-uploaded_at')
-        
-        if not history_records.exists():
-            return {}
-        
-        # Calculate weighted averages (recent projects weighted higher)
-        total_weight = Decimal('0')
-        weighted_costs = {
-            'low_end': Decimal('0'),
-            'mid_range': Decimal('0'),
-            'high_end': Decimal('0'),
+    def _empty_learning_state() -> Dict:
+        return {
+            'count': 0,
+            'levels': {
+                level: {'weighted_sum': '0', 'weight_total': '0'}
+                for level in CostLearningEngine.COMPLEXITY_LEVELS
+            },
         }
-        
-        # Calculate weights based on recency (more recent = higher weight)
-        for i, record in enumerate(history_records):
-            # Weight decreases with age (most recent = weight 1.0, older = less)
-            weight = Decimal('1.0') - (Decimal(str(i)) * Decimal('0.1'))
-            weight = max(weight, Decimal('0.1'))  # Minimum weight of 0.1
-            
-            total_weight += weight
-            
-            # Add to complexity level averages
-            complexity = record.complexity_level
-            if complexity in weighted_costs:
-                weighted_costs[complexity] += record.cost_per_sqm * weight
-        
-        # Calculate final averages
-        if total_weight > 0:
-            for complexity in weighted_costs:
-                weighted_costs[complexity] = weighted_costs[complexity] / total_weight
-        
-        # Update ProjectType fields
+    
+    @staticmethod
+    def _fold_record(state: Dict, cost_per_sqm: Decimal, complexity_level: str) -> Dict:
+        """Decay the existing state one step and add a record with weight 1.0"""
+        decay = CostLearningEngine.DECAY_FACTOR
+        precision = CostLearningEngine.STATE_PRECISION
+        for level, sums in state['levels'].items():
+            weighted_sum = Decimal(sums['weighted_sum']) * decay
+            weight_total = Decimal(sums['weight_total']) * decay
+            if level == complexity_level:
+                weighted_sum += Decimal(str(cost_per_sqm or 0)).quantize(Decimal('0.01'))
+                weight_total += Decimal('1')
+            sums['weighted_sum'] = str(weighted_sum.quantize(precision))
+            sums['weight_total'] = str(weight_total.quantize(precision))
+        state['count'] += 1
+        return state
+    
+    @staticmethod
+    def _apply_learning_state(project_type: ProjectType, state: Dict) -> Dict[str, Decimal]:
+        """Write base costs derived from the learning state onto the project type"""
+        weighted_costs = {}
+        for level, sums in state['levels'].items():
+            weight_total = Decimal(sums['weight_total'])
+            weighted_costs[level] = (
+                (Decimal(sums['weighted_sum']) / weight_total).quantize(Decimal('0.01'))
+                if weight_total > 0 else None
+            )
+        
+        project_type.learning_state = state
         project_type.base_cost_low_end = weighted_costs.get('low_end')
         project_type.base_cost_mid_range = weighted_costs.get('mid_range')
         project_type.base_cost_high_end = weighted_costs.get('high_end')
-        project_type.total_projects_count = history_records.count()
+        project_type.total_projects_count = state['count']
         project_type.last_cost_update = timezone.now()
-        project_type.save()
-        
+        project_type.save(update_fields=[
+            'learning_state', 'base_cost_low_end', 'base_cost_mid_range', 'base_cost_high_end',
+            'total_projects_count', 'last_cost_update', 'updated_at',
+        ])
         return weighted_costs
     
+    @staticmethod
+    def calculate_project_type_costs(project_type: ProjectType) -> Dict[str, Decimal]:
+        """
+        Full rebuild of the learning state from all approved history records.
+        Only needed when approvals change or records are edited/deleted;
+        new records go through learn_from_record in O(1).
+        """
+        history_records = ProjectTypeCostHistory.objects.filter(
+            project_type=project_type,
+            is_approved=True
+        ).order_by('uploaded_at', 'id').values_list('cost_per_sqm', 'complexity_level')
+        
+        with transaction.atomic():
+            project_type = ProjectType.objects.select_for_update().get(pk=project_type.pk)
+            state = CostLearningEngine._empty_learning_state()
+            for cost_per_sqm, complexity_level in history_records.iterator():
+                CostLearningEngine._fold_record(state, cost_per_sqm, complexity_level)
+            if not state['count']:
+                # Nothing approved left: keep the last learned base costs, drop the stale state
+                project_type.learning_state = None
+                project_type.save(update_fields=['learning_state', 'updated_at'])
+                return {}
+            return CostLearningEngine._apply_learning_state(project_type, state)
+    
+    @staticmethod
+    def learn_from_record(record: ProjectTypeCostHistory) -> Dict[str, Decimal]:
+        """
+        Incrementally fold one newly approved record into its project type's
+        learning state. Cost is constant regardless of history length.
+        """
+        with transaction.atomic():
+            project_type = ProjectType.objects.select_for_update().get(pk=record.project_type_id)
+            state = project_type.learning_state
+            if not state:
+                # No state yet (pre-existing data): build it once from history
+                return CostLearningEngine.calculate_project_type_costs(project_type)
+            CostLearningEngine._fold_record(state, record.cost_per_sqm, record.complexity_level)
+            return CostLearningEngine._apply_learning_state(project_type, state)
+    
     @staticmethod
     def get_cost_estimate(
         project_type: ProjectType, 
@@ -135,12 +181,23 @@ class CostLearningEngine:
         # Calculate confidence level
         confidence = project_type.get_confidence_level()
         
+        # Spread of the underlying history for this complexity level, scaled like the estimate
+        estimate_range = None
+        level_stats = get_cached_cost_statistics(project_type.id).get('by_complexity', {}).get(complexity)
+        if level_stats and level_stats['count']:
+            multiplier = location_multiplier * complexity_multiplier * lot_size
+            estimate_range = {
+                key: Decimal(str(level_stats[key])) * multiplier
+                for key in ('p10', 'p50', 'p90')
+            }
+        
         return {
             'success': True,
             'total_estimated_cost': total_cost,
             'cost_per_sqm': adjusted_cost_per_sqm,
             'base_cost_per_sqm': base_cost,
             'breakdown': cost_breakdown,
+            'estimate_range': estimate_range,
             'confidence': confidence,
             'sample_size': project_type.total_projects_count,
             'multipliers': {
@@ -181,8 +238,8 @@ class CostLearningEngine:
             approved_at=timezone.now() if source == 'boq_upload' else None
         )
         
-        # Recalculate ProjectType average costs
-        CostLearningEngine.calculate_project_type_costs(project_type)
+        # ProjectType costs are updated incrementally by the post_save signal
+        # (see signals.learn_from_cost_history) once the record is approved
         
         return cost_history
     
@@ -242,35 +299,20 @@ class CostLearningEngine:
         location: str = None
     ) -> List[ProjectTypeCostHistory]:
         """
-        Find similar projects for better cost estimation
+        Find similar projects for better cost estimation, nearest first
+        (see cost_similarity for the feature index)
         """
-        # Base query
-        query = Q(project_type=project_type, is_approved=True)
-        
-        # Add location filter if provided
-        if location:
-            query &= Q(location__icontains=location)
-        
-        # Get projects with similar lot sizes (±20%)
-        size_tolerance = lot_size * Decimal('0.2')
-        min_size = lot_size - size_tolerance
-        max_size = lot_size + size_tolerance
-        
-        query &= Q(lot_size__gte=min_size, lot_size__lte=max_size)
-        
-        return ProjectTypeCostHistory.objects.filter(query).order_by('-uploaded_at')[:10]
+        matches = find_comparable_projects(project_type.id, lot_size, location=location, k=10)
+        return [record for record, _ in matches]
     
     @staticmethod
     def get_cost_statistics(project_type: ProjectType) -> Dict:
         """
-        Get cost statistics for analytics
+        Get cost statistics for analytics (cached, see cost_statistics)
         """
-        history_records = ProjectTypeCostHistory.objects.filter(
-            project_type=project_type,
-            is_approved=True
-        )
+        stats = get_cached_cost_statistics(project_type.id)
         
-        if not history_records.exists():
+        if not stats['total_projects']:
             return {
                 'total_projects': 0,
                 'average_cost_per_sqm': 0,
@@ -280,15 +322,18 @@ class CostLearningEngine:
                 'confidence_level': 'No Data'
             }
         
-        costs_per_sqm = [record.cost_per_sqm for record in history_records]
-        total_costs = [record.total_cost for record in history_records]
-        
+        cost_per_sqm = stats['cost_per_sqm']
         return {
-            'total_projects': history_records.count(),
-            'average_cost_per_sqm': sum(costs_per_sqm) / len(costs_per_sqm),
-            'min_cost_per_sqm': min(costs_per_sqm),
-            'max_cost_per_sqm': max(costs_per_sqm),
-            'total_cost_range': (min(total_costs), max(total_costs)),
+            'total_projects': stats['total_projects'],
+            'average_cost_per_sqm': cost_per_sqm['mean'],
+            'min_cost_per_sqm': cost_per_sqm['min'],
+            'max_cost_per_sqm': cost_per_sqm['max'],
+            'total_cost_range': tuple(stats['total_cost_range']),
+            'percentiles': {key: cost_per_sqm[key] for key in ('p10', 'p50', 'p90')},
+            'std_cost_per_sqm': cost_per_sqm['std'],
+            'confidence_interval': cost_per_sqm['confidence_interval'],
+            'outlier_ids': stats['outlier_ids'],
+            'by_complexity': stats['by_complexity'],
             'confidence_level': project_type.get_confidence_level(),
             'last_update': project_type.last_cost_update
         }
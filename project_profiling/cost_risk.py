@@ -0,0 +1,208 @@
+"""
+BOQ Cost Risk Analysis
+Monte Carlo simulation of a project's total BOQ cost from item-level unit-cost
+spread observed on past projects of the same type, with contingency recommendations.
+Simulations run as ExtractionJobs in run_workers; finished results are served from
+the job row of the same project, BOQ version and iteration count.
+"""
+
+import logging
+import math
+from typing import Dict, List, Optional, Tuple
+
+from django.db.models import Count, FloatField, StdDev
+from django.db.models.functions import Cast, Ln, Lower
+
+from .boq_items import boq_digest, normalize_description
+from .cost_statistics import get_cost_statistics
+from .extraction_cache import decode_result
+from .extraction_jobs import enqueue_task
+from .models import BOQItem, ExtractionJob, ProjectProfile
+from .risk_simulation import simulate_totals
+
+logger = logging.getLogger(__name__)
+
+JOB_TYPE = 'cost_risk'
+
+DEFAULT_ITERATIONS = 100_000
+MIN_ITERATIONS = 1000
+MAX_ITERATIONS = 200_000
+CORRELATION = 0.3
+
+# Unit-cost log spread when neither item history nor project type statistics exist
+DEFAULT_SIGMA = 0.15
+MIN_SIGMA = 0.05
+MAX_SIGMA = 0.6
+MIN_OBSERVATIONS = 3
+HISTORY_PROJECTS = 50
+
+def _item_key(item: Dict) -> Tuple[str, str]:
+    """(normalized description, uom) as grouped on BOQItem rows"""
+    return normalize_description(item.get('description')), str(item.get('uom') or '').strip().lower()
+
+
+def _to_float(value) -> float:
+    try:
+        return float(value or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _history_sigmas(project: ProjectProfile, descriptions) -> Dict[Tuple[str, str], float]:
+    """
+    Log-std of unit cost per (description, uom) across recent projects of the same type,
+    for the given normalized descriptions only, in one grouped query over BOQItem rows
+    """
+    if not project.project_type_id:
+        return {}
+
+    recent_ids = list(
+        ProjectProfile.objects.filter(project_type_id=project.project_type_id)
+        .exclude(id=project.id).exclude(boq_version='')
+        .order_by('-created_at').values_list('id', flat=True)[:HISTORY_PROJECTS]
+    )
+    if not recent_ids:
+        return {}
+
+    rows = (
+        BOQItem.objects.filter(
+            project_type_id=project.project_type_id,
+            project_id__in=recent_ids,
+            normalized_description__in=descriptions,
+            unit_cost__gt=0,
+        )
+        .values('normalized_description', uom_key=Lower('uom'))
+        .annotate(
+            samples=Count('id'),
+            log_std=StdDev(Ln(Cast('unit_cost', FloatField())), sample=True),
+        )
+        .filter(samples__gte=MIN_OBSERVATIONS)
+    )
+    return {
+        (row['normalized_description'], row['uom_key']): min(max(row['log_std'] or 0.0, MIN_SIGMA), MAX_SIGMA)
+        for row in rows
+    }
+
+
+def _fallback_sigma(project: ProjectProfile) -> float:
+    """Lognormal sigma matching the project type's cost-per-sqm coefficient of variation"""
+    if not project.project_type_id:
+        return DEFAULT_SIGMA
+    stats = get_cost_statistics(project.project_type_id)
+    cost_per_sqm = stats.get('cost_per_sqm') or {}
+    if cost_per_sqm.get('count', 0) < MIN_OBSERVATIONS or not cost_per_sqm.get('mean'):
+        return DEFAULT_SIGMA
+    cv = cost_per_sqm['std'] / cost_per_sqm['mean']
+    return min(max(math.sqrt(math.log(1 + cv ** 2)), MIN_SIGMA), MAX_SIGMA)
+
+
+def clamp_iterations(iterations) -> int:
+    return min(max(int(iterations), MIN_ITERATIONS), MAX_ITERATIONS)
+
+
+def costed_lines(boq_items) -> List[Tuple[Dict, float]]:
+    """(item, amount) for every BOQ line with a positive cost"""
+    lines = []
+    for item in boq_items or []:
+        if not isinstance(item, dict):
+            continue
+        amount = _to_float(item.get('total_cost'))
+        if not amount:
+            amount = _to_float(item.get('quantity')) * _to_float(item.get('unit_cost'))
+        if amount > 0:
+            lines.append((item, amount))
+    return lines
+
+
+def analyze_project_risk(project: ProjectProfile, iterations: int = DEFAULT_ITERATIONS) -> Dict:
+    """
+    Simulated total-cost distribution and contingency for the project's BOQ.
+    Runs the full iteration count; call it from a worker (see request_risk_analysis).
+    """
+    boq_items = project.boq_items or []
+    iterations = clamp_iterations(iterations)
+    digest = boq_digest(boq_items)
+
+    lines = costed_lines(boq_items)
+    if not lines:
+        return {'success': False, 'error': 'Project has no BOQ items with costs to simulate'}
+
+    item_keys = [_item_key(item) for item, _ in lines]
+    item_sigmas = _history_sigmas(project, {description for description, _ in item_keys})
+    fallback = _fallback_sigma(project)
+    amounts = [amount for _, amount in lines]
+    sigmas = [item_sigmas.get(item_key, fallback) for item_key in item_keys]
+
+    result = simulate_totals(amounts, sigmas, iterations, CORRELATION, int(digest[:8], 16))
+
+    base_total = sum(amounts)
+    contingency = {}
+    for level in ('p50', 'p80', 'p95'):
+        amount = max(result[level] - base_total, 0.0)
+        contingency[level] = {
+            'amount': round(amount, 2),
+            'percentage': round(amount / base_total * 100, 2),
+        }
+
+    drivers = sorted(
+        zip(lines, sigmas, result['variance_shares']), key=lambda entry: entry[2], reverse=True
+    )[:10]
+
+    analysis = {
+        'success': True,
+        'boq_version': digest,
+        'iterations': iterations,
+        'item_count': len(lines),
+        'items_with_history': sum(1 for item_key in item_keys if item_key in item_sigmas),
+        'fallback_sigma': round(fallback, 4),
+        'base_total': round(base_total, 2),
+        'mean': round(result['mean'], 2),
+        'std': round(result['std'], 2),
+        'p50': round(result['p50'], 2),
+        'p80': round(result['p80'], 2),
+        'p95': round(result['p95'], 2),
+        'range': [round(result['min'], 2), round(result['max'], 2)],
+        'contingency': contingency,
+        'recommended_contingency': contingency['p80'],
+        'risk_drivers': [{
+            'item_number': item.get('item_number'),
+            'description': item.get('description', ''),
+            'amount': round(amount, 2),
+            'sigma': round(sigma, 4),
+            'variance_share': round(share, 4),
+        } for (item, amount), sigma, share in drivers],
+        'histogram': result['histogram'],
+    }
+    return analysis
+
+
+def _find_risk_job(params: Dict) -> Optional[ExtractionJob]:
+    """Latest successful job for the params, else the latest job of any state"""
+    jobs = ExtractionJob.objects.filter(
+        job_type=JOB_TYPE,
+        params__project_id=params['project_id'],
+        params__boq_version=params['boq_version'],
+        params__iterations=params['iterations'],
+    )
+    return (
+        jobs.filter(status='SUCCEEDED').order_by('-finished_at').first()
+        or jobs.order_by('-created_at').first()
+    )
+
+
+def request_risk_analysis(project: ProjectProfile, iterations: int, created_by=None) -> Tuple[Optional[Dict], ExtractionJob]:
+    """
+    (analysis, job) for the project's current BOQ version. The analysis is None until
+    the job succeeds; a simulation is queued when none exists for this version yet.
+    """
+    params = {
+        'project_id': project.id,
+        'boq_version': boq_digest(project.boq_items or []),
+        'iterations': clamp_iterations(iterations),
+    }
+    job = _find_risk_job(params)
+    if job is None:
+        job = enqueue_task(JOB_TYPE, params, f"{project.project_id} BOQ cost risk", created_by=created_by)
+    if job.status == 'SUCCEEDED':
+        return decode_result(job.result), job
+    return None, job
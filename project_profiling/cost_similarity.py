@@ -0,0 +1,224 @@
+"""
+Cost History Similarity Index
+Keeps an in-memory feature matrix of approved ProjectTypeCostHistory records per
+project type and answers "comparable projects" queries by vectorized k-nearest-neighbour search
+"""
+
+import logging
+import threading
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .cache_versions import bump_version, get_version
+from .models import ProjectTypeCostHistory
+
+logger = logging.getLogger(__name__)
+
+VERSION_NAME = 'cost_similarity:{}'
+
+# Regions in match order, same groupings the estimation engines use
+REGION_KEYWORDS = [
+    ('NCR', ['MANILA', 'QUEZON CITY', 'MAKATI', 'TAGUIG', 'PASAY']),
+    ('CALABARZON', ['CAVITE', 'LAGUNA', 'BATANGAS', 'RIZAL']),
+    ('Central Luzon', ['BULACAN', 'PAMPANGA', 'NUEVA ECIJA']),
+    ('Cebu', ['CEBU']),
+    ('Davao', ['DAVAO']),
+]
+OTHER_REGION = 'Other'
+REGIONS = [region for region, _ in REGION_KEYWORDS] + [OTHER_REGION]
+
+PROJECT_CATEGORIES = ['PUB', 'PRI', 'REN', 'NEW']
+COMPLEXITY_ORDER = {'low_end': 0, 'mid_range': 1, 'high_end': 2}
+
+# Distance weights; numeric features are z-scored, categorical ones are 0/1 mismatches
+FEATURE_WEIGHTS = {
+    'lot_size': 1.0,
+    'cost_per_sqm': 1.0,
+    'region': 0.75,
+    'category': 0.5,
+    'complexity': 0.5,
+}
+
+INITIAL_CAPACITY = 64
+
+
+def classify_region(location: Optional[str]) -> str:
+    location_upper = (location or '').upper()
+    for region, keywords in REGION_KEYWORDS:
+        if any(keyword in location_upper for keyword in keywords):
+            return region
+    return OTHER_REGION
+
+
+def _category_code(category: Optional[str]) -> int:
+    category = (category or '').upper()
+    return PROJECT_CATEGORIES.index(category) if category in PROJECT_CATEGORIES else -1
+
+
+class SimilarityIndex:
+    """
+    Column-oriented feature store for one project type.
+
+    Rows live in preallocated arrays that double when full, so approved records
+    are appended in amortized O(1). Normalization (mean/std of the log features)
+    is computed at query time over the live rows, so appends never go stale.
+    """
+
+    def __init__(self, project_type_id: int, version: int, capacity: int = INITIAL_CAPACITY):
+        self.project_type_id = project_type_id
+        self.version = version
+        self.size = 0
+        self.ids = np.zeros(capacity, dtype=np.int64)
+        self.log_lot_size = np.zeros(capacity, dtype=np.float64)
+        self.log_cost_per_sqm = np.zeros(capacity, dtype=np.float64)
+        self.region = np.zeros(capacity, dtype=np.int8)
+        self.category = np.zeros(capacity, dtype=np.int8)
+        self.complexity = np.zeros(capacity, dtype=np.int8)
+
+    @classmethod
+    def build(cls, project_type_id: int, version: int) -> 'SimilarityIndex':
+        rows = list(
+            ProjectTypeCostHistory.objects.filter(project_type_id=project_type_id, is_approved=True)
+            .values_list('id', 'lot_size', 'cost_per_sqm', 'location', 'project_category', 'complexity_level')
+        )
+        index = cls(project_type_id, version, capacity=max(INITIAL_CAPACITY, len(rows)))
+        for row in rows:
+            index.add(*row)
+        return index
+
+    def add(self, record_id, lot_size, cost_per_sqm, location, project_category, complexity_level):
+        if not lot_size or lot_size <= 0 or not cost_per_sqm or cost_per_sqm <= 0:
+            return
+        if self.size == len(self.ids):
+            self._grow()
+        i = self.size
+        self.ids[i] = record_id
+        self.log_lot_size[i] = np.log(float(lot_size))
+        self.log_cost_per_sqm[i] = np.log(float(cost_per_sqm))
+        self.region[i] = REGIONS.index(classify_region(location))
+        self.category[i] = _category_code(project_category)
+        self.complexity[i] = COMPLEXITY_ORDER.get(complexity_level, 1)
+        self.size += 1
+
+    def _grow(self):
+        capacity = len(self.ids) * 2
+        for name in ('ids', 'log_lot_size', 'log_cost_per_sqm', 'region', 'category', 'complexity'):
+            column = getattr(self, name)
+            grown = np.zeros(capacity, dtype=column.dtype)
+            grown[:self.size] = column[:self.size]
+            setattr(self, name, grown)
+
+    def query(
+        self,
+        lot_size,
+        location: Optional[str] = None,
+        project_category: Optional[str] = None,
+        complexity_level: Optional[str] = None,
+        cost_per_sqm=None,
+        k: int = 10,
+    ) -> List[Tuple[int, float]]:
+        """Return up to k (record_id, distance) pairs, nearest first"""
+        n = self.size
+        if n == 0 or not lot_size or lot_size <= 0:
+            return []
+
+        squared = np.zeros(n, dtype=np.float64)
+
+        def add_numeric(column, value, weight):
+            values = column[:n]
+            std = values.std()
+            scale = std if std > 0 else 1.0
+            squared[:] += weight * ((values - np.log(float(value))) / scale) ** 2
+
+        add_numeric(self.log_lot_size, lot_size, FEATURE_WEIGHTS['lot_size'])
+        if cost_per_sqm and cost_per_sqm > 0:
+            add_numeric(self.log_cost_per_sqm, cost_per_sqm, FEATURE_WEIGHTS['cost_per_sqm'])
+        if location:
+            region = REGIONS.index(classify_region(location))
+            squared += FEATURE_WEIGHTS['region'] * (self.region[:n] != region)
+        if project_category:
+            squared += FEATURE_WEIGHTS['category'] * (self.category[:n] != _category_code(project_category))
+        if complexity_level in COMPLEXITY_ORDER:
+            steps = np.abs(self.complexity[:n].astype(np.float64) - COMPLEXITY_ORDER[complexity_level]) / 2
+            squared += FEATURE_WEIGHTS['complexity'] * steps ** 2
+
+        k = min(k, n)
+        nearest = np.argpartition(squared, k - 1)[:k]
+        nearest = nearest[np.argsort(squared[nearest], kind='stable')]
+        return [(int(self.ids[i]), float(np.sqrt(squared[i]))) for i in nearest]
+
+
+_indexes: Dict[int, SimilarityIndex] = {}
+_lock = threading.Lock()
+
+
+def _version_name(project_type_id: int) -> str:
+    return VERSION_NAME.format(project_type_id)
+
+
+def get_index(project_type_id: int) -> SimilarityIndex:
+    """Return the index for a project type, rebuilding it when its shared version moved"""
+    version = get_version(_version_name(project_type_id))
+    index = _indexes.get(project_type_id)
+    if index is not None and index.version == version:
+        return index
+
+    with _lock:
+        index = _indexes.get(project_type_id)
+        if index is None or index.version != version:
+            index = SimilarityIndex.build(project_type_id, version)
+            _indexes[project_type_id] = index
+            logger.debug("Built cost similarity index for project type %s (%s rows)", project_type_id, index.size)
+        return index
+
+
+def _bump_version(project_type_id: int) -> int:
+    return bump_version(_version_name(project_type_id))
+
+
+def add_to_index(record: ProjectTypeCostHistory):
+    """
+    Append a newly approved record. This process updates its index in place;
+    other processes see the version bump and rebuild on their next query.
+    """
+    with _lock:
+        index = _indexes.get(record.project_type_id)
+        version = _bump_version(record.project_type_id)
+        # Any other bump since the index was built means it is missing changes
+        if index is None or index.version != version - 1:
+            _indexes.pop(record.project_type_id, None)
+            return
+        index.add(
+            record.id, record.lot_size, record.cost_per_sqm, record.location,
+            record.project_category, record.complexity_level
+        )
+        index.version = version
+
+
+def invalidate_index(project_type_id: int):
+    """Drop the index after edits or deletes; it is rebuilt lazily"""
+    with _lock:
+        _bump_version(project_type_id)
+        _indexes.pop(project_type_id, None)
+
+
+def find_comparable_projects(
+    project_type_id: int,
+    lot_size,
+    location: Optional[str] = None,
+    project_category: Optional[str] = None,
+    complexity_level: Optional[str] = None,
+    cost_per_sqm=None,
+    k: int = 10,
+) -> List[Tuple[ProjectTypeCostHistory, float]]:
+    """Top-k approved history records for the query, with their distances"""
+    matches = get_index(project_type_id).query(
+        lot_size, location, project_category, complexity_level, cost_per_sqm, k
+    )
+    if not matches:
+        return []
+    records = ProjectTypeCostHistory.objects.select_related('project').in_bulk(
+        [record_id for record_id, _ in matches]
+    )
+    return [(records[record_id], distance) for record_id, distance in matches if record_id in records]
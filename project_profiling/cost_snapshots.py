@@ -0,0 +1,230 @@
+"""
+Cost Period Snapshots
+Closes monthly cost periods into CostPeriodSnapshot rows so historical and trend
+reports read a handful of compact rows instead of re-scanning the ledgers
+"""
+
+import logging
+from collections import defaultdict
+from datetime import date, datetime, time
+from decimal import Decimal
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from django.db import transaction
+from django.db.models import DecimalField, ExpressionWrapper, F, Min, Q, Sum
+from django.utils import timezone
+
+from .models import (
+    CostCategory, CostPeriodSnapshot, Expense, FundAllocation, MobilizationCost,
+    ProjectBudget, SubcontractorExpense, SubcontractorPayment
+)
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_FIELDS = ['planned', 'allocated', 'spent', 'committed', 'mobilization']
+
+
+def month_start(value: date) -> date:
+    return date(value.year, value.month, 1)
+
+
+def next_month(value: date) -> date:
+    if value.month == 12:
+        return date(value.year + 1, 1, 1)
+    return date(value.year, value.month + 1, 1)
+
+
+def previous_month(value: date) -> date:
+    if value.month == 1:
+        return date(value.year - 1, 12, 1)
+    return date(value.year, value.month - 1, 1)
+
+
+def parse_period(value: str) -> date:
+    """Parse 'YYYY-MM' (or a full ISO date) into the first day of that month"""
+    return month_start(datetime.strptime(value[:7], '%Y-%m').date())
+
+
+def iter_periods(start: date, end: date) -> Iterable[date]:
+    """Yield month starts from start to end inclusive"""
+    period = month_start(start)
+    while period <= end:
+        yield period
+        period = next_month(period)
+
+
+def earliest_ledger_date() -> Optional[date]:
+    """Earliest month with any cost activity, used for backfills"""
+    candidates = [
+        Expense.objects.aggregate(first=Min('expense_date'))['first'],
+        FundAllocation.objects.aggregate(first=Min('date_allocated'))['first'],
+        MobilizationCost.objects.aggregate(first=Min('date_incurred'))['first'],
+        SubcontractorPayment.objects.aggregate(first=Min('payment_date'))['first'],
+    ]
+    budget_created = ProjectBudget.objects.aggregate(first=Min('created_at'))['first']
+    if budget_created:
+        candidates.append(timezone.localtime(budget_created).date())
+    candidates = [c for c in candidates if c]
+    return min(candidates) if candidates else None
+
+
+def close_period(period: date, project_ids: Optional[List[int]] = None) -> int:
+    """
+    Compute cumulative figures as of the end of `period` for every (project, category)
+    and upsert them as snapshot rows. One grouped query per source ledger.
+    Existing rows of the period that no longer have any figures (within the scoped
+    projects) are zeroed. Returns the number of snapshot rows written.
+    """
+    period = month_start(period)
+    period_end = next_month(period)  # exclusive bound
+    period_end_dt = timezone.make_aware(datetime.combine(period_end, time.min))
+
+    totals: Dict[Tuple[int, str], Dict[str, Decimal]] = defaultdict(
+        lambda: {field: Decimal('0') for field in SNAPSHOT_FIELDS}
+    )
+
+    def scoped(queryset, project_field):
+        if project_ids is not None:
+            return queryset.filter(**{f'{project_field}__in': project_ids})
+        return queryset
+
+    def add(rows, project_key, category_key, field, category=None):
+        for row in rows:
+            key = (row[project_key], category or row[category_key])
+            totals[key][field] += row['total'] or Decimal('0')
+
+    # Planned: budgets that existed by the period end
+    add(
+        scoped(ProjectBudget.objects, 'project_id')
+        .filter(created_at__lt=period_end_dt)
+        .values('project_id', 'category').annotate(total=Sum('planned_amount')),
+        'project_id', 'category', 'planned'
+    )
+
+    # Allocated: allocations dated by the period end and not deleted before it
+    add(
+        scoped(FundAllocation.objects, 'project_budget__project_id')
+        .filter(date_allocated__lt=period_end)
+        .filter(Q(is_deleted=False) | Q(deleted_at__gte=period_end_dt))
+        .values('project_budget__project_id', 'project_budget__category')
+        .annotate(total=Sum('amount')),
+        'project_budget__project_id', 'project_budget__category', 'allocated'
+    )
+
+    # Spent: recorded expenses plus approved/paid subcontractor payments
+    add(
+        scoped(Expense.objects, 'project_id')
+        .filter(expense_date__lt=period_end)
+        .values('project_id', 'budget_category__category')
+        .annotate(total=Sum('amount')),
+        'project_id', 'budget_category__category', 'spent'
+    )
+    add(
+        scoped(SubcontractorPayment.objects, 'subcontractor_expense__project_id')
+        .filter(payment_date__lt=period_end, status__in=SubcontractorPayment.PAID_STATUSES)
+        .values('subcontractor_expense__project_id')
+        .annotate(total=Sum('amount')),
+        'subcontractor_expense__project_id', None, 'spent', category=CostCategory.SUBCONTRACTOR
+    )
+
+    # Committed: subcontract value signed by the period end
+    add(
+        scoped(SubcontractorExpense.objects, 'project_id')
+        .filter(created_at__lt=period_end_dt)
+        .exclude(status='CANC')
+        .values('project_id').annotate(total=Sum('contract_amount')),
+        'project_id', None, 'committed', category=CostCategory.SUBCONTRACTOR
+    )
+
+    # Mobilization: itemized mobilization costs incurred by the period end
+    line_total = ExpressionWrapper(
+        F('quantity') * F('unit_cost'),
+        output_field=DecimalField(max_digits=25, decimal_places=4)
+    )
+    add(
+        scoped(MobilizationCost.objects, 'project_id')
+        .filter(date_incurred__lt=period_end)
+        .values('project_id').annotate(total=Sum(line_total)),
+        'project_id', None, 'mobilization', category=CostCategory.MOBILIZATION
+    )
+
+    closed_at = timezone.now()
+    snapshots = [
+        CostPeriodSnapshot(
+            project_id=project_id,
+            category=category,
+            period=period,
+            closed_at=closed_at,
+            **{field: amount.quantize(Decimal('0.01')) for field, amount in values.items()}
+        )
+        for (project_id, category), values in totals.items()
+    ]
+
+    with transaction.atomic():
+        CostPeriodSnapshot.objects.bulk_create(
+            snapshots,
+            batch_size=500,
+            update_conflicts=True,
+            unique_fields=['project', 'category', 'period'],
+            update_fields=SNAPSHOT_FIELDS + ['closed_at'],
+        )
+        # Zeroed rather than deleted, so snapshots_as_of does not fall back to an older period
+        existing = scoped(CostPeriodSnapshot.objects.filter(period=period), 'project_id')
+        stale_ids = [
+            pk for pk, project_id, category in existing.values_list('id', 'project_id', 'category')
+            if (project_id, category) not in totals
+        ]
+        if stale_ids:
+            CostPeriodSnapshot.objects.filter(pk__in=stale_ids).update(
+                closed_at=closed_at, **{field: Decimal('0') for field in SNAPSHOT_FIELDS}
+            )
+
+    logger.info(
+        "Closed cost period %s: %s snapshot rows, %s zeroed",
+        period.strftime('%Y-%m'), len(snapshots), len(stale_ids)
+    )
+    return len(snapshots) + len(stale_ids)
+
+
+def snapshots_as_of(project_id: int, period: date) -> List[CostPeriodSnapshot]:
+    """Category rows for the latest closed period at or before `period`"""
+    latest = CostPeriodSnapshot.objects.filter(
+        project_id=project_id, period__lte=month_start(period)
+    ).order_by('-period').values_list('period', flat=True).first()
+    if not latest:
+        return []
+    return list(CostPeriodSnapshot.objects.filter(project_id=project_id, period=latest))
+
+
+def snapshot_trend(project_id: int, start: date, end: date, category: Optional[str] = None) -> List[Dict]:
+    """
+    Month-by-month totals between start and end (inclusive) from one range scan,
+    with the month's own movement derived from consecutive cumulative values.
+    """
+    start = month_start(start)
+    # Include the month before the range so its first movement can be derived
+    queryset = CostPeriodSnapshot.objects.filter(
+        project_id=project_id,
+        period__gte=previous_month(start),
+        period__lte=month_start(end),
+    )
+    if category:
+        queryset = queryset.filter(category=category)
+
+    by_period: Dict[date, Dict[str, Decimal]] = {}
+    for row in queryset.values('period', *SNAPSHOT_FIELDS).order_by('period'):
+        bucket = by_period.setdefault(row['period'], {field: Decimal('0') for field in SNAPSHOT_FIELDS})
+        for field in SNAPSHOT_FIELDS:
+            bucket[field] += row[field]
+
+    trend = []
+    previous = None
+    for period in sorted(by_period):
+        values = by_period[period]
+        if period >= start:
+            entry = {'period': period.strftime('%Y-%m')}
+            entry.update({field: float(values[field]) for field in SNAPSHOT_FIELDS})
+            entry['spent_in_period'] = float(values['spent'] - (previous['spent'] if previous else Decimal('0')))
+            trend.append(entry)
+        previous = values
+    return trend
@@ -0,0 +1,147 @@
+"""
+Cost Statistics Service
+Distribution statistics (quantiles, spread, IQR outliers, bootstrap confidence
+intervals) of approved cost per sqm for each project type, cached until the
+project type's cost history changes
+"""
+
+import logging
+from typing import Dict, Optional
+
+import numpy as np
+from django.core.cache import cache
+
+from .cache_versions import bump_version, get_version
+from .models import ProjectTypeCostHistory
+
+logger = logging.getLogger(__name__)
+
+VERSION_NAME = 'cost_statistics:{}'
+CACHE_KEY = 'project_profiling:cost_statistics:{}:{}'
+# Bounds memory held by project types nobody queries any more
+CACHE_TIMEOUT = 60 * 60
+
+COMPLEXITY_LEVELS = ('low_end', 'mid_range', 'high_end')
+BREAKDOWN_FIELDS = (
+    'materials_cost', 'labor_cost', 'equipment_cost',
+    'permits_cost', 'contingency_cost', 'overhead_cost',
+)
+
+BOOTSTRAP_RESAMPLES = 1000
+BOOTSTRAP_CHUNK = 2_000_000  # max resampled values held in memory at once
+CONFIDENCE = 0.95
+IQR_FENCE = 1.5
+
+
+def _bootstrap_interval(values: np.ndarray, rng: np.random.Generator) -> Optional[Dict[str, float]]:
+    """Percentile bootstrap CI for the mean and the median"""
+    n = len(values)
+    if n < 2:
+        return None
+
+    rows_per_chunk = max(1, BOOTSTRAP_CHUNK // n)
+    means, medians = [], []
+    remaining = BOOTSTRAP_RESAMPLES
+    while remaining:
+        rows = min(rows_per_chunk, remaining)
+        sample = values[rng.integers(0, n, size=(rows, n))]
+        means.append(sample.mean(axis=1))
+        medians.append(np.median(sample, axis=1))
+        remaining -= rows
+
+    tail = (1 - CONFIDENCE) / 2 * 100
+    mean_low, mean_high = np.percentile(np.concatenate(means), [tail, 100 - tail])
+    median_low, median_high = np.percentile(np.concatenate(medians), [tail, 100 - tail])
+    return {
+        'level': CONFIDENCE,
+        'mean_low': round(float(mean_low), 2),
+        'mean_high': round(float(mean_high), 2),
+        'median_low': round(float(median_low), 2),
+        'median_high': round(float(median_high), 2),
+    }
+
+
+def describe(values: np.ndarray, rng: np.random.Generator) -> Dict:
+    """Summary of one cost-per-sqm sample; empty samples give count 0 and no figures"""
+    n = len(values)
+    if n == 0:
+        return {'count': 0}
+
+    p10, q1, p50, q3, p90 = np.percentile(values, [10, 25, 50, 75, 90])
+    iqr = q3 - q1
+    lower_fence = q1 - IQR_FENCE * iqr
+    upper_fence = q3 + IQR_FENCE * iqr
+    inliers = values[(values >= lower_fence) & (values <= upper_fence)]
+
+    return {
+        'count': n,
+        'mean': round(float(values.mean()), 2),
+        'std': round(float(values.std(ddof=1)), 2) if n > 1 else 0.0,
+        'min': round(float(values.min()), 2),
+        'max': round(float(values.max()), 2),
+        'p10': round(float(p10), 2),
+        'p50': round(float(p50), 2),
+        'p90': round(float(p90), 2),
+        'q1': round(float(q1), 2),
+        'q3': round(float(q3), 2),
+        'iqr': round(float(iqr), 2),
+        'outlier_fences': [round(float(lower_fence), 2), round(float(upper_fence), 2)],
+        'outlier_count': int(n - len(inliers)),
+        'trimmed_mean': round(float(inliers.mean()), 2) if len(inliers) else round(float(values.mean()), 2),
+        'confidence_interval': _bootstrap_interval(values, rng),
+    }
+
+
+def compute_cost_statistics(project_type_id: int) -> Dict:
+    """Compute statistics from the approved history of a project type in one query"""
+    rows = list(
+        ProjectTypeCostHistory.objects.filter(project_type_id=project_type_id, is_approved=True)
+        .values_list('id', 'complexity_level', 'cost_per_sqm', 'total_cost', *BREAKDOWN_FIELDS)
+    )
+    if not rows:
+        return {'total_projects': 0}
+
+    ids = np.array([row[0] for row in rows], dtype=np.int64)
+    complexity = np.array([row[1] for row in rows])
+    numbers = np.array([[float(value or 0) for value in row[2:]] for row in rows], dtype=np.float64)
+    cost_per_sqm = numbers[:, 0]
+    total_cost = numbers[:, 1]
+
+    # Seeded per project type so repeated computations give the same intervals
+    rng = np.random.default_rng(project_type_id)
+
+    overall = describe(cost_per_sqm, rng)
+    lower_fence, upper_fence = overall['outlier_fences']
+    outlier_ids = ids[(cost_per_sqm < lower_fence) | (cost_per_sqm > upper_fence)]
+
+    averages = numbers[:, 1:].mean(axis=0)
+    return {
+        'total_projects': len(rows),
+        'cost_per_sqm': overall,
+        'by_complexity': {
+            level: describe(cost_per_sqm[complexity == level], rng)
+            for level in COMPLEXITY_LEVELS
+        },
+        'outlier_ids': outlier_ids.tolist(),
+        'total_cost_range': [round(float(total_cost.min()), 2), round(float(total_cost.max()), 2)],
+        'averages': {
+            field: round(float(value), 2)
+            for field, value in zip(('total_cost',) + BREAKDOWN_FIELDS, averages)
+        },
+    }
+
+
+def get_cost_statistics(project_type_id: int) -> Dict:
+    """Cached statistics for a project type; recomputed after invalidate_cost_statistics"""
+    key = CACHE_KEY.format(project_type_id, get_version(VERSION_NAME.format(project_type_id)))
+    stats = cache.get(key)
+    if stats is None:
+        stats = compute_cost_statistics(project_type_id)
+        cache.set(key, stats, CACHE_TIMEOUT)
+        logger.debug("Computed cost statistics for project type %s", project_type_id)
+    return stats
+
+
+def invalidate_cost_statistics(project_type_id: int):
+    """Retire the cached statistics in every process; the cache may be per-process"""
+    bump_version(VERSION_NAME.format(project_type_id))
@@ -7,15 +7,27 @@ from django.shortcuts import render, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.views.decorators.http import require_http_methods
 from django.http import JsonResponse, HttpResponse
-from django.db.models import Sum
+from django.db.models import Sum, Count, Q, F, DecimalField, ExpressionWrapper
+from django.db import transaction
+from django.utils import timezone
 from django.utils.timezone import localtime
-from decimal import Decimal
+from decimal import Decimal, InvalidOperation
 
 from authentication.utils.decorators import verified_email_required, role_required
 from authentication.views import verify_user_token
 from .models import (
     ProjectProfile, SubcontractorExpense, SubcontractorPayment,
-    MobilizationCost
+    SubcontractorPaymentCounter, MobilizationCost
+)
+from .utils import keyset_paginate, get_page_size
+
+# Columns the list APIs accept in ?sort= (prefix with '-' for descending)
+SUBCONTRACTOR_SORT_FIELDS = {'created_at', 'contract_amount', 'amount_paid', 'subcontractor_name'}
+MOBILIZATION_SORT_FIELDS = {'date_incurred', 'created_at', 'unit_cost', 'line_total'}
+
+MOBILIZATION_LINE_TOTAL = ExpressionWrapper(
+    F('quantity') * F('unit_cost'),
+    output_field=DecimalField(max_digits=25, decimal_places=4)
 )
 
 
@@ -74,21 +86,54 @@ def api_subcontractor_list(request):
                 'subcontractor_id': subcon.id
             })
 
-        # GET - List subcontractors
+        # GET - List subcontractors (filtered, sorted and keyset-paginated)
         else:
             # Get subcontractors based on role
             if user_profile.role in ['EG', 'OM']:
-                subcontractors = SubcontractorExpense.objects.select_related('project').all()
+                subcontractors = SubcontractorExpense.objects.all()
             elif user_profile.role == 'PM':
-                subcontractors = SubcontractorExpense.objects.select_related('project').filter(
+                subcontractors = SubcontractorExpense.objects.filter(
                     project__project_manager=user_profile
                 )
             else:
                 subcontractors = SubcontractorExpense.objects.none()
 
+            # Apply filters
+            project_id = request.GET.get('project')
+            if project_id:
+                subcontractors = subcontractors.filter(project_id=project_id)
+
+            status = request.GET.get('status')
+            if status:
+                subcontractors = subcontractors.filter(status=status)
+
+            date_from = request.GET.get('date_from')
+            if date_from:
+                subcontractors = subcontractors.filter(start_date__gte=date_from)
+
+            date_to = request.GET.get('date_to')
+            if date_to:
+                subcontractors = subcontractors.filter(start_date__lte=date_to)
+
+            sort = request.GET.get('sort', '-created_at')
+            sort_field = sort.lstrip('-')
+            if sort_field not in SUBCONTRACTOR_SORT_FIELDS:
+                return JsonResponse({'error': f'Invalid sort field: {sort_field}'}, status=400)
+
+            try:
+                page, next_cursor = keyset_paginate(
+                    subcontractors.select_related('project'),
+                    sort_field,
+                    descending=sort.startswith('-'),
+                    cursor=request.GET.get('cursor'),
+                    limit=get_page_size(request),
+                )
+            except ValueError as e:
+                return JsonResponse({'error': str(e)}, status=400)
+
             # Format response
             data = []
-            for subcon in subcontractors:
+            for subcon in page:
                 data.append({
                     'id': subcon.id,
                     'subcontractor_name': subcon.subcontractor_name,
@@ -108,19 +153,23 @@ def api_subcontractor_list(request):
                     'start_date': subcon.start_date.isoformat() if subcon.start_date else None,
                 })
 
-            # Calculate stats
-            total_subcontractors = subcontractors.count()
-            active_contracts = subcontractors.filter(status='PROG').count()
-            total_contract_value = subcontractors.aggregate(total=Sum('contract_amount'))['total'] or 0
-            total_paid = subcontractors.aggregate(total=Sum('amount_paid'))['total'] or 0
+            # Calculate stats over the whole filtered set in a single query
+            stats = subcontractors.aggregate(
+                total_subcontractors=Count('id'),
+                active_contracts=Count('id', filter=Q(status='PROG')),
+                total_contract_value=Sum('contract_amount'),
+                total_paid=Sum('amount_paid'),
+            )
 
             return JsonResponse({
                 'subcontractors': data,
+                'next_cursor': next_cursor,
+                'has_more': next_cursor is not None,
                 'stats': {
-                    'total_subcontractors': total_subcontractors,
-                    'active_contracts': active_contracts,
-                    'total_contract_value': float(total_contract_value),
-                    'total_paid': float(total_paid),
+                    'total_subcontractors': stats['total_subcontractors'],
+                    'active_contracts': stats['active_contracts'],
+                    'total_contract_value': float(stats['total_contract_value'] or 0),
+                    'total_paid': float(stats['total_paid'] or 0),
                 }
             })
 
@@ -296,16 +345,115 @@ def api_create_payment(request, subcon_id):
             created_by=user_profile
         )
 
-        # Update subcontractor amount_paid
-        subcon.amount_paid += Decimal(amount)
-        subcon.save()
+        # amount_paid only moves when the payment is approved/paid (see SubcontractorPayment.save)
 
         return JsonResponse({
             'success': True,
             'message': 'Payment created successfully',
-            'payment_id': payment.id
+            'payment_id': payment.id,
+            'payment_number': payment.payment_number
+        })
+
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=500)
+
+
+@login_required
+@verified_email_required
+@require_http_methods(["POST"])
+@role_required('EG', 'OM')
+def api_import_payment_schedule(request, subcon_id):
+    """
+    Import a milestone payment schedule for a subcontractor in one transaction.
+    Body: {"payments": [{"milestone_description", "amount", "payment_date",
+                         "payment_method"?, "reference_number"?, "notes"?, "status"?}, ...]}
+    """
+    import json
+
+    try:
+        user_profile = request.user.userprofile
+        subcon = get_object_or_404(SubcontractorExpense, id=subcon_id)
+
+        data = json.loads(request.body)
+        rows = data.get('payments') or []
+        if not rows:
+            return JsonResponse({'error': 'No payments provided'}, status=400)
+
+        valid_methods = {code for code, _ in SubcontractorPayment.PAYMENT_METHODS}
+        valid_statuses = {code for code, _ in SubcontractorPayment.PAYMENT_STATUS}
+
+        # Validate every row before touching the database
+        errors = []
+        cleaned = []
+        for index, row in enumerate(rows, start=1):
+            milestone_description = (row.get('milestone_description') or '').strip()
+            payment_date = row.get('payment_date')
+            payment_method = row.get('payment_method', 'BANK')
+            status = row.get('status', 'PEND')
+
+            if not milestone_description or row.get('amount') in (None, '') or not payment_date:
+                errors.append({'row': index, 'error': 'Missing required fields'})
+                continue
+            try:
+                amount = Decimal(str(row.get('amount')))
+            except (InvalidOperation, ValueError):
+                errors.append({'row': index, 'error': 'Invalid amount'})
+                continue
+            if amount <= 0:
+                errors.append({'row': index, 'error': 'Amount must be greater than zero'})
+                continue
+            if payment_method not in valid_methods:
+                errors.append({'row': index, 'error': f'Invalid payment method: {payment_method}'})
+                continue
+            if status not in valid_statuses:
+                errors.append({'row': index, 'error': f'Invalid status: {status}'})
+                continue
+
+            cleaned.append({
+                'milestone_description': milestone_description,
+                'amount': amount,
+                'payment_method': payment_method,
+                'payment_date': payment_date,
+                'reference_number': (row.get('reference_number') or '').strip(),
+                'notes': (row.get('notes') or '').strip(),
+                'status': status,
+            })
+
+        if errors:
+            return JsonResponse({'error': 'Validation failed', 'row_errors': errors}, status=400)
+
+        now = timezone.now()
+        with transaction.atomic():
+            first_number = SubcontractorPaymentCounter.reserve(subcon.id, count=len(cleaned))
+            payments = []
+            for offset, row in enumerate(cleaned):
+                approved = row['status'] in SubcontractorPayment.PAID_STATUSES
+                payments.append(SubcontractorPayment(
+                    subcontractor_expense=subcon,
+                    payment_number=first_number + offset,
+                    created_by=user_profile,
+                    approved_by=user_profile if approved else None,
+                    approved_at=now if approved else None,
+                    **row
+                ))
+            SubcontractorPayment.objects.bulk_create(payments, batch_size=500)
+
+            # bulk_create skips save(), so apply the amount_paid delta once for the batch
+            paid_delta = sum(
+                (SubcontractorPayment.paid_contribution(p.status, p.amount) for p in payments),
+                Decimal('0')
+            )
+            SubcontractorExpense.apply_paid_delta(subcon.id, paid_delta)
+
+        return JsonResponse({
+            'success': True,
+            'message': f'{len(payments)} payments imported successfully',
+            'created': len(payments),
+            'payment_numbers': [first_number, first_number + len(payments) - 1],
         })
 
+    except json.JSONDecodeError:
+        return JsonResponse({'error': 'Invalid JSON'}, status=400)
     except Exception as e:
         return JsonResponse({'error': str(e)}, status=500)
 
@@ -333,15 +481,15 @@ def mobilization_costs(request, token, role):
 @verified_email_required
 @require_http_methods(["GET"])
 def api_mobilization_costs_list(request):
-    """Get list of mobilization costs"""
+    """Get a filtered, sorted, keyset-paginated page of mobilization costs"""
     try:
         user_profile = request.user.userprofile
 
         # Get costs based on role
         if user_profile.role in ['EG', 'OM']:
-            costs = MobilizationCost.objects.select_related('project').all()
+            costs = MobilizationCost.objects.all()
         elif user_profile.role == 'PM':
-            costs = MobilizationCost.objects.select_related('project').filter(
+            costs = MobilizationCost.objects.filter(
                 project__project_manager=user_profile
             )
         else:
@@ -356,13 +504,38 @@ def api_mobilization_costs_list(request):
         if category:
             costs = costs.filter(category=category)
 
-        costs = costs.order_by('-date_incurred')
+        date_from = request.GET.get('date_from')
+        if date_from:
+            costs = costs.filter(date_incurred__gte=date_from)
+
+        date_to = request.GET.get('date_to')
+        if date_to:
+            costs = costs.filter(date_incurred__lte=date_to)
+
+        costs = costs.annotate(line_total=MOBILIZATION_LINE_TOTAL)
+
+        sort = request.GET.get('sort', '-date_incurred')
+        sort_field = sort.lstrip('-')
+        if sort_field not in MOBILIZATION_SORT_FIELDS:
+            return JsonResponse({'error': f'Invalid sort field: {sort_field}'}, status=400)
+
+        try:
+            page, next_cursor = keyset_paginate(
+                costs.select_related('project'),
+                sort_field,
+                descending=sort.startswith('-'),
+                cursor=request.GET.get('cursor'),
+                limit=get_page_size(request),
+            )
+        except ValueError as e:
+            return JsonResponse({'error': str(e)}, status=400)
 
         # Format response
         data = []
-        for cost in costs:
+        for cost in page:
             data.append({
                 'id': cost.id,
+                'project_id': cost.project.id,
                 'project_name': cost.project.project_name,
                 'category': cost.category,
                 'category_display': cost.get_category_display(),
@@ -370,25 +543,30 @@ def api_mobilization_costs_list(request):
                 'quantity': float(cost.quantity),
                 'unit': cost.unit,
                 'unit_cost': float(cost.unit_cost),
-                'total_cost': float(cost.total_cost),
+                'total_cost': float(cost.line_total),
+                'amount': float(cost.line_total),
                 'vendor_name': cost.vendor_name,
                 'date_incurred': cost.date_incurred.isoformat(),
             })
 
-        # Calculate totals by category
+        # Calculate totals by category in one grouped query
+        category_labels = dict(MobilizationCost.MOBILIZATION_CATEGORIES)
         totals_by_category = {}
-        for cost in costs:
-            cat = cost.get_category_display()
-            if cat not in totals_by_category:
-                totals_by_category[cat] = 0
-            totals_by_category[cat] += float(cost.total_cost)
+        for row in costs.order_by().values('category').annotate(total=Sum('line_total')):
+            totals_by_category[category_labels.get(row['category'], row['category'])] = float(row['total'] or 0)
 
         grand_total = sum(totals_by_category.values())
 
         return JsonResponse({
             'costs': data,
+            'next_cursor': next_cursor,
+            'has_more': next_cursor is not None,
             'totals_by_category': totals_by_category,
             'grand_total': grand_total,
+            'summary': {
+                'total': grand_total,
+                'transportation': totals_by_category.get(category_labels['TRANSPORT'], 0),
+            },
         })
 
     except Exception as e:
@@ -0,0 +1,60 @@
+"""
+Document Library Statistics
+Document counts per type, stage and archived state with their total size, computed
+in a single conditional aggregate and cached per user scope until a document changes
+"""
+
+import logging
+from typing import Dict
+
+from django.core.cache import cache
+from django.db.models import Count, Q, Sum
+
+from .cache_versions import bump_version, get_version
+from .models import ProjectDocument
+
+logger = logging.getLogger(__name__)
+
+VERSION_NAME = 'document_stats'
+CACHE_KEY = 'project_profiling:document_stats:{version}:{scope}'
+# Also bounds staleness after project manager reassignments, which do not write documents
+CACHE_TIMEOUT = 10 * 60
+
+
+def compute_document_stats(documents) -> Dict:
+    """Counts and total size of the given documents queryset in one query"""
+    aggregates = {
+        'total': Count('id'),
+        'archived': Count('id', filter=Q(is_archived=True)),
+        'total_size': Sum('file_size'),
+    }
+    for code, _ in ProjectDocument.DOCUMENT_TYPES:
+        aggregates[f'type_{code}'] = Count('id', filter=Q(document_type=code))
+    for code, _ in ProjectDocument.PROJECT_STAGES:
+        aggregates[f'stage_{code}'] = Count('id', filter=Q(project_stage=code))
+
+    totals = documents.aggregate(**aggregates)
+    return {
+        'total': totals['total'],
+        'archived': totals['archived'],
+        'active': totals['total'] - totals['archived'],
+        'total_size_bytes': totals['total_size'] or 0,
+        'by_type': {code: totals[f'type_{code}'] for code, _ in ProjectDocument.DOCUMENT_TYPES},
+        'by_stage': {code: totals[f'stage_{code}'] for code, _ in ProjectDocument.PROJECT_STAGES},
+    }
+
+
+def get_document_stats(documents, scope: str) -> Dict:
+    """Cached compute_document_stats; scope names the user's visible set (e.g. 'all', 'pm:12')"""
+    key = CACHE_KEY.format(version=get_version(VERSION_NAME), scope=scope)
+    stats = cache.get(key)
+    if stats is None:
+        stats = compute_document_stats(documents)
+        cache.set(key, stats, CACHE_TIMEOUT)
+        logger.debug("Computed document stats for scope %s", scope)
+    return stats
+
+
+def invalidate_document_stats():
+    """Any document write can change several scopes, so every cached entry is retired at once"""
+    bump_version(VERSION_NAME)
@@ -0,0 +1,352 @@
+"""
+Bulk Expense Import
+Streams expense rows from CSV/XLSX files, maps them to ProjectBudget categories
+and writes them with chunked bulk_create
+"""
+
+import csv
+import io
+import logging
+import os
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from django.db import transaction
+from django.db.models import Sum
+from django.utils.dateparse import parse_date
+
+from .models import CostCategory, Expense, FundAllocation, ProjectBudget
+
+logger = logging.getLogger(__name__)
+
+try:
+    import openpyxl
+    EXCEL_AVAILABLE = True
+except ImportError:
+    EXCEL_AVAILABLE = False
+    logger.warning("Excel processing library not available. Install openpyxl for Excel support.")
+
+
+class ExpenseImporter:
+    """
+    Imports a month-end batch of expenses for one project.
+
+    Rows are read lazily (csv reader / openpyxl read-only mode), validated against
+    budget balances loaded up front in two grouped queries, and inserted in chunks
+    inside a single transaction. Invalid rows are reported and skipped; valid rows are kept.
+    """
+
+    SUPPORTED_EXTENSIONS = ['.csv', '.xlsx']
+    CHUNK_SIZE = 500
+
+    # Header aliases -> canonical column name
+    COLUMN_ALIASES = {
+        'budget_id': 'budget_id',
+        'scope': 'scope',
+        'scope_name': 'scope',
+        'category': 'category',
+        'budget_category': 'category',
+        'expense_type': 'expense_type',
+        'type': 'expense_type',
+        'expense_other': 'expense_other',
+        'amount': 'amount',
+        'vendor': 'vendor',
+        'supplier': 'vendor',
+        'receipt_number': 'receipt_number',
+        'receipt_no': 'receipt_number',
+        'receipt': 'receipt_number',
+        'expense_date': 'expense_date',
+        'date': 'expense_date',
+        'description': 'description',
+        'notes': 'description',
+    }
+
+    DATE_FORMATS = ['%m/%d/%Y', '%d/%m/%Y', '%Y/%m/%d', '%b %d, %Y']
+
+    def __init__(self, project, created_by, chunk_size: int = CHUNK_SIZE):
+        self.project = project
+        self.created_by = created_by
+        self.chunk_size = chunk_size
+
+        # Cached lookups, loaded once per import
+        self._budgets_by_id: Dict[int, ProjectBudget] = {}
+        self._budgets_by_key: Dict[Tuple[str, str], ProjectBudget] = {}
+        self._budgets_by_category: Dict[str, List[ProjectBudget]] = {}
+        self._category_codes = self._build_choice_lookup(CostCategory.choices)
+        self._expense_types = self._build_choice_lookup(Expense.EXPENSE_TYPES)
+
+    # ------------------------------------------------------------------
+    # Public API
+    # ------------------------------------------------------------------
+    def run(self, file, dry_run: bool = False) -> Dict[str, Any]:
+        """Import all rows from an uploaded CSV/XLSX file"""
+        extension = os.path.splitext(file.name)[1].lower()
+        if extension not in self.SUPPORTED_EXTENSIONS:
+            return {'success': False, 'error': f'Unsupported file type: {extension}'}
+        if extension == '.xlsx' and not EXCEL_AVAILABLE:
+            return {'success': False, 'error': 'Excel support is not available on this server'}
+
+        self._load_budgets()
+        rows = self._iter_csv(file) if extension == '.csv' else self._iter_xlsx(file)
+
+        balances = self._load_balances()
+        row_errors: List[Dict[str, Any]] = []
+        pending: List[Expense] = []
+        added: Dict[int, Decimal] = {}
+        created = 0
+
+        with transaction.atomic():
+            for row_number, row in rows:
+                expense, error = self._build_expense(row)
+                if error:
+                    row_errors.append({'row': row_number, 'error': error})
+                    continue
+
+                budget_id = expense.budget_category_id
+                if balances.get(budget_id, {}).get('allocated', Decimal('0')) == 0:
+                    row_errors.append({
+                        'row': row_number,
+                        'error': 'No allocation found for this category. Please allocate funds first.'
+                    })
+                    continue
+
+                added[budget_id] = added.get(budget_id, Decimal('0')) + expense.amount
+                pending.append(expense)
+                if len(pending) >= self.chunk_size:
+                    created += self._flush(pending, dry_run)
+
+            created += self._flush(pending, dry_run)
+
+            if dry_run:
+                transaction.set_rollback(True)
+
+        logger.info(
+            "Expense import for project %s: %s rows created, %s rejected",
+            self.project.id, created, len(row_errors)
+        )
+
+        return {
+            'success': True,
+            'dry_run': dry_run,
+            'created': created,
+            'rejected': len(row_errors),
+            'row_errors': row_errors,
+            'budgets': self._summarize_budgets(balances, added),
+        }
+
+    # ------------------------------------------------------------------
+    # Row sources (generators, so the file is never materialized)
+    # ------------------------------------------------------------------
+    def _iter_csv(self, file) -> Iterator[Tuple[int, Dict[str, Any]]]:
+        file.seek(0)
+        text = io.TextIOWrapper(getattr(file, 'file', file), encoding='utf-8-sig', newline='')
+        try:
+            reader = csv.reader(text)
+            header = next(reader, None)
+            if not header:
+                return
+            columns = self._map_header(header)
+            for row_number, values in enumerate(reader, start=2):
+                if not any((v or '').strip() for v in values):
+                    continue
+                yield row_number, self._row_dict(columns, values)
+        finally:
+            text.detach()
+
+    def _iter_xlsx(self, file) -> Iterator[Tuple[int, Dict[str, Any]]]:
+        file.seek(0)
+        workbook = openpyxl.load_workbook(file, read_only=True, data_only=True)
+        try:
+            sheet = workbook.active
+            rows = sheet.iter_rows(values_only=True)
+            header = next(rows, None)
+            if not header:
+                return
+            columns = self._map_header(header)
+            for row_number, values in enumerate(rows, start=2):
+                if not any(v not in (None, '') for v in values):
+                    continue
+                yield row_number, self._row_dict(columns, values)
+        finally:
+            workbook.close()
+
+    def _map_header(self, header) -> List[Optional[str]]:
+        columns = []
+        for cell in header:
+            key = str(cell or '').strip().lower().replace(' ', '_').replace('#', 'number')
+            columns.append(self.COLUMN_ALIASES.get(key))
+        return columns
+
+    @staticmethod
+    def _row_dict(columns, values) -> Dict[str, Any]:
+        return {
+            column: value
+            for column, value in zip(columns, values)
+            if column is not None
+        }
+
+    # ------------------------------------------------------------------
+    # Cached lookups
+    # ------------------------------------------------------------------
+    @staticmethod
+    def _build_choice_lookup(choices) -> Dict[str, str]:
+        """Map both codes and labels (case-insensitive) to the stored code"""
+        lookup = {}
+        for code, label in choices:
+            lookup[str(code).lower()] = code
+            lookup[str(label).lower()] = code
+        return lookup
+
+    def _load_budgets(self):
+        budgets = ProjectBudget.objects.filter(project=self.project).select_related('scope')
+        for budget in budgets:
+            self._budgets_by_id[budget.id] = budget
+            self._budgets_by_key[(budget.scope.name.strip().lower(), budget.category)] = budget
+            self._budgets_by_category.setdefault(budget.category, []).append(budget)
+
+    def _load_balances(self) -> Dict[int, Dict[str, Decimal]]:
+        """Allocated and spent per budget, two grouped queries for the whole project"""
+        balances = {
+            budget_id: {'allocated': Decimal('0'), 'spent': Decimal('0')}
+            for budget_id in self._budgets_by_id
+        }
+        allocated = FundAllocation.objects.filter(
+            project_budget__project=self.project, is_deleted=False
+        ).values('project_budget_id').annotate(total=Sum('amount'))
+        for row in allocated:
+            balances[row['project_budget_id']]['allocated'] = row['total'] or Decimal('0')
+
+        spent = Expense.objects.filter(
+            budget_category__project=self.project
+        ).values('budget_category_id').annotate(total=Sum('amount'))
+        for row in spent:
+            if row['budget_category_id'] in balances:
+                balances[row['budget_category_id']]['spent'] = row['total'] or Decimal('0')
+        return balances
+
+    def _resolve_budget(self, row) -> Tuple[Optional[ProjectBudget], Optional[str]]:
+        budget_id = row.get('budget_id')
+        if budget_id not in (None, ''):
+            try:
+                budget = self._budgets_by_id.get(int(budget_id))
+            except (TypeError, ValueError):
+                budget = None
+            if not budget:
+                return None, f'Unknown budget_id: {budget_id}'
+            return budget, None
+
+        category = self._category_codes.get(str(row.get('category') or '').strip().lower())
+        if not category:
+            return None, f'Unknown budget category: {row.get("category")}'
+
+        scope = str(row.get('scope') or '').strip().lower()
+        if scope:
+            budget = self._budgets_by_key.get((scope, category))
+            if not budget:
+                return None, f'No {category} budget under scope "{row.get("scope")}"'
+            return budget, None
+
+        candidates = self._budgets_by_category.get(category, [])
+        if len(candidates) == 1:
+            return candidates[0], None
+        if not candidates:
+            return None, f'No budget for category {category} in this project'
+        return None, f'Category {category} exists under several scopes; add a scope column'
+
+    # ------------------------------------------------------------------
+    # Row validation
+    # ------------------------------------------------------------------
+    def _build_expense(self, row) -> Tuple[Optional[Expense], Optional[str]]:
+        budget, error = self._resolve_budget(row)
+        if error:
+            return None, error
+
+        expense_type = self._expense_types.get(str(row.get('expense_type') or '').strip().lower())
+        if not expense_type:
+            return None, f'Invalid expense type: {row.get("expense_type")}'
+
+        amount = self._parse_amount(row.get('amount'))
+        if amount is None or amount <= 0:
+            return None, f'Invalid amount: {row.get("amount")}'
+
+        expense_date = self._parse_date(row.get('expense_date'))
+        if not expense_date:
+            return None, f'Invalid expense date: {row.get("expense_date")}'
+
+        return Expense(
+            project=self.project,
+            budget_category=budget,
+            expense_type=expense_type,
+            expense_other=str(row.get('expense_other') or '')[:255],
+            amount=amount,
+            vendor=str(row.get('vendor') or '')[:255],
+            receipt_number=str(row.get('receipt_number') or '')[:100],
+            expense_date=expense_date,
+            description=str(row.get('description') or ''),
+            created_by=self.created_by,
+        ), None
+
+    @staticmethod
+    def _parse_amount(value) -> Optional[Decimal]:
+        if value in (None, ''):
+            return None
+        try:
+            cleaned = str(value).replace(',', '').replace('₱', '').strip()
+            return Decimal(cleaned).quantize(Decimal('0.01'))
+        except (InvalidOperation, ValueError):
+            return None
+
+    def _parse_date(self, value) -> Optional[date]:
+        if isinstance(value, datetime):
+            return value.date()
+        if isinstance(value, date):
+            return value
+        text = str(value or '').strip()
+        if not text:
+            return None
+        try:
+            parsed = parse_date(text[:10])
+        except ValueError:
+            parsed = None
+        if parsed:
+            return parsed
+        for fmt in self.DATE_FORMATS:
+            try:
+                return datetime.strptime(text, fmt).date()
+            except ValueError:
+                continue
+        return None
+
+    # ------------------------------------------------------------------
+    # Writes and rollups
+    # ------------------------------------------------------------------
+    def _flush(self, pending: List[Expense], dry_run: bool) -> int:
+        count = len(pending)
+        if count and not dry_run:
+            Expense.objects.bulk_create(pending, batch_size=self.chunk_size)
+        pending.clear()
+        return count
+
+    def _summarize_budgets(self, balances, added) -> List[Dict[str, Any]]:
+        """Per touched budget: before/after spend and any over-allocation warning"""
+        summary = []
+        for budget_id, amount in added.items():
+            budget = self._budgets_by_id[budget_id]
+            allocated = balances[budget_id]['allocated']
+            spent_before = balances[budget_id]['spent']
+            spent_after = spent_before + amount
+            entry = {
+                'budget_id': budget_id,
+                'name': f"{budget.scope.name} - {budget.get_category_display()}",
+                'allocated': float(allocated),
+                'spent_before': float(spent_before),
+                'imported': float(amount),
+                'spent_after': float(spent_after),
+                'remaining': float(allocated - spent_after),
+                'warning': None,
+            }
+            if spent_after > allocated:
+                entry['warning'] = f'Over-allocated by ₱{spent_after - allocated:,.2f}'
+            summary.append(entry)
+        return summary
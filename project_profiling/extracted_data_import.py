@@ -0,0 +1,216 @@
+"""
+Extracted Data Import
+Saves tasks, materials and equipment mapped from uploaded files. Rows are validated
+up front, then each model is written with chunked bulk_create in one transaction
+"""
+
+import logging
+from datetime import date
+from decimal import Decimal, InvalidOperation
+from typing import Any, Dict, List, Optional
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.utils.dateparse import parse_date
+
+logger = logging.getLogger(__name__)
+
+
+class ExtractedDataImporter:
+    """
+    Imports mapped rows for one project.
+
+    Each row is built into an unsaved instance and validated with full_clean; foreign
+    keys are checked against sets loaded once per import instead of per row. Invalid
+    rows are reported and skipped, the remaining rows are inserted together.
+    """
+
+    BATCH_SIZE = 500
+
+    # Fields checked in bulk (or derived) rather than per row by full_clean
+    TASK_CLEAN_EXCLUDE = ['project', 'scope', 'assigned_to', 'dependencies']
+
+    # Material.standard_price is required; imports carry no price, so the minimum valid
+    # reference price is stored until someone enters the real one
+    PLACEHOLDER_PRICE = Decimal('0.01')
+
+    def __init__(self, project, batch_size: int = BATCH_SIZE):
+        self.project = project
+        self.batch_size = batch_size
+        self.errors: List[str] = []
+
+    # ------------------------------------------------------------------
+    # Public API
+    # ------------------------------------------------------------------
+    def import_mapped_models(self, mapped_models: Dict[str, List[Dict]]) -> Dict[str, Any]:
+        """Save the tasks, materials and equipment of ProjectDataExtractor's mapped_models"""
+        from scheduling.models import ProjectScope
+
+        tasks_data = mapped_models.get('tasks', [])
+        materials_data = mapped_models.get('materials', [])
+        equipment_data = mapped_models.get('equipment', [])
+
+        with transaction.atomic():
+            default_scope = None
+            if tasks_data:
+                # Create a default scope if none exists
+                default_scope, _ = ProjectScope.objects.get_or_create(
+                    project=self.project,
+                    name='General Work',
+                    defaults={'weight': 100}
+                )
+
+            tasks = self._write(self._build_tasks(tasks_data, default_scope))
+            materials = self._write(self._build_all(materials_data, self._build_material, 'material'))
+            equipment = self._write(self._build_all(equipment_data, self._build_equipment, 'equipment'))
+
+        logger.info(
+            "Extracted data import for project %s: %s tasks, %s materials, %s equipment, %s rejected",
+            self.project.id, len(tasks), len(materials), len(equipment), len(self.errors)
+        )
+
+        return {
+            'tasks': [{'id': task.id, 'name': task.task_name} for task in tasks],
+            'materials': [{'id': material.id, 'name': material.name} for material in materials],
+            'equipment': [{'id': item.id, 'name': item.name} for item in equipment],
+            'errors': self.errors,
+        }
+
+    def import_tasks(self, rows: List[Dict], default_scope=None) -> List:
+        """
+        Save task rows (task_name, description, start_date, end_date, weight, scope_id,
+        assigned_to_id, status); returns the created tasks, errors are left in self.errors
+        """
+        with transaction.atomic():
+            return self._write(self._build_tasks(rows, default_scope))
+
+    # ------------------------------------------------------------------
+    # Row builders
+    # ------------------------------------------------------------------
+    def _build_tasks(self, rows: List[Dict], default_scope) -> List:
+        from authentication.models import UserProfile
+        from scheduling.models import ProjectScope
+
+        if not rows:
+            return []
+
+        scope_ids = set(
+            ProjectScope.objects.filter(project=self.project, is_deleted=False).values_list('id', flat=True)
+        )
+        assignee_ids = {
+            str(row['assigned_to_id']) for row in rows if str(row.get('assigned_to_id') or '').isdigit()
+        }
+        known_assignees = set(
+            UserProfile.objects.filter(id__in=assignee_ids).values_list('id', flat=True)
+        ) if assignee_ids else set()
+
+        default_start = self.project.start_date or self.project.created_at.date()
+        default_end = self.project.target_completion_date or self.project.created_at.date()
+
+        tasks = []
+        for row in rows:
+            name = row.get('task_name') or 'Imported Task'
+            try:
+                scope_id = self._to_int(row.get('scope_id')) or (default_scope.id if default_scope else None)
+                if scope_id not in scope_ids:
+                    raise ValidationError('Scope not found for this project')
+                assigned_to_id = self._to_int(row.get('assigned_to_id'))
+                if assigned_to_id and assigned_to_id not in known_assignees:
+                    raise ValidationError('Assigned user not found')
+
+                task = self._new_task(
+                    project=self.project,
+                    scope_id=scope_id,
+                    assigned_to_id=assigned_to_id,
+                    task_name=name,
+                    description=row.get('description', ''),
+                    start_date=self._to_date(row.get('start_date')) or default_start,
+                    end_date=self._to_date(row.get('end_date')) or default_end,
+                    weight=self._to_decimal(row.get('weight', row.get('suggested_weight', 10))),
+                )
+                task.full_clean(exclude=self.TASK_CLEAN_EXCLUDE)
+                tasks.append(task)
+            except (ValidationError, ValueError, InvalidOperation) as e:
+                self.errors.append(f"Failed to save task '{name}': {self._message(e)}")
+        return tasks
+
+    @staticmethod
+    def _new_task(**fields):
+        from scheduling.models import ProjectTask
+
+        task = ProjectTask(**fields)
+        # bulk_create skips save(), so derive duration, manhours and status here
+        task.apply_derived_fields()
+        return task
+
+    def _build_all(self, rows: List[Dict], build, label: str) -> List:
+        instances = []
+        for row in rows:
+            try:
+                instance = build(row)
+                instance.full_clean()
+                instances.append(instance)
+            except (ValidationError, ValueError, InvalidOperation) as e:
+                self.errors.append(f"Failed to save {label} '{row.get('name', '')}': {self._message(e)}")
+        return instances
+
+    def _build_material(self, row: Dict):
+        from materials_equipment.models import Material
+
+        return Material(
+            name=row.get('name') or 'Imported Material',
+            description=row.get('notes', ''),
+            unit=row.get('unit') or 'pcs',
+            standard_price=self._to_decimal(row.get('unit_cost')) or self.PLACEHOLDER_PRICE,
+            category='General',
+        )
+
+    def _build_equipment(self, row: Dict):
+        from materials_equipment.models import Equipment
+
+        return Equipment(
+            name=row.get('name') or 'Imported Equipment',
+            description=row.get('notes', ''),
+            ownership_type=row.get('ownership_type') or 'OWN',
+        )
+
+    # ------------------------------------------------------------------
+    # Helpers
+    # ------------------------------------------------------------------
+    def _write(self, instances: List) -> List:
+        if not instances:
+            return []
+        return type(instances[0]).objects.bulk_create(instances, batch_size=self.batch_size)
+
+    @staticmethod
+    def _to_int(value) -> Optional[int]:
+        if value in (None, ''):
+            return None
+        return int(value)
+
+    @staticmethod
+    def _to_decimal(value) -> Optional[Decimal]:
+        if value in (None, ''):
+            return None
+        return Decimal(str(value).replace(',', '').strip())
+
+    @staticmethod
+    def _to_date(value) -> Optional[date]:
+        if not value:
+            return None
+        if isinstance(value, date):
+            return value
+        parsed = parse_date(str(value))
+        if parsed is None:
+            raise ValueError(f"Invalid date '{value}'")
+        return parsed
+
+    @staticmethod
+    def _message(error: Exception) -> str:
+        if isinstance(error, ValidationError):
+            if hasattr(error, 'error_dict'):
+                return '; '.join(f"{field}: {' '.join(messages)}" for field, messages in error.message_dict.items())
+            return ' '.join(error.messages)
+        if isinstance(error, InvalidOperation):
+            return 'Invalid number'
+        return str(error)
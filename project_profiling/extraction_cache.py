@@ -0,0 +1,167 @@
+"""
+Extraction Cache
+Content-addressed store of file extraction results, keyed by the SHA-256 of the
+uploaded bytes plus the extractor name and version, with LRU eviction by total size
+"""
+
+import datetime
+import hashlib
+import json
+import logging
+from decimal import Decimal
+from typing import Any, Callable, Dict, Union
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from .models import ExtractionCacheEntry
+
+logger = logging.getLogger(__name__)
+
+MAX_CACHE_BYTES = getattr(settings, 'EXTRACTION_CACHE_MAX_BYTES', 200 * 1024 * 1024)
+# Results larger than this are not worth a row; they are recomputed instead
+MAX_ENTRY_BYTES = getattr(settings, 'EXTRACTION_CACHE_MAX_ENTRY_BYTES', 20 * 1024 * 1024)
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def content_digest(content) -> str:
+    """SHA-256 of raw bytes, a spooled upload, or an uploaded file read in chunks and rewound"""
+    digest = hashlib.sha256()
+    if isinstance(content, (bytes, bytearray, memoryview)):
+        digest.update(content)
+        return digest.hexdigest()
+    if hasattr(content, 'mapped'):
+        # SpooledUpload: hash the memory map directly, without copying it
+        digest.update(content.mapped)
+        return digest.hexdigest()
+
+    if hasattr(content, 'chunks'):
+        content.seek(0)
+        for chunk in content.chunks(HASH_CHUNK_SIZE):
+            digest.update(chunk)
+    else:
+        content.seek(0)
+        for chunk in iter(lambda: content.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    content.seek(0)
+    return digest.hexdigest()
+
+
+class _ResultEncoder(json.JSONEncoder):
+    """JSON with Decimals and dates tagged so they decode back to the same types"""
+
+    def default(self, obj):
+        if isinstance(obj, Decimal):
+            return {'__decimal__': str(obj)}
+        if isinstance(obj, datetime.datetime):
+            # pandas NaT is a datetime that is not equal to itself
+            return {'__datetime__': obj.isoformat()} if obj == obj else None
+        if isinstance(obj, datetime.date):
+            return {'__date__': obj.isoformat()}
+        if hasattr(obj, 'item'):  # NumPy scalars
+            return obj.item()
+        if isinstance(obj, set):
+            return list(obj)
+        return str(obj)
+
+
+def _decode_object(obj: Dict) -> Any:
+    if len(obj) == 1:
+        if '__decimal__' in obj:
+            return Decimal(obj['__decimal__'])
+        if '__datetime__' in obj:
+            return datetime.datetime.fromisoformat(obj['__datetime__'])
+        if '__date__' in obj:
+            return datetime.date.fromisoformat(obj['__date__'])
+    return obj
+
+
+def encode_result(result: Dict) -> str:
+    return json.dumps(result, cls=_ResultEncoder)
+
+
+def decode_result(payload: str) -> Dict:
+    return json.loads(payload, object_hook=_decode_object)
+
+
+def get_cached(content_hash: str, extractor: str, version: str):
+    """Stored result for the key, or None; a hit refreshes the entry's LRU position"""
+    entry = ExtractionCacheEntry.objects.filter(
+        content_hash=content_hash, extractor=extractor, extractor_version=version
+    ).only('id', 'payload').first()
+    if entry is None:
+        return None
+
+    ExtractionCacheEntry.objects.filter(pk=entry.pk).update(
+        hits=F('hits') + 1, last_accessed_at=timezone.now()
+    )
+    return decode_result(entry.payload)
+
+
+def store(content_hash: str, extractor: str, version: str, result: Dict):
+    """Save a result, then evict least recently used entries beyond MAX_CACHE_BYTES"""
+    payload = encode_result(result)
+    size = len(payload.encode('utf-8'))
+    if size > MAX_ENTRY_BYTES:
+        logger.debug("Extraction result for %s too large to cache (%s bytes)", content_hash[:12], size)
+        return
+
+    try:
+        with transaction.atomic():
+            ExtractionCacheEntry.objects.create(
+                content_hash=content_hash, extractor=extractor, extractor_version=version,
+                payload=payload, size=size,
+            )
+    except IntegrityError:
+        # A concurrent upload of the same file stored it first
+        return
+    evict()
+
+
+def evict(max_bytes: int = MAX_CACHE_BYTES) -> int:
+    """Delete least recently used entries until the cache fits in max_bytes; returns rows deleted"""
+    total = ExtractionCacheEntry.objects.aggregate(total=Sum('size'))['total'] or 0
+    if total <= max_bytes:
+        return 0
+
+    stale_ids = []
+    for entry_id, size in ExtractionCacheEntry.objects.order_by('last_accessed_at').values_list('id', 'size'):
+        if total <= max_bytes:
+            break
+        stale_ids.append(entry_id)
+        total -= size
+
+    deleted, _ = ExtractionCacheEntry.objects.filter(id__in=stale_ids).delete()
+    logger.info("Evicted %s extraction cache entries", deleted)
+    return deleted
+
+
+def cached_extraction(
+    extractor: str,
+    version: str,
+    content: Union[bytes, Any],
+    extract: Callable[[], Dict],
+) -> Dict:
+    """
+    Return the stored result for this file content and extractor version, running
+    extract() and storing its result on a miss. Failed extractions are not cached.
+    """
+    content_hash = content_digest(content)
+    try:
+        cached = get_cached(content_hash, extractor, version)
+    except Exception as e:
+        logger.warning(f"Extraction cache lookup failed: {e}")
+        cached = None
+    if cached is not None:
+        logger.debug("Extraction cache hit: %s %s", extractor, content_hash[:12])
+        return cached
+
+    result = extract()
+    if result.get('success'):
+        try:
+            store(content_hash, extractor, version, result)
+        except Exception as e:
+            logger.warning(f"Extraction cache store failed: {e}")
+    return result
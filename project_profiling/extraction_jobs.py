@@ -0,0 +1,256 @@
+"""
+Extraction Job Queue
+Database-backed queue for work that is too slow for a web request: parsing BOQ and
+file-preview uploads, and BOQ cost-risk simulations. Jobs are enqueued by their API
+views, claimed by the run_workers command and executed in its process pool, with
+progress and results written back to the ExtractionJob row.
+"""
+
+import logging
+import os
+from datetime import timedelta
+from typing import Callable, Dict, List, Optional
+
+from django.db.models import F
+from django.utils import timezone
+
+from .extraction_cache import cached_extraction, decode_result, encode_result
+from .file_processing import EXTRACTOR_VERSION, FileProcessor, ProjectDataExtractor, extract_cost_summary
+from .models import ExtractionJob, ProjectProfile, ProjectType
+from .upload_spool import SpooledUpload
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = 3
+# RUNNING jobs older than this are assumed to belong to a dead worker
+STALE_AFTER = timedelta(minutes=30)
+
+
+def enqueue_job(job_type: str, uploaded_file, params: Optional[Dict] = None, created_by=None) -> ExtractionJob:
+    """Store the upload and queue it; returns immediately"""
+    job = ExtractionJob(
+        job_type=job_type,
+        file_name=uploaded_file.name,
+        params=params or {},
+        created_by=created_by,
+    )
+    job.file.save(uploaded_file.name, uploaded_file, save=False)
+    job.save()
+    logger.info("Queued %s job %s for %s", job_type, job.pk, uploaded_file.name)
+    return job
+
+
+def enqueue_task(job_type: str, params: Dict, label: str, created_by=None) -> ExtractionJob:
+    """Queue a job that works from database state instead of an upload; label names it in status payloads"""
+    job = ExtractionJob.objects.create(job_type=job_type, file_name=label[:255], params=params, created_by=created_by)
+    logger.info("Queued %s job %s for %s", job_type, job.pk, label)
+    return job
+
+
+def claim_jobs(limit: int, worker: str) -> List[int]:
+    """
+    Claim up to `limit` queued jobs, oldest first. Each claim is a conditional UPDATE,
+    so concurrent run_workers processes never take the same job.
+    """
+    claimed = []
+    candidates = ExtractionJob.objects.filter(status='QUEUED').order_by('created_at').values_list('id', flat=True)
+    for job_id in candidates[:limit * 2]:
+        updated = ExtractionJob.objects.filter(id=job_id, status='QUEUED').update(
+            status='RUNNING', worker=worker, started_at=timezone.now(),
+            attempts=F('attempts') + 1, progress=0, progress_message='Starting',
+        )
+        if updated:
+            claimed.append(job_id)
+            if len(claimed) == limit:
+                break
+    return claimed
+
+
+def requeue_stale_jobs() -> int:
+    """Return jobs left RUNNING by a dead worker to the queue, or fail them after MAX_ATTEMPTS"""
+    stale = ExtractionJob.objects.filter(status='RUNNING', started_at__lt=timezone.now() - STALE_AFTER)
+    failed = stale.filter(attempts__gte=MAX_ATTEMPTS).update(
+        status='FAILED', error='Worker stopped responding', finished_at=timezone.now()
+    )
+    requeued = stale.update(status='QUEUED', worker='', progress=0, progress_message='Requeued')
+    if failed or requeued:
+        logger.warning("Requeued %s stale extraction jobs, failed %s", requeued, failed)
+    return requeued
+
+
+def release_jobs(job_ids: List[int], error: str):
+    """Requeue jobs interrupted by a crashed worker; jobs out of attempts fail with the error"""
+    jobs = ExtractionJob.objects.filter(id__in=job_ids, status='RUNNING')
+    jobs.filter(attempts__gte=MAX_ATTEMPTS).update(status='FAILED', error=error, finished_at=timezone.now())
+    jobs.update(status='QUEUED', worker='', progress=0, progress_message='Requeued')
+
+
+def update_progress(job_id: int, progress: int, message: str = ''):
+    ExtractionJob.objects.filter(id=job_id).update(progress=min(max(progress, 0), 100), progress_message=message[:255])
+
+
+def mark_failed(job_id: int, error: str):
+    ExtractionJob.objects.filter(id=job_id).update(
+        status='FAILED', error=error, finished_at=timezone.now(), progress_message='Failed'
+    )
+
+
+def boq_upload_result(cost_data: Dict, project_type: Optional[ProjectType] = None) -> Dict:
+    """
+    Response payload of a processed BOQ upload. With a project type the costs are
+    also added to that type's learning database.
+    """
+    if project_type:
+        from .cost_learning import CostLearningEngine
+
+        CostLearningEngine.add_boq_data_to_learning(
+            project_type=project_type,
+            boq_data=cost_data,
+            source='boq_upload',
+            role=cost_data.get('role', 'general_contractor')
+        )
+        return {
+            'success': True,
+            'message': f'BOQ file processed successfully. Cost data added to {project_type.name} learning database.',
+            'cost_data': {
+                'total_cost': str(cost_data.get('total_cost', 0)),
+                'lot_size': str(cost_data.get('lot_size', 0)),
+                'cost_per_sqm': str(cost_data.get('cost_per_sqm', 0)),
+                'project_type': project_type.name
+            }
+        }
+
+    return {
+        'success': True,
+        'message': 'BOQ file processed successfully. Cost data extracted.',
+        'cost_data': {
+            'total_cost': str(cost_data.get('total_cost', 0)),
+            'lot_size': str(cost_data.get('lot_size', 0)),
+            'cost_per_sqm': str(cost_data.get('cost_per_sqm', 0)),
+            'materials_cost': str(cost_data.get('materials_cost', 0)),
+            'labor_cost': str(cost_data.get('labor_cost', 0)),
+            'equipment_cost': str(cost_data.get('equipment_cost', 0)),
+            'permits_cost': str(cost_data.get('permits_cost', 0)),
+            'contingency_cost': str(cost_data.get('contingency_cost', 0)),
+            'overhead_cost': str(cost_data.get('overhead_cost', 0)),
+            'boq_items': cost_data.get('boq_items', []),
+            'project_info': cost_data.get('project_info', {}),
+            'extracted_cost_breakdown': {
+                'materials': str(cost_data.get('materials_cost', 0)),
+                'labor': str(cost_data.get('labor_cost', 0)),
+                'equipment': str(cost_data.get('equipment_cost', 0)),
+                'subcontractor': str(cost_data.get('subcontractor_cost', 0)),
+                'permits': str(cost_data.get('permits_cost', 0)),
+                'contingency': str(cost_data.get('contingency_cost', 0)),
+                'overhead': str(cost_data.get('overhead_cost', 0)),
+            }
+        }
+    }
+
+
+def _run_cost_summary(job: ExtractionJob, spool: SpooledUpload, progress: Callable[[int, str], None]) -> Dict:
+    file_extension = os.path.splitext(job.file_name)[1].lower()
+    cost_data = cached_extraction(
+        'cost_summary', EXTRACTOR_VERSION, spool,
+        lambda: extract_cost_summary(spool, file_extension)
+    )
+    if not cost_data.get('success'):
+        raise ValueError(cost_data.get('error', 'Failed to extract cost data'))
+
+    progress(80, 'Saving cost data')
+    project_type = None
+    if job.params.get('project_type_id'):
+        project_type = ProjectType.objects.filter(id=job.params['project_type_id'], is_active=True).first()
+    return boq_upload_result(cost_data, project_type)
+
+
+def _run_file_preview(job: ExtractionJob, spool: SpooledUpload, progress: Callable[[int, str], None]) -> Dict:
+    processor = FileProcessor(job.file, spool=spool)
+    processor.file_name = job.file_name
+    result = cached_extraction(
+        'file_preview', EXTRACTOR_VERSION, spool,
+        lambda: ProjectDataExtractor.extract_and_map_data(processor)
+    )
+    if not result.get('success'):
+        raise ValueError(result.get('error', 'Failed to process file'))
+    return {'success': True, 'data': result['data']}
+
+
+def _run_cost_risk(job: ExtractionJob, spool: None, progress: Callable[[int, str], None]) -> Dict:
+    from .cost_risk import analyze_project_risk
+
+    project = ProjectProfile.objects.filter(id=job.params['project_id']).first()
+    if project is None:
+        raise ValueError('Project not found')
+
+    progress(30, 'Simulating')
+    analysis = analyze_project_risk(project, job.params['iterations'])
+    if not analysis.get('success'):
+        raise ValueError(analysis.get('error', 'Failed to simulate cost risk'))
+    if analysis['boq_version'] != job.params.get('boq_version'):
+        # The BOQ changed while the job was queued; file the result under the version simulated
+        ExtractionJob.objects.filter(id=job.pk).update(params={**job.params, 'boq_version': analysis['boq_version']})
+    return analysis
+
+
+JOB_HANDLERS = {
+    'cost_summary': _run_cost_summary,
+    'file_preview': _run_file_preview,
+    'cost_risk': _run_cost_risk,
+}
+
+
+def run_job(job_id: int):
+    """Execute one claimed job and record its result or error"""
+    job = ExtractionJob.objects.filter(id=job_id).first()
+    if job is None:
+        return
+
+    def progress(value: int, message: str):
+        update_progress(job_id, value, message)
+
+    try:
+        handler = JOB_HANDLERS[job.job_type]
+        if job.file:
+            progress(10, 'Reading file')
+            # Local storage is mapped in place; other backends are spooled to a temp file first
+            with SpooledUpload(job.file, name=job.file_name) as spool:
+                progress(30, 'Extracting data')
+                result = handler(job, spool, progress)
+        else:
+            result = handler(job, None, progress)
+
+        ExtractionJob.objects.filter(id=job_id).update(
+            status='SUCCEEDED', result=encode_result(result), progress=100,
+            progress_message='Done', finished_at=timezone.now(), error='',
+        )
+        logger.info("Extraction job %s succeeded", job_id)
+    except Exception as e:
+        logger.exception("Extraction job %s failed", job_id)
+        mark_failed(job_id, str(e))
+        return
+
+    # The upload is no longer needed once its result is stored
+    if job.file:
+        job.file.delete(save=False)
+        ExtractionJob.objects.filter(id=job_id).update(file='')
+
+
+def job_status(job: ExtractionJob) -> Dict:
+    """Status payload for polling; includes the result once the job succeeded"""
+    status = {
+        'job_id': job.pk,
+        'job_type': job.job_type,
+        'status': job.status,
+        'progress': job.progress,
+        'message': job.progress_message,
+        'file_name': job.file_name,
+        'created_at': job.created_at.isoformat(),
+        'started_at': job.started_at.isoformat() if job.started_at else None,
+        'finished_at': job.finished_at.isoformat() if job.finished_at else None,
+    }
+    if job.status == 'SUCCEEDED' and job.result:
+        status['result'] = decode_result(job.result)
+    elif job.status == 'FAILED':
+        status['error'] = job.error
+    return status
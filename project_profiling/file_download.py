@@ -0,0 +1,169 @@
+"""
+File Downloads
+Serves stored files as chunked FileResponse streams with ETag/Last-Modified
+validation and single byte-range support, or hands the transfer to a front
+proxy via X-Accel-Redirect / X-Sendfile so Django only does the permission check
+"""
+
+import hashlib
+import mimetypes
+import os
+import re
+from typing import Optional, Tuple
+from urllib.parse import quote
+
+from django.conf import settings
+from django.http import FileResponse, HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_http_date_safe, quote_etag
+
+# '' streams through Django; 'x-accel' (nginx) or 'x-sendfile' (Apache, lighttpd) delegate to the proxy
+SENDFILE_MODE = getattr(settings, 'DOCUMENT_SENDFILE_MODE', '')
+# Internal nginx location aliased to MEDIA_ROOT, used for X-Accel-Redirect
+SENDFILE_URL_PREFIX = getattr(settings, 'DOCUMENT_SENDFILE_URL_PREFIX', '/protected-media/')
+CHUNK_SIZE = 64 * 1024
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+class RangeFile:
+    """File-like view of `length` bytes starting at `start`; FileResponse reads it in chunks"""
+
+    def __init__(self, file, start: int, length: int):
+        self._file = file
+        self._remaining = length
+        file.seek(start)
+
+    def read(self, size: int = -1) -> bytes:
+        if self._remaining <= 0:
+            return b''
+        if size is None or size < 0 or size > self._remaining:
+            size = self._remaining
+        data = self._file.read(size)
+        self._remaining -= len(data)
+        return data
+
+    def close(self):
+        self._file.close()
+
+
+def file_etag(field_file, size: int, modified: Optional[float]) -> str:
+    """Strong validator from the stored name, size and modification time"""
+    key = f"{field_file.name}:{size}:{modified or ''}"
+    return quote_etag(hashlib.md5(key.encode()).hexdigest())
+
+
+def parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """
+    (start, end) inclusive for a single 'bytes=' range, None to serve the whole file
+    (no header, multiple ranges or an unknown unit). Raises ValueError when unsatisfiable.
+    """
+    match = RANGE_RE.match(header.strip()) if header else None
+    if not match:
+        return None
+
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        # Suffix range: the last N bytes
+        length = int(last)
+        if length == 0:
+            raise ValueError('Empty suffix range')
+        return max(size - length, 0), size - 1
+
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or end < start:
+        raise ValueError('Range not satisfiable')
+    return start, end
+
+
+def _stat(field_file) -> Tuple[int, Optional[float]]:
+    storage = field_file.storage
+    size = field_file.size
+    try:
+        modified = storage.get_modified_time(field_file.name).timestamp()
+    except (NotImplementedError, OSError, AttributeError):
+        modified = None
+    return size, modified
+
+
+def _if_range_matches(request, etag: str, modified: Optional[float]) -> bool:
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if not if_range:
+        return True
+    if if_range.startswith('W/'):
+        # If-Range requires a strong comparison
+        return False
+    if if_range.startswith('"'):
+        return if_range == etag
+    since = parse_http_date_safe(if_range)
+    return since is not None and modified is not None and int(modified) <= since
+
+
+def serve_file(request, field_file, filename: Optional[str] = None, content_type: Optional[str] = None):
+    """
+    Download response for a stored FieldFile. Answers conditional requests with 304,
+    Range requests with 206 (or 416), and everything else with the full file streamed in chunks.
+    """
+    filename = filename or os.path.basename(field_file.name)
+    content_type = content_type or mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    size, modified = _stat(field_file)
+    etag = file_etag(field_file, size, modified)
+    last_modified = int(modified) if modified is not None else None
+
+    not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if not_modified is not None:
+        return not_modified
+
+    if SENDFILE_MODE:
+        response = _sendfile_response(field_file, content_type)
+    else:
+        response = _stream_response(request, field_file, size, etag, modified, content_type)
+        if response.status_code == 416:
+            return response
+
+    response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified)
+    response['Accept-Ranges'] = 'bytes'
+    response['Content-Disposition'] = f"attachment; filename*=UTF-8''{quote(filename)}"
+    return response
+
+
+def _stream_response(request, field_file, size: int, etag: str, modified: Optional[float], content_type: str):
+    byte_range = None
+    if _if_range_matches(request, etag, modified):
+        try:
+            byte_range = parse_range(request.META.get('HTTP_RANGE', ''), size)
+        except ValueError:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+
+    field_file.open('rb')
+    if byte_range is None:
+        response = FileResponse(field_file.file, content_type=content_type)
+        response.block_size = CHUNK_SIZE
+        response['Content-Length'] = size
+        return response
+
+    start, end = byte_range
+    response = FileResponse(RangeFile(field_file.file, start, end - start + 1), status=206, content_type=content_type)
+    response.block_size = CHUNK_SIZE
+    response['Content-Length'] = end - start + 1
+    response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    return response
+
+
+def _sendfile_response(field_file, content_type: str) -> HttpResponse:
+    # The proxy handles Range and the body; Content-Type and disposition are passed through
+    response = HttpResponse(content_type=content_type)
+    if SENDFILE_MODE == 'x-accel':
+        response['X-Accel-Redirect'] = quote(SENDFILE_URL_PREFIX.rstrip('/') + '/' + field_file.name)
+    elif SENDFILE_MODE == 'x-sendfile':
+        response['X-Sendfile'] = field_file.path
+    else:
+        raise ValueError(f"Unknown DOCUMENT_SENDFILE_MODE '{SENDFILE_MODE}'")
+    return response
@@ -3,15 +3,20 @@ File Processing and Data Extraction System
 Handles PDF and Excel file parsing for project data extraction
 """
 
+import io
 import os
+import re
 import json
+import numpy as np
 import pandas as pd
-from typing import Dict, List, Any, Optional, Tuple
+from typing import Dict, Iterator, List, Any, Optional, Tuple
 from django.core.files.uploadedfile import UploadedFile
 from django.conf import settings
 import logging
 from decimal import Decimal
 
+from .upload_spool import SpooledUpload
+
 logger = logging.getLogger(__name__)
 
 try:
@@ -29,6 +34,92 @@ except ImportError:
     EXCEL_AVAILABLE = False
     logger.warning("Excel processing library not available. Install openpyxl for Excel support.")
 
+# Bump when extraction output changes so cached results of older versions are not reused
+EXTRACTOR_VERSION = '1'
+
+# Excel files at or above this size are parsed row by row (openpyxl read_only) instead of
+# being loaded into DataFrames; 'stream' or 'dataframe' forces a mode
+EXCEL_STREAMING_THRESHOLD = getattr(settings, 'EXCEL_STREAMING_THRESHOLD', 5 * 1024 * 1024)
+STREAM_CHUNK_ROWS = 5000
+# Rows per sheet returned in the streamed preview; row_count still covers the whole sheet
+SHEET_PREVIEW_ROWS = 500
+
+
+def _excel_source(excel_file):
+    """File-like object positioned at the start; raw bytes are wrapped, spooled uploads get a fresh handle"""
+    if isinstance(excel_file, SpooledUpload):
+        return excel_file.open()
+    if isinstance(excel_file, (bytes, bytearray)):
+        return io.BytesIO(excel_file)
+    if hasattr(excel_file, 'seek'):
+        excel_file.seek(0)
+    return excel_file
+
+
+def _is_xlsx(source) -> bool:
+    """openpyxl only reads the zip-based formats; legacy .xls always goes through pandas"""
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, 'rb') as handle:
+            return handle.read(4) == b'PK\x03\x04'
+    position = source.tell()
+    signature = source.read(4)
+    source.seek(position)
+    return signature == b'PK\x03\x04'
+
+
+def _source_size(source) -> int:
+    if isinstance(source, (str, os.PathLike)):
+        return os.path.getsize(source)
+    size = getattr(source, 'size', None)
+    if size is None:
+        position = source.tell()
+        size = source.seek(0, os.SEEK_END)
+        source.seek(position)
+    return size
+
+
+def use_streaming(source, excel_mode: str = 'auto') -> bool:
+    """Pick streaming or DataFrame ingestion for an Excel source"""
+    if excel_mode == 'dataframe' or not EXCEL_AVAILABLE or not _is_xlsx(source):
+        return False
+    if excel_mode == 'stream':
+        return True
+    return _source_size(source) >= EXCEL_STREAMING_THRESHOLD
+
+
+def iter_excel_rows(excel_file) -> Iterator[Tuple[str, int, tuple]]:
+    """
+    Yield (sheet_name, row_index, values) for every row of every sheet in one pass over
+    the workbook. read_only mode keeps only the current row in memory.
+    """
+    workbook = openpyxl.load_workbook(_excel_source(excel_file), read_only=True, data_only=True)
+    try:
+        for worksheet in workbook.worksheets:
+            for row_idx, values in enumerate(worksheet.iter_rows(values_only=True)):
+                yield worksheet.title, row_idx, values
+    finally:
+        workbook.close()
+
+
+def _chunk_frame(rows: List[tuple], offset: int) -> pd.DataFrame:
+    """DataFrame of buffered rows, indexed by their sheet row so row numbers stay absolute"""
+    return pd.DataFrame(rows, index=range(offset, offset + len(rows)))
+
+
+def _header_names(values: tuple) -> List[Any]:
+    """Column labels as pandas would derive them from a header row"""
+    names, seen = [], {}
+    for i, value in enumerate(values):
+        name = f'Unnamed: {i}' if value is None else value
+        if name in seen:
+            seen[name] += 1
+            name = f'{name}.{seen[name]}'
+        else:
+            seen[name] = 0
+        names.append(name)
+    return names
+
+
 
 class FileProcessor:
     """
@@ -38,11 +129,21 @@ class FileProcessor:
     SUPPORTED_EXTENSIONS = ['.pdf', '.xlsx', '.xls']
     MAX_FILE_SIZE = 10 * 1024 * 1024  # 10MB
     
-    def __init__(self, file: UploadedFile):
+    def __init__(self, file: UploadedFile, excel_mode: str = 'auto', spool: Optional[SpooledUpload] = None):
         self.file = file
         self.file_name = file.name
         self.file_size = file.size
         self.file_extension = os.path.splitext(file.name)[1].lower()
+        self.excel_mode = excel_mode
+        # When the upload is spooled, parsers read the shared memory map instead of the upload
+        self.spool = spool
+    
+    def _source(self):
+        """Readable handle at the start of the file"""
+        if self.spool is not None:
+            return self.spool.open()
+        self.file.seek(0)
+        return self.file
         
     def is_supported(self) -> bool:
         """Check if file type is supported"""
@@ -100,8 +201,7 @@ class FileProcessor:
             }
         
         try:
-            # Reset file pointer
-            self.file.seek(0)
+            source = self._source()
             
             extracted_data = {
                 'file_type': 'pdf',
@@ -120,7 +220,7 @@ class FileProcessor:
             
             # Try pdfplumber first (better for tables)
             try:
-                with pdfplumber.open(self.file) as pdf:
+                with pdfplumber.open(source) as pdf:
                     full_text = ""
                     for page in pdf.pages:
                         page_text = page.extract_text()
@@ -141,8 +241,7 @@ class FileProcessor:
             except Exception as e:
                 logger.warning(f"pdfplumber failed, trying PyPDF2: {str(e)}")
                 # Fallback to PyPDF2
-                self.file.seek(0)
-                pdf_reader = PyPDF2.PdfReader(self.file)
+                pdf_reader = PyPDF2.PdfReader(self._source())
                 full_text = ""
                 for page in pdf_reader.pages:
                     full_text += page.extract_text() + "\n"
@@ -173,8 +272,7 @@ class FileProcessor:
             }
         
         try:
-            # Reset file pointer
-            self.file.seek(0)
+            source = self._source()
             
             extracted_data = {
                 'file_type': 'excel',
@@ -190,12 +288,17 @@ class FileProcessor:
                 }
             }
             
-            # Read Excel file
-            excel_file = pd.ExcelFile(self.file)
+            if use_streaming(source, self.excel_mode):
+                self._stream_excel_sheets(extracted_data)
+                return {
+                    'success': True,
+                    'data': extracted_data
+                }
             
-            for sheet_name in excel_file.sheet_names:
-                df = pd.read_excel(self.file, sheet_name=sheet_name)
-                
+            # Read every sheet in one pass over the file
+            sheets = pd.read_excel(source, sheet_name=None)
+            
+            for sheet_name, df in sheets.items():
                 # Convert DataFrame to list of dictionaries
                 sheet_data = {
                     'name': sheet_name,
@@ -221,6 +324,46 @@ class FileProcessor:
                 'data': {}
             }
     
+    def _stream_excel_sheets(self, extracted_data: Dict):
+        """
+        Streaming counterpart of the DataFrame loop: rows are parsed in chunks as openpyxl
+        reads them, and each sheet keeps only a SHEET_PREVIEW_ROWS preview of its records.
+        """
+        current = {'sheet': None, 'columns': [], 'buffer': []}
+        
+        def flush():
+            if current['buffer']:
+                df = pd.DataFrame(current['buffer'], columns=current['columns'])
+                self._parse_excel_sheet_for_project_data(current['sheet']['name'], df, extracted_data['project_data'])
+                current['buffer'] = []
+        
+        for sheet_name, row_idx, values in iter_excel_rows(self._source()):
+            if current['sheet'] is None or current['sheet']['name'] != sheet_name:
+                flush()
+                # The first row of a sheet is its header, as with pd.read_excel
+                current['sheet'] = {'name': sheet_name, 'data': [], 'columns': [], 'row_count': 0, 'truncated': False}
+                current['columns'] = _header_names(values)
+                current['sheet']['columns'] = current['columns']
+                extracted_data['sheets'].append(current['sheet'])
+                continue
+            
+            if all(value is None for value in values):
+                continue
+            
+            values = tuple(values[:len(current['columns'])]) + (None,) * (len(current['columns']) - len(values))
+            sheet = current['sheet']
+            sheet['row_count'] += 1
+            if len(sheet['data']) < SHEET_PREVIEW_ROWS:
+                sheet['data'].append(dict(zip(current['columns'], values)))
+            else:
+                sheet['truncated'] = True
+            
+            current['buffer'].append(values)
+            if len(current['buffer']) >= STREAM_CHUNK_ROWS:
+                flush()
+        
+        flush()
+    
     def _parse_text_for_project_data(self, text: str) -> Dict[str, List]:
         """Parse text content to extract project-related data"""
         project_data = {
@@ -495,37 +638,93 @@ class ProjectDataExtractor:
         mapped_data['preview']['suggestions'] = suggestions
 
 
-def extract_from_standard_template(excel_file) -> Dict[str, Any]:
+# Project information cells of the company template: column B, rows 1-13
+TEMPLATE_INFO_FIELDS = [
+    'project_name',      # B1
+    'project_type',      # B2
+    'location',          # B3
+    'client',            # B4
+    'contractor',        # B5
+    'proposal_no',       # B6
+    'lot_size',          # B7 (sqm)
+    'floor_area',        # B8 (sqm)
+    'project_category',  # B9
+    'complexity_level',  # B10
+    'role_type',         # B11
+    'date_prepared',     # B12
+    'prepared_by',       # B13
+]
+# BOQ items start at row 20 (new template format)
+TEMPLATE_BOQ_START_ROW = 19
+
+
+def _stream_standard_template(source) -> Tuple[Dict[str, Any], List[Dict[str, Any]]]:
+    """
+    Project info and BOQ items of the template's first sheet, read row by row.
+    Item rows are buffered in STREAM_CHUNK_ROWS blocks and extracted block by block
+    until the TOTAL row, so memory does not grow with the workbook.
+    """
+    project_info = dict.fromkeys(TEMPLATE_INFO_FIELDS)
+    boq_items: List[Dict[str, Any]] = []
+    buffer: List[tuple] = []
+    offset = TEMPLATE_BOQ_START_ROW
+    first_sheet = None
+    stopped = False
+
+    def extract_buffer() -> bool:
+        items, block_stopped = _extract_boq_block(
+            _chunk_frame(buffer, offset), skip_subtotals=True, skip_empty=True, label='company BOQ item'
+        )
+        boq_items.extend(items)
+        return block_stopped
+
+    rows = iter_excel_rows(source)
+    try:
+        for sheet_name, row_idx, values in rows:
+            if first_sheet is None:
+                first_sheet = sheet_name
+            elif sheet_name != first_sheet:
+                break
+
+            if row_idx < len(TEMPLATE_INFO_FIELDS):
+                project_info[TEMPLATE_INFO_FIELDS[row_idx]] = values[1] if len(values) > 1 else None
+            elif row_idx >= TEMPLATE_BOQ_START_ROW:
+                buffer.append(tuple(values[:len(BOQ_COLUMNS)]))
+                if len(buffer) >= STREAM_CHUNK_ROWS:
+                    stopped = extract_buffer()
+                    offset += len(buffer)
+                    buffer = []
+                    if stopped:
+                        break
+
+        if buffer and not stopped:
+            extract_buffer()
+    finally:
+        rows.close()
+
+    return project_info, boq_items
+
+
+def extract_from_standard_template(excel_file, excel_mode: str = 'auto') -> Dict[str, Any]:
     """
     Extract data from company standard BOQ template
+    Large .xlsx files are streamed; excel_mode 'stream' or 'dataframe' overrides the size switch
     """
     try:
-        # Read the single sheet
-        df = pd.read_excel(excel_file, header=None)
-        
-        # Debug: Print basic info about the file
-        print(f"DEBUG: Template file shape: {df.shape}")
-        print(f"DEBUG: First few rows:\n{df.head()}")
-        
-        # Extract project information from new template format (rows 1-16)
-        project_info = {
-            'project_name': _get_cell_value(df, 'B1'),      # Project Name
-            'project_type': _get_cell_value(df, 'B2'),      # Project Type
-            'location': _get_cell_value(df, 'B3'),          # Location
-            'client': _get_cell_value(df, 'B4'),            # Client
-            'contractor': _get_cell_value(df, 'B5'),        # Contractor
-            'proposal_no': _get_cell_value(df, 'B6'),       # Proposal No
-            'lot_size': _get_cell_value(df, 'B7'),          # Lot Size (sqm)
-            'floor_area': _get_cell_value(df, 'B8'),        # Floor Area (sqm)
-            'project_category': _get_cell_value(df, 'B9'),  # Project Category
-            'complexity_level': _get_cell_value(df, 'B10'), # Complexity Level
-            'role_type': _get_cell_value(df, 'B11'),        # Role/Type
-            'date_prepared': _get_cell_value(df, 'B12'),    # Date Prepared
-            'prepared_by': _get_cell_value(df, 'B13'),      # Prepared By
-        }
+        source = _excel_source(excel_file)
         
-        # Extract BOQ items starting from row 20 (new template format)
-        boq_items = extract_company_boq_items(df, start_row=19)
+        if use_streaming(source, excel_mode):
+            project_info, boq_items = _stream_standard_template(source)
+        else:
+            # Read the single sheet
+            df = pd.read_excel(source, header=None)
+            logger.debug(f"Template file shape: {df.shape}")
+            
+            project_info = {
+                field: _get_cell_value(df, f'B{row}')
+                for row, field in enumerate(TEMPLATE_INFO_FIELDS, start=1)
+            }
+            boq_items = extract_company_boq_items(df, start_row=TEMPLATE_BOQ_START_ROW)
         
         # Calculate totals from BOQ items
         total_cost = sum(item.get('total_cost', Decimal('0')) for item in boq_items)
@@ -611,6 +810,122 @@ def parse_dependencies(dependency_str: str) -> List[int]:
     return dependencies
 
 
+# Template columns A..M of a BOQ item row
+BOQ_COLUMNS = [
+    'item_number', 'description', 'section', 'uom', 'quantity', 'unit_cost', 'total_cost',
+    'material_cost', 'labor_cost', 'equipment_cost', 'subcontractor_cost', 'dependencies', 'remarks',
+]
+BOQ_NUMERIC_COLUMNS = [
+    'quantity', 'unit_cost', 'total_cost', 'material_cost', 'labor_cost', 'equipment_cost', 'subcontractor_cost',
+]
+BOQ_STOP_MARKERS = ['TOTAL', 'GRAND TOTAL', '']
+
+
+def _numeric_column(column: pd.Series) -> pd.Series:
+    """Coerce a column to float in one pass; thousands separators are stripped, blanks and text become 0"""
+    if column.dtype == object:
+        column = column.map(lambda value: value.replace(',', '').strip() if isinstance(value, str) else value)
+    return pd.to_numeric(column, errors='coerce').fillna(0)
+
+
+def _decimal_from_float(value: float) -> Decimal:
+    """Same Decimal as Decimal(str(cell)): whole numbers without a trailing .0"""
+    return Decimal(int(value)) if value.is_integer() else Decimal(str(value))
+
+
+def _extract_boq_rows(df: pd.DataFrame, start_row: int, skip_subtotals: bool,
+                      skip_empty: bool, label: str) -> List[Dict[str, Any]]:
+    """Extract BOQ item dicts from template columns A..M, starting at the 0-based start_row"""
+    block = df.iloc[start_row:, :len(BOQ_COLUMNS)]
+    return _extract_boq_block(block, skip_subtotals, skip_empty, label)[0]
+
+
+def _extract_boq_block(block: pd.DataFrame, skip_subtotals: bool, skip_empty: bool,
+                       label: str) -> Tuple[List[Dict[str, Any]], bool]:
+    """
+    Extract BOQ item dicts from a block of template rows (columns A..M, index = sheet row).
+    Returns the items and whether the block contained the end of the item list.
+
+    The item block ends at the first row whose item number is blank or a TOTAL marker.
+    Numeric columns are coerced column-wise and header/subtotal/empty rows are dropped
+    with boolean masks; only the surviving rows are materialized as dicts.
+    """
+    if block.empty:
+        return [], False
+    block = block.reindex(columns=block.columns[:len(BOQ_COLUMNS)].tolist() + [
+        f'_missing_{i}' for i in range(len(BOQ_COLUMNS) - block.shape[1])
+    ])
+    block.columns = BOQ_COLUMNS
+
+    item_text = block['item_number'].astype(str)
+    stop = block['item_number'].isna().to_numpy() | item_text.str.upper().isin(BOQ_STOP_MARKERS).to_numpy()
+    stopped = bool(stop.any())
+    if stopped:
+        block = block.iloc[:stop.argmax()]
+        item_text = item_text.iloc[:len(block)]
+    if block.empty:
+        return [], stopped
+
+    # Section headers carry a description but only whitespace in the item column
+    keep = item_text.str.strip().ne('')
+    if skip_subtotals:
+        keep &= ~block['description'].astype(str).str.lower().str.contains('subtotal', regex=False)
+
+    # Sub-item numbers such as 1.1 are invalid, as they were for int(); they must not collapse onto 1
+    item_numbers = pd.to_numeric(item_text.str.strip(), errors='coerce')
+    invalid = keep & (item_numbers.isna() | (item_numbers % 1 != 0))
+    for row_idx in block.index[invalid.to_numpy()]:
+        logger.warning(f"Error parsing {label} at row {row_idx + 1}: invalid item number {block.at[row_idx, 'item_number']!r}")
+    keep &= ~invalid
+
+    numbers = {column: _numeric_column(block[column]) for column in BOQ_NUMERIC_COLUMNS}
+    if skip_empty:
+        keep &= (numbers['quantity'] != 0) | (numbers['total_cost'] != 0)
+    fill_total = ((numbers['total_cost'] == 0) & (numbers['quantity'] > 0) & (numbers['unit_cost'] > 0)).to_numpy()
+
+    keep = keep.to_numpy()
+    if not keep.any():
+        return [], stopped
+
+    # Materialize surviving rows only; object columns keep their raw cell values
+    columns = {
+        column: block[column].to_numpy()[keep].tolist()
+        for column in ('description', 'section', 'uom', 'dependencies', 'remarks')
+    }
+    for column in BOQ_NUMERIC_COLUMNS:
+        columns[column] = [_decimal_from_float(value) for value in numbers[column].to_numpy()[keep].tolist()]
+    item_numbers = item_numbers.to_numpy()[keep].astype('int64').tolist()
+    fill_total = fill_total[keep].tolist()
+
+    boq_items = []
+    for i, item_number in enumerate(item_numbers):
+        item = {
+            'item_number': item_number,
+            'description': _cell_or_blank(columns['description'][i]),
+            'section': _cell_or_blank(columns['section'][i]),
+            'uom': _cell_or_blank(columns['uom'][i]),
+        }
+        for column in BOQ_NUMERIC_COLUMNS:
+            item[column] = columns[column][i]
+        item['dependencies'] = parse_dependencies(_cell_or_blank(columns['dependencies'][i]))
+        item['remarks'] = _cell_or_blank(columns['remarks'][i])
+
+        # Calculate total cost if not provided
+        if fill_total[i]:
+            item['total_cost'] = item['quantity'] * item['unit_cost']
+
+        boq_items.append(item)
+
+    return boq_items, stopped
+
+
+def _cell_or_blank(value) -> Any:
+    """Raw cell value, or '' for empty cells"""
+    if value is None or (isinstance(value, float) and value != value):
+        return ''
+    return value or ''
+
+
 def extract_company_boq_items(df: pd.DataFrame, start_row: int = 19) -> List[Dict[str, Any]]:
     """
     Extract BOQ items from company standard format (new template)
@@ -618,106 +933,15 @@ def extract_company_boq_items(df: pd.DataFrame, start_row: int = 19) -> List[Dic
         df: DataFrame containing the BOQ data
         start_row: Starting row index (0-based) for BOQ items. Default is 19 (row 20)
     """
-    boq_items = []
-    
-    # Start from specified row and go until we find empty rows or "TOTAL"
-    for row_idx in range(start_row, len(df)):
-        # Check if this is a total row or empty row
-        item_num = _get_cell_value(df, f'A{row_idx + 1}')
-        description = _get_cell_value(df, f'B{row_idx + 1}')
-        
-        if pd.isna(item_num) or str(item_num).upper() in ['TOTAL', 'GRAND TOTAL', '']:
-            break
-        
-        # Skip section headers (rows with description but no item number)
-        if pd.isna(item_num) or str(item_num).strip() == '':
-            continue
-        
-        # Skip subtotal rows
-        if 'subtotal' in str(description).lower():
-            continue
-        
-        try:
-            # Extract item data from new template format
-            item = {
-                'item_number': int(item_num) if not pd.isna(item_num) else 0,
-                'description': str(description) or '',
-                'section': _get_cell_value(df, f'C{row_idx + 1}') or '',
-                'uom': _get_cell_value(df, f'D{row_idx + 1}') or '',
-                'quantity': Decimal(str(_get_cell_value(df, f'E{row_idx + 1}') or 0)),
-                'unit_cost': Decimal(str(_get_cell_value(df, f'F{row_idx + 1}') or 0)),
-                'total_cost': Decimal(str(_get_cell_value(df, f'G{row_idx + 1}') or 0)),
-                'material_cost': Decimal(str(_get_cell_value(df, f'H{row_idx + 1}') or 0)),
-                'labor_cost': Decimal(str(_get_cell_value(df, f'I{row_idx + 1}') or 0)),
-                'equipment_cost': Decimal(str(_get_cell_value(df, f'J{row_idx + 1}') or 0)),
-                'subcontractor_cost': Decimal(str(_get_cell_value(df, f'K{row_idx + 1}') or 0)),
-                'dependencies': parse_dependencies(_get_cell_value(df, f'L{row_idx + 1}')),
-                'remarks': _get_cell_value(df, f'M{row_idx + 1}') or ''
-            }
-            
-            # Skip if no quantity or costs
-            if item['quantity'] == 0 and item['total_cost'] == 0:
-                continue
-            
-            # Calculate total cost if not provided
-            if item['total_cost'] == 0 and item['quantity'] > 0 and item['unit_cost'] > 0:
-                item['total_cost'] = item['quantity'] * item['unit_cost']
-            
-            boq_items.append(item)
-            
-        except (ValueError, TypeError) as e:
-            logger.warning(f"Error parsing company BOQ item at row {row_idx + 1}: {e}")
-            continue
-    
-    return boq_items
+    # Subtotal rows and rows with neither quantity nor total cost are skipped
+    return _extract_boq_rows(df, start_row, skip_subtotals=True, skip_empty=True, label='company BOQ item')
 
 
 def extract_detailed_boq_items(df: pd.DataFrame) -> List[Dict[str, Any]]:
     """
     Extract detailed BOQ items from the template starting at row 17
     """
-    boq_items = []
-    
-    # Start from row 17 (index 16) and go until we find empty rows or "TOTAL"
-    for row_idx in range(17, len(df)):
-        # Check if this is a total row or empty row
-        item_num = _get_cell_value(df, f'A{row_idx + 1}')
-        if pd.isna(item_num) or str(item_num).upper() in ['TOTAL', 'GRAND TOTAL', '']:
-            break
-        
-        # Skip section headers (rows with description but no item number)
-        if pd.isna(item_num) or str(item_num).strip() == '':
-            continue
-        
-        try:
-            # Extract item data
-            item = {
-                'item_number': int(item_num) if not pd.isna(item_num) else 0,
-                'description': _get_cell_value(df, f'B{row_idx + 1}') or '',
-                'section': _get_cell_value(df, f'C{row_idx + 1}') or '',
-                'uom': _get_cell_value(df, f'D{row_idx + 1}') or '',
-                'quantity': Decimal(str(_get_cell_value(df, f'E{row_idx + 1}') or 0)),
-                'unit_cost': Decimal(str(_get_cell_value(df, f'F{row_idx + 1}') or 0)),
-                'total_cost': Decimal(str(_get_cell_value(df, f'G{row_idx + 1}') or 0)),
-                'material_cost': Decimal(str(_get_cell_value(df, f'H{row_idx + 1}') or 0)),
-                'labor_cost': Decimal(str(_get_cell_value(df, f'I{row_idx + 1}') or 0)),
-                'equipment_cost': Decimal(str(_get_cell_value(df, f'J{row_idx + 1}') or 0)),
-                'subcontractor_cost': Decimal(str(_get_cell_value(df, f'K{row_idx + 1}') or 0)),
-                'dependencies': parse_dependencies(_get_cell_value(df, f'L{row_idx + 1}')),
-                'remarks': _get_cell_value(df, f'M{row_idx + 1}') or ''
-            }
-            
-            # Calculate total cost if not provided
-            if item['total_cost'] == 0 and item['quantity'] > 0 and item['unit_cost'] > 0:
-                item['total_cost'] = item['quantity'] * item['unit_cost']
-            
-            boq_items.append(item)
-            
-        except (ValueError, TypeError) as e:
-            logger.warning(f"Error parsing BOQ item at row {row_idx + 1}: {e}")
-            continue
-    
-    return boq_items
+    return _extract_boq_rows(df, 17, skip_subtotals=False, skip_empty=False, label='BOQ item')
 
 
 def _get_cell_value(df: pd.DataFrame, cell_ref: str) -> Any:
@@ -765,53 +989,98 @@ def extract_cost_summary(file_content: bytes, file_extension: str) -> Dict[str,
     }
 
 
+# Rows mentioning these hold the figures the fallback extractor looks for
+TOTAL_KEYWORDS = re.compile(r'grand total|subtotal|total', re.IGNORECASE)
+LOT_SIZE_KEYWORDS = re.compile(r'lot size|floor area|area', re.IGNORECASE)
+
+# Cell kinds for the scan: text, numbers; anything else (dates, booleans) is ignored,
+# matching the cells Decimal(str(...)) accepted
+_TEXT, _NUMBER = 1, 2
+_CELL_KINDS = {str: _TEXT, float: _NUMBER, int: _NUMBER, np.float64: _NUMBER, np.int64: _NUMBER}
+
+
+def _largest_in_keyword_rows(values: np.ndarray, rows: np.ndarray, kinds: np.ndarray,
+                             text: pd.Series, pattern: re.Pattern) -> Optional[Any]:
+    """
+    Largest numeric cell in any row where some text cell matches the pattern, returned
+    as the raw cell value (None if there is none). values/rows/kinds describe the sheet's
+    non-empty cells; text is the view of its text cells.
+    """
+    is_text = kinds == _TEXT
+    hit_rows = np.unique(rows[is_text][text.str.contains(pattern).to_numpy(dtype=bool)])
+    if not len(hit_rows):
+        return None
+
+    in_hit_rows = np.isin(rows, hit_rows)
+    candidates = values[in_hit_rows & (kinds != 0)]
+    numbers = np.empty(len(candidates), dtype=float)
+    candidate_text = kinds[in_hit_rows & (kinds != 0)] == _TEXT
+    numbers[~candidate_text] = candidates[~candidate_text].astype(float)
+    numbers[candidate_text] = pd.to_numeric(
+        pd.Series(candidates[candidate_text], dtype=object), errors='coerce'
+    ).to_numpy(dtype=float)
+
+    numbers[~np.isfinite(numbers)] = -np.inf
+    if not len(numbers) or numbers.max() == -np.inf:
+        return None
+    return candidates[int(numbers.argmax())]
+
+
+def _scan_sheet_figures(df: pd.DataFrame) -> Tuple[Decimal, Decimal]:
+    """Largest total cost and lot size figures in one sheet"""
+    grid = df.to_numpy(dtype=object)
+    rows, columns = np.nonzero(pd.notna(grid))
+    if not len(rows):
+        return Decimal('0'), Decimal('0')
+
+    # Stack the non-empty cells into flat arrays; only text cells are searched for keywords
+    values = grid[rows, columns]
+    kinds = np.fromiter((_CELL_KINDS.get(type(value), 0) for value in values), dtype=np.int8, count=len(values))
+    text = pd.Series(values[kinds == _TEXT], dtype=object)
+
+    figures = []
+    for pattern in (TOTAL_KEYWORDS, LOT_SIZE_KEYWORDS):
+        value = _largest_in_keyword_rows(values, rows, kinds, text, pattern)
+        figures.append(max(Decimal(str(value)), Decimal('0')) if value is not None else Decimal('0'))
+    return figures[0], figures[1]
+
+
+def _iter_scan_frames(file_content: bytes) -> Iterator[pd.DataFrame]:
+    """Sheets as DataFrames from one parse of the file, or as row chunks when streaming"""
+    source = _excel_source(file_content)
+    if not use_streaming(source):
+        yield from pd.read_excel(source, sheet_name=None).values()
+        return
+
+    buffer: List[tuple] = []
+    current_sheet = None
+    for sheet_name, row_idx, values in iter_excel_rows(source):
+        if sheet_name != current_sheet or len(buffer) >= STREAM_CHUNK_ROWS:
+            if buffer:
+                yield pd.DataFrame(buffer)
+            buffer = []
+        if sheet_name != current_sheet:
+            current_sheet = sheet_name
+            # The header row is not scanned, as with pd.read_excel
+            continue
+        buffer.append(values)
+    if buffer:
+        yield pd.DataFrame(buffer)
+
+
 def _extract_from_excel_intelligent(file_content: bytes) -> Dict[str, Any]:
     """
     Intelligent extraction from non-standard Excel files
     """
     try:
-        # Read all sheets
-        excel_file = pd.ExcelFile(file_content)
-        
         total_cost = Decimal('0')
         lot_size = Decimal('0')
-        cost_breakdown = {}
         
-        # Look for cost-related keywords in all sheets
-        for sheet_name in excel_file.sheet_names:
-            df = pd.read_excel(file_content, sheet_name=sheet_name)
-            
-            # Search for total cost
-            for col in df.columns:
-                for idx, value in df[col].items():
-                    if pd.notna(value):
-                        value_str = str(value).lower()
-                        if any(keyword in value_str for keyword in ['total', 'grand total', 'subtotal']):
-                            # Try to find numeric value in same row
-                            for col2 in df.columns:
-                                if pd.notna(df[col2].iloc[idx]):
-                                    try:
-                                        cost_val = Decimal(str(df[col2].iloc[idx]))
-                                        if cost_val > total_cost:
-                                            total_cost = cost_val
-                                    except:
-                                        pass
-            
-            # Search for lot size
-            for col in df.columns:
-                for idx, value in df[col].items():
-                    if pd.notna(value):
-                        value_str = str(value).lower()
-                        if any(keyword in value_str for keyword in ['lot size', 'floor area', 'area']):
-                            # Try to find numeric value
-                            for col2 in df.columns:
-                                if pd.notna(df[col2].iloc[idx]):
-                                    try:
-                                        size_val = Decimal(str(df[col2].iloc[idx]))
-                                        if size_val > lot_size:
-                                            lot_size = size_val
-                                    except:
-                                        pass
+        # Largest figure on any row mentioning a total, and on any row mentioning an area
+        for df in _iter_scan_frames(file_content):
+            sheet_total, sheet_lot_size = _scan_sheet_figures(df)
+            total_cost = max(total_cost, sheet_total)
+            lot_size = max(lot_size, sheet_lot_size)
         
         cost_per_sqm = total_cost / lot_size if lot_size > 0 else Decimal('0')
         
@@ -851,7 +1120,12 @@ def _extract_from_pdf_intelligent(file_content: bytes) -> Dict[str, Any]:
     try:
         # Use pdfplumber for better text extraction
         import io
-        pdf_file = io.BytesIO(file_content)
+        if isinstance(file_content, SpooledUpload):
+            pdf_file = file_content.open()
+        elif isinstance(file_content, (bytes, bytearray)):
+            pdf_file = io.BytesIO(file_content)
+        else:
+            pdf_file = file_content
         
         total_cost = Decimal('0')
         lot_size = Decimal('0')
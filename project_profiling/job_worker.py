@@ -0,0 +1,23 @@
+"""
+Extraction Job Worker Entry Points
+Kept free of model imports so spawned pool processes can set up Django before
+anything touches the ORM
+"""
+
+
+def init_worker():
+    import django
+
+    django.setup()
+
+
+def execute_job(job_id: int):
+    from django.db import close_old_connections
+
+    from .extraction_jobs import run_job
+
+    close_old_connections()
+    try:
+        run_job(job_id)
+    finally:
+        close_old_connections()
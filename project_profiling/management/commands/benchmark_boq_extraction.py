@@ -0,0 +1,100 @@
+import random
+import time
+from decimal import Decimal
+
+import pandas as pd
+from django.core.management.base import BaseCommand
+
+from project_profiling.file_processing import (
+    _get_cell_value,
+    extract_company_boq_items,
+    parse_dependencies,
+)
+
+HEADER_ROWS = 19
+SECTIONS = ["General Requirements", "Earthworks", "Concrete Works", "Masonry", "Finishes", "Electrical"]
+UOMS = ["sqm", "cu.m", "lm", "pcs", "lot", "kg"]
+
+
+def generate_boq_frame(rows: int, seed: int = 0) -> pd.DataFrame:
+    """Company template sheet with a header block, section headers, subtotals and a TOTAL row"""
+    rng = random.Random(seed)
+    data = [[f"Header {i}", None] + [None] * 11 for i in range(HEADER_ROWS)]
+    item_number = 0
+    for i in range(rows):
+        if i % 50 == 0:
+            data.append([" ", f"SECTION {i // 50}"] + [None] * 11)
+        if i % 50 == 49:
+            data.append([" ", "Subtotal"] + [None] * 11)
+            continue
+        item_number += 1
+        quantity = round(rng.uniform(1, 500), 2)
+        unit_cost = round(rng.uniform(50, 5000), 2)
+        total = round(quantity * unit_cost, 2) if i % 7 else None
+        data.append([
+            item_number, f"Item {item_number} description", rng.choice(SECTIONS), rng.choice(UOMS),
+            quantity, unit_cost, total, round(unit_cost * 0.6, 2), round(unit_cost * 0.3, 2),
+            round(unit_cost * 0.1, 2), 0, f"{max(item_number - 1, 1)}" if i % 5 == 0 else None, None,
+        ])
+    data.append(["TOTAL"] + [None] * 12)
+    return pd.DataFrame(data)
+
+
+def extract_per_cell(df: pd.DataFrame, start_row: int = HEADER_ROWS):
+    """Previous per-cell implementation, kept here as the benchmark baseline"""
+    boq_items = []
+    for row_idx in range(start_row, len(df)):
+        item_num = _get_cell_value(df, f'A{row_idx + 1}')
+        description = _get_cell_value(df, f'B{row_idx + 1}')
+        if pd.isna(item_num) or str(item_num).upper() in ['TOTAL', 'GRAND TOTAL', '']:
+            break
+        if str(item_num).strip() == '' or 'subtotal' in str(description).lower():
+            continue
+        item = {
+            'item_number': int(item_num),
+            'description': str(description) or '',
+            'section': _get_cell_value(df, f'C{row_idx + 1}') or '',
+            'uom': _get_cell_value(df, f'D{row_idx + 1}') or '',
+        }
+        for column, field in zip('EFGHIJK', ['quantity', 'unit_cost', 'total_cost', 'material_cost',
+                                              'labor_cost', 'equipment_cost', 'subcontractor_cost']):
+            item[field] = Decimal(str(_get_cell_value(df, f'{column}{row_idx + 1}') or 0))
+        item['dependencies'] = parse_dependencies(_get_cell_value(df, f'L{row_idx + 1}'))
+        item['remarks'] = _get_cell_value(df, f'M{row_idx + 1}') or ''
+        if item['quantity'] == 0 and item['total_cost'] == 0:
+            continue
+        if item['total_cost'] == 0 and item['quantity'] > 0 and item['unit_cost'] > 0:
+            item['total_cost'] = item['quantity'] * item['unit_cost']
+        boq_items.append(item)
+    return boq_items
+
+
+class Command(BaseCommand):
+    help = "Time BOQ row extraction on a generated company-template sheet against the per-cell baseline."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=20000, help="BOQ rows to generate")
+        parser.add_argument("--repeat", type=int, default=3, help="Best of N runs")
+
+    def handle(self, *args, **options):
+        df = generate_boq_frame(options["rows"])
+
+        def best_of(func):
+            timings = []
+            for _ in range(options["repeat"]):
+                started = time.perf_counter()
+                result = func(df)
+                timings.append(time.perf_counter() - started)
+            return min(timings), result
+
+        baseline_time, baseline = best_of(extract_per_cell)
+        vectorized_time, vectorized = best_of(extract_company_boq_items)
+
+        if baseline != vectorized:
+            self.stderr.write(self.style.ERROR("Vectorized extraction does not match the per-cell baseline"))
+            return
+
+        self.stdout.write(f"Rows generated:   {options['rows']:,} ({len(vectorized):,} items extracted)")
+        self.stdout.write(f"Per-cell:         {baseline_time * 1000:,.1f} ms")
+        self.stdout.write(f"Vectorized:       {vectorized_time * 1000:,.1f} ms")
+        self.stdout.write(self.style.SUCCESS(f"Speedup:          {baseline_time / vectorized_time:,.1f}x"))
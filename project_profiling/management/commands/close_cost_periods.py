@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from project_profiling.cost_snapshots import (
+    close_period, earliest_ledger_date, iter_periods, month_start, parse_period, previous_month
+)
+
+
+class Command(BaseCommand):
+    help = "Close monthly cost periods into CostPeriodSnapshot rows (defaults to last month)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--month", help="Month to close, as YYYY-MM")
+        parser.add_argument("--from", dest="start", help="First month of a range to (re)close, as YYYY-MM")
+        parser.add_argument("--to", dest="end", help="Last month of a range to (re)close, as YYYY-MM")
+        parser.add_argument(
+            "--backfill", action="store_true",
+            help="Close every month from the earliest ledger entry to last month"
+        )
+        parser.add_argument("--project", type=int, action="append", help="Limit to project id (repeatable)")
+
+    def handle(self, *args, **options):
+        current_month = month_start(timezone.localdate())
+        try:
+            if options["backfill"]:
+                first = earliest_ledger_date()
+                if not first:
+                    self.stdout.write(self.style.WARNING("No cost data found; nothing to close."))
+                    return
+                periods = list(iter_periods(first, previous_month(current_month)))
+            elif options["start"]:
+                end = parse_period(options["end"]) if options["end"] else previous_month(current_month)
+                periods = list(iter_periods(parse_period(options["start"]), end))
+            elif options["month"]:
+                periods = [parse_period(options["month"])]
+            else:
+                periods = [previous_month(current_month)]
+        except ValueError:
+            raise CommandError("Months must be given as YYYY-MM")
+
+        total_rows = 0
+        for period in periods:
+            rows = close_period(period, project_ids=options["project"])
+            total_rows += rows
+            self.stdout.write(f"Closed {period:%Y-%m}: {rows} snapshot rows")
+
+        self.stdout.write(self.style.SUCCESS(f"Done. {len(periods)} periods, {total_rows} rows written."))
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from project_profiling.boq_items import sync_boq_items
+from project_profiling.models import ProjectProfile
+
+
+class Command(BaseCommand):
+    help = "Populate BOQItem rows from ProjectProfile.boq_items (only projects whose BOQ changed, unless --force)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--project", type=int, action="append", help="Limit to project id (repeatable)")
+        parser.add_argument("--force", action="store_true", help="Rewrite rows even if the BOQ hash is unchanged")
+
+    def handle(self, *args, **options):
+        projects = ProjectProfile.objects.filter(boq_items__isnull=False).only(
+            "id", "project_type_id", "boq_items", "boq_version"
+        )
+        if options["project"]:
+            projects = projects.filter(id__in=options["project"])
+
+        synced = 0
+        checked = 0
+        for project in projects.iterator(chunk_size=100):
+            checked += 1
+            if sync_boq_items(project, force=options["force"]):
+                synced += 1
+
+        self.stdout.write(self.style.SUCCESS(f"Done. {synced} of {checked} projects rewritten."))
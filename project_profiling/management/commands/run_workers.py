@@ -0,0 +1,78 @@
+import multiprocessing
+import os
+import socket
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from project_profiling.extraction_jobs import claim_jobs, mark_failed, release_jobs, requeue_stale_jobs
+from project_profiling.job_worker import execute_job, init_worker
+
+
+class Command(BaseCommand):
+    help = "Process queued extraction jobs in a bounded pool of worker processes."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=min(os.cpu_count() or 1, 4),
+                            help="Worker processes (default: CPU count, at most 4)")
+        parser.add_argument("--poll-interval", type=float, default=2.0,
+                            help="Seconds to wait between polls when the queue is empty")
+        parser.add_argument("--once", action="store_true", help="Exit once the queue is drained")
+
+    def handle(self, *args, **options):
+        workers = max(options["workers"], 1)
+        worker_name = f"{socket.gethostname()}:{os.getpid()}"
+        requeue_stale_jobs()
+        self.stdout.write(f"Extraction workers started ({workers} processes) as {worker_name}")
+
+        pool = self._new_pool(workers)
+        running = {}
+        try:
+            while True:
+                close_old_connections()
+                free = workers - len(running)
+                if free:
+                    for job_id in claim_jobs(free, worker_name):
+                        running[pool.submit(execute_job, job_id)] = job_id
+
+                if not running:
+                    if options["once"]:
+                        break
+                    time.sleep(options["poll_interval"])
+                    continue
+
+                done, _ = wait(running, timeout=options["poll_interval"], return_when=FIRST_COMPLETED)
+                broken = False
+                for future in done:
+                    job_id = running.pop(future)
+                    try:
+                        future.result()
+                    except BrokenProcessPool:
+                        broken = True
+                        release_jobs([job_id], "Worker process terminated unexpectedly")
+                    except Exception as e:
+                        mark_failed(job_id, str(e))
+
+                if broken:
+                    # A worker died mid-job (e.g. out of memory): every in-flight job is lost with the pool
+                    self.stderr.write("Worker process crashed; requeueing in-flight jobs and restarting the pool")
+                    release_jobs(list(running.values()), "Worker process terminated unexpectedly")
+                    running.clear()
+                    pool.shutdown(wait=False, cancel_futures=True)
+                    pool = self._new_pool(workers)
+        except KeyboardInterrupt:
+            self.stdout.write("Stopping extraction workers")
+        finally:
+            pool.shutdown(wait=True, cancel_futures=True)
+
+        self.stdout.write(self.style.SUCCESS("Extraction workers stopped."))
+
+    @staticmethod
+    def _new_pool(workers: int) -> ProcessPoolExecutor:
+        # Spawned, not forked, so workers never share the parent's database connections
+        return ProcessPoolExecutor(
+            max_workers=workers, mp_context=multiprocessing.get_context("spawn"), initializer=init_worker
+        )
@@ -0,0 +1,56 @@
+# Generated by Django 5.2.5 on 2026-10-19 04:02
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Max, Sum
+
+
+def seed_counters_and_reconcile_totals(apps, schema_editor):
+    """
+    Seed payment counters from existing payments and rebuild amount_paid once,
+    so later delta updates start from a correct baseline.
+    """
+    SubcontractorExpense = apps.get_model('project_profiling', 'SubcontractorExpense')
+    SubcontractorPayment = apps.get_model('project_profiling', 'SubcontractorPayment')
+    SubcontractorPaymentCounter = apps.get_model('project_profiling', 'SubcontractorPaymentCounter')
+
+    last_numbers = dict(
+        SubcontractorPayment.objects.values('subcontractor_expense_id')
+        .annotate(last=Max('payment_number'))
+        .values_list('subcontractor_expense_id', 'last')
+    )
+    paid_totals = dict(
+        SubcontractorPayment.objects.filter(status__in=['APPR', 'PAID'])
+        .values('subcontractor_expense_id')
+        .annotate(total=Sum('amount'))
+        .values_list('subcontractor_expense_id', 'total')
+    )
+
+    SubcontractorPaymentCounter.objects.bulk_create([
+        SubcontractorPaymentCounter(subcontractor_expense_id=expense_id, last_payment_number=last or 0)
+        for expense_id, last in last_numbers.items()
+    ])
+
+    expenses = list(SubcontractorExpense.objects.filter(id__in=last_numbers.keys()).only('id', 'amount_paid'))
+    for expense in expenses:
+        expense.amount_paid = paid_totals.get(expense.id) or 0
+    SubcontractorExpense.objects.bulk_update(expenses, ['amount_paid'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('project_profiling', '0023_projecttypecosthistory_project_role'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SubcontractorPaymentCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_payment_number', models.PositiveIntegerField(default=0)),
+                ('subcontractor_expense', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='payment_counter', to='project_profiling.subcontractorexpense')),
+            ],
+        ),
+        migrations.RunPython(seed_counters_and_reconcile_totals, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-19 04:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authentication', '0001_initial'),
+        ('project_profiling', '0024_subcontractorpaymentcounter'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='subcontractorexpense',
+            index=models.Index(fields=['created_at', 'id'], name='project_pro_created_4b46c7_idx'),
+        ),
+    ]
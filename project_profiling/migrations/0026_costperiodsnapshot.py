@@ -0,0 +1,34 @@
+# Generated by Django 5.2.5 on 2026-10-19 04:06
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('project_profiling', '0025_subcontractorexpense_created_at_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CostPeriodSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('category', models.CharField(choices=[('LAB', 'Labor'), ('MAT', 'Materials'), ('EQP', 'Equipment'), ('SUB', 'Subcontractor'), ('MOB', 'Mobilization'), ('OTH', 'Other')], max_length=3)),
+                ('period', models.DateField(help_text='First day of the snapshot month')),
+                ('planned', models.DecimalField(decimal_places=2, default=0, max_digits=15)),
+                ('allocated', models.DecimalField(decimal_places=2, default=0, max_digits=15)),
+                ('spent', models.DecimalField(decimal_places=2, default=0, max_digits=15)),
+                ('committed', models.DecimalField(decimal_places=2, default=0, help_text='Subcontract value under contract (not cancelled)', max_digits=15)),
+                ('mobilization', models.DecimalField(decimal_places=2, default=0, max_digits=15)),
+                ('closed_at', models.DateTimeField(auto_now=True)),
+                ('project', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='cost_snapshots', to='project_profiling.projectprofile')),
+            ],
+            options={
+                'ordering': ['project', 'period', 'category'],
+                'indexes': [models.Index(fields=['project', 'period'], name='project_pro_project_11eb6a_idx'), models.Index(fields=['period'], name='project_pro_period_37790c_idx')],
+                'unique_together': {('project', 'category', 'period')},
+            },
+        ),
+    ]
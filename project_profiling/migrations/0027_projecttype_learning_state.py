@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-19 04:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('project_profiling', '0026_costperiodsnapshot'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='projecttype',
+            name='learning_state',
+            field=models.JSONField(blank=True, help_text='Exponentially-decayed weighted sums per complexity level (maintained by CostLearningEngine)', null=True),
+        ),
+    ]
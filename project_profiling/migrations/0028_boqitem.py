@@ -0,0 +1,46 @@
+# Generated by Django 5.2.5 on 2026-10-19 04:14
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('project_profiling', '0027_projecttype_learning_state'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='projectprofile',
+            name='boq_version',
+            field=models.CharField(blank=True, default='', help_text='Content hash of boq_items last synced to BOQItem rows', max_length=40),
+        ),
+        migrations.CreateModel(
+            name='BOQItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('position', models.PositiveIntegerField(help_text='Order of the line in the BOQ')),
+                ('item_number', models.CharField(blank=True, max_length=50)),
+                ('description', models.TextField(blank=True)),
+                ('normalized_description', models.CharField(blank=True, max_length=255)),
+                ('section', models.CharField(blank=True, max_length=255)),
+                ('section_category', models.CharField(default='General', max_length=100)),
+                ('uom', models.CharField(blank=True, max_length=50)),
+                ('quantity', models.DecimalField(decimal_places=4, default=0, max_digits=15)),
+                ('unit_cost', models.DecimalField(decimal_places=2, default=0, max_digits=15)),
+                ('total_cost', models.DecimalField(decimal_places=2, default=0, max_digits=15)),
+                ('material_cost', models.DecimalField(decimal_places=2, default=0, max_digits=15)),
+                ('labor_cost', models.DecimalField(decimal_places=2, default=0, max_digits=15)),
+                ('equipment_cost', models.DecimalField(decimal_places=2, default=0, max_digits=15)),
+                ('subcontractor_cost', models.DecimalField(decimal_places=2, default=0, max_digits=15)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('project', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='boq_item_rows', to='project_profiling.projectprofile')),
+                ('project_type', models.ForeignKey(blank=True, help_text='Copied from the project for indexed cross-project queries', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='boq_item_rows', to='project_profiling.projecttype')),
+            ],
+            options={
+                'ordering': ['project', 'position'],
+                'indexes': [models.Index(fields=['project', 'position'], name='project_pro_project_4827cf_idx'), models.Index(fields=['project_type', 'section_category'], name='project_pro_project_bc34d6_idx'), models.Index(fields=['project_type', 'normalized_description', 'uom'], name='project_pro_project_038ddb_idx'), models.Index(fields=['normalized_description'], name='project_pro_normali_20b782_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.5 on 2026-10-19 04:16
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('project_profiling', '0028_boqitem'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BOQCatalogItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(help_text='Display name (first wording seen)', max_length=255)),
+                ('normalized_name', models.CharField(help_text='Sorted normalized tokens; identical token sets are the same item', max_length=255, unique=True)),
+                ('default_uom', models.CharField(blank=True, max_length=50)),
+                ('section_category', models.CharField(default='General', max_length=100)),
+                ('is_active', models.BooleanField(default=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'BOQ Catalog Item',
+                'verbose_name_plural': 'BOQ Catalog Items',
+                'ordering': ['name'],
+            },
+        ),
+        migrations.AddField(
+            model_name='boqitem',
+            name='catalog_item',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='boq_items', to='project_profiling.boqcatalogitem'),
+        ),
+        migrations.AddIndex(
+            model_name='boqitem',
+            index=models.Index(fields=['project_type', 'catalog_item', 'uom'], name='project_pro_project_588ee5_idx'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.5 on 2026-10-19 04:27
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('project_profiling', '0029_boqcatalogitem'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExtractionCacheEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('content_hash', models.CharField(max_length=64)),
+                ('extractor', models.CharField(help_text='Extraction routine, e.g. cost_summary', max_length=50)),
+                ('extractor_version', models.CharField(max_length=20)),
+                ('payload', models.TextField(help_text='Encoded extraction result')),
+                ('size', models.PositiveIntegerField(help_text='Payload size in bytes')),
+                ('hits', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('last_accessed_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+            ],
+            options={
+                'ordering': ['-last_accessed_at'],
+                'unique_together': {('content_hash', 'extractor', 'extractor_version')},
+            },
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.5 on 2026-10-19 04:29
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authentication', '0001_initial'),
+        ('project_profiling', '0030_extractioncacheentry'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExtractionJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('job_type', models.CharField(choices=[('cost_summary', 'BOQ Cost Summary'), ('file_preview', 'File Preview'), ('schedule_pdf', 'Schedule PDF Import')], max_length=20)),
+                ('status', models.CharField(choices=[('QUEUED', 'Queued'), ('RUNNING', 'Running'), ('SUCCEEDED', 'Succeeded'), ('FAILED', 'Failed')], default='QUEUED', max_length=10)),
+                ('file', models.FileField(blank=True, upload_to='extraction_jobs/')),
+                ('file_name', models.CharField(max_length=255)),
+                ('params', models.JSONField(blank=True, default=dict, help_text='Job options, e.g. project_type_id')),
+                ('progress', models.PositiveSmallIntegerField(default=0, help_text='Percent complete')),
+                ('progress_message', models.CharField(blank=True, max_length=255)),
+                ('result', models.TextField(blank=True, help_text='Encoded result payload')),
+                ('error', models.TextField(blank=True)),
+                ('attempts', models.PositiveSmallIntegerField(default=0)),
+                ('worker', models.CharField(blank=True, max_length=100)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='authentication.userprofile')),
+            ],
+            options={
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['status', 'created_at'], name='project_pro_status_cd730d_idx')],
+            },
+        ),
+    ]
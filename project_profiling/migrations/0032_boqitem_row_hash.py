@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-19 04:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('project_profiling', '0031_extractionjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='boqitem',
+            name='row_hash',
+            field=models.CharField(blank=True, default='', help_text='Content hash used to diff BOQ revisions', max_length=40),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-19 04:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authentication', '0001_initial'),
+        ('project_profiling', '0032_boqitem_row_hash'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='projectdocument',
+            index=models.Index(fields=['uploaded_at', 'id'], name='project_pro_uploade_77843c_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.5 on 2026-10-19 04:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('project_profiling', '0034_cacheversion'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='boqcatalogitem',
+            index=models.Index(fields=['created_at'], name='project_pro_created_3fb402_idx'),
+        ),
+    ]
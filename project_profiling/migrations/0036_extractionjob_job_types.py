@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-19 05:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('project_profiling', '0035_boqcatalogitem_created_at_index'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='extractionjob',
+            name='job_type',
+            field=models.CharField(choices=[('cost_summary', 'BOQ Cost Summary'), ('file_preview', 'File Preview')], max_length=20),
+        ),
+    ]
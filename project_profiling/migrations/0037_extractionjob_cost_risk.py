@@ -0,0 +1,28 @@
+# Generated by Django 5.2.5 on 2026-10-19 05:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authentication', '0001_initial'),
+        ('project_profiling', '0036_extractionjob_job_types'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='extractionjob',
+            name='job_type',
+            field=models.CharField(choices=[('cost_summary', 'BOQ Cost Summary'), ('file_preview', 'File Preview'), ('cost_risk', 'BOQ Cost Risk')], max_length=20),
+        ),
+        migrations.AlterField(
+            model_name='extractionjob',
+            name='params',
+            field=models.JSONField(blank=True, default=dict, help_text='Job options, e.g. project_type_id or project_id'),
+        ),
+        migrations.AddIndex(
+            model_name='extractionjob',
+            index=models.Index(fields=['job_type', 'status'], name='project_pro_job_typ_fcc654_idx'),
+        ),
+    ]
@@ -1,6 +1,6 @@
-from django.db import models
+from django.db import models, transaction
 from authentication.models import UserProfile
-from django.db.models import Sum
+from django.db.models import Sum, Max, F
 from decimal import Decimal
 from django.utils import timezone
 from manage_client.models import Client
@@ -84,6 +84,11 @@ class ProjectType(models.Model):
         blank=True,
         help_text="Timestamp of last cost data update"
     )
+    learning_state = models.JSONField(
+        null=True,
+        blank=True,
+        help_text="Exponentially-decayed weighted sums per complexity level (maintained by CostLearningEngine)"
+    )
     
     created_by = models.ForeignKey(UserProfile, on_delete=models.SET_NULL, null=True)
     created_at = models.DateTimeField(default=timezone.now, editable=False)
@@ -596,7 +601,15 @@ class ProjectProfile(models.Model):
             self.project_id = f"{prefix}-{self.id:03d}"  # e.g., GC-001
             kwargs['force_insert'] = False
             super().save(*args, **kwargs)
-        
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Lets post_save tell whether the project type changed; boq_items changes are caught by boq_version
+        if 'project_type_id' in field_names:
+            instance._stored_project_type_id = instance.project_type_id
+        return instance
+
     def update_progress_from_tasks(self):
         tasks = self.tasks.all()
         if tasks.exists():
@@ -651,6 +664,12 @@ class ProjectProfile(models.Model):
         blank=True,
         help_text="Dependency mapping for BOQ items"
     )
+    boq_version = models.CharField(
+        max_length=40,
+        blank=True,
+        default='',
+        help_text="Content hash of boq_items last synced to BOQItem rows"
+    )
     project_role = models.CharField(
         max_length=20,
         choices=[
@@ -866,6 +885,7 @@ class SubcontractorExpense(models.Model):
         indexes = [
             models.Index(fields=['project', 'status']),
             models.Index(fields=['subcontractor_name']),
+            models.Index(fields=['created_at', 'id']),
         ]
 
     def __str__(self):
@@ -883,6 +903,21 @@ class SubcontractorExpense(models.Model):
             return (self.amount_paid / self.contract_amount) * 100
         return 0
 
+    @classmethod
+    def apply_paid_delta(cls, subcontractor_expense_id, delta):
+        """Atomically add delta to amount_paid without re-aggregating payments"""
+        if delta:
+            cls.objects.filter(pk=subcontractor_expense_id).update(
+                amount_paid=F('amount_paid') + delta
+            )
+
+    def recalculate_amount_paid(self):
+        """Full rebuild of amount_paid from approved/paid payments (for reconciliation)"""
+        self.amount_paid = self.payments.filter(
+            status__in=SubcontractorPayment.PAID_STATUSES
+        ).aggregate(total=Sum('amount'))['total'] or Decimal('0')
+        self.save(update_fields=['amount_paid'])
+
 
 class SubcontractorPayment(models.Model):
     """Track individual payments to subcontractors (supports milestone-based payments)"""
@@ -946,31 +981,88 @@ class SubcontractorPayment(models.Model):
     def __str__(self):
         return f"{self.subcontractor_expense.subcontractor_name} - Payment #{self.payment_number} (₱{self.amount:,.2f})"
 
-    def save(self, *args, **kwargs):
-        # Auto-set payment number if not provided
-        if not self.payment_number:
-            last_payment = SubcontractorPayment.objects.filter(
-                subcontractor_expense=self.subcontractor_expense
-            ).order_by('-payment_number').first()
-            self.payment_number = (last_payment.payment_number + 1) if last_payment else 1
+    # Statuses whose amount counts toward SubcontractorExpense.amount_paid
+    PAID_STATUSES = ('APPR', 'PAID')
 
+    def save(self, *args, **kwargs):
         # Update approval timestamp
         if self.status == 'APPR' and not self.approved_at and self.approved_by:
             self.approved_at = timezone.now()
 
-        super().save(*args, **kwargs)
+        with transaction.atomic():
+            # Auto-set payment number if not provided
+            if not self.payment_number:
+                self.payment_number = SubcontractorPaymentCounter.reserve(self.subcontractor_expense_id)
 
-        # Update parent SubcontractorExpense total
-        self._update_parent_totals()
+            previous = None
+            if self.pk:
+                previous = SubcontractorPayment.objects.select_for_update().filter(
+                    pk=self.pk
+                ).values('subcontractor_expense_id', 'status', 'amount').first()
 
-    def _update_parent_totals(self):
-        """Update the parent SubcontractorExpense amount_paid based on approved/paid payments"""
-        total_paid = self.subcontractor_expense.payments.filter(
-            status__in=['APPR', 'PAID']
-        ).aggregate(total=Sum('amount'))['total'] or Decimal('0')
+            super().save(*args, **kwargs)
+
+            # Update parent SubcontractorExpense total by the change this save caused
+            contribution = self.paid_contribution(self.status, self.amount)
+            if previous:
+                previous_contribution = self.paid_contribution(previous['status'], previous['amount'])
+                if previous['subcontractor_expense_id'] == self.subcontractor_expense_id:
+                    contribution -= previous_contribution
+                else:
+                    # Moved to another expense: the old parent is not the one cached on self
+                    SubcontractorExpense.apply_paid_delta(previous['subcontractor_expense_id'], -previous_contribution)
+            self._apply_parent_delta(contribution)
+
+    @classmethod
+    def paid_contribution(cls, status, amount):
+        """Amount a payment in the given status contributes to amount_paid"""
+        return (amount or Decimal('0')) if status in cls.PAID_STATUSES else Decimal('0')
+
+    def _apply_parent_delta(self, delta):
+        """Shift the parent amount_paid by delta and keep any cached parent in sync"""
+        if not delta:
+            return
+        SubcontractorExpense.apply_paid_delta(self.subcontractor_expense_id, delta)
+        if SubcontractorPayment.subcontractor_expense.is_cached(self):
+            self.subcontractor_expense.amount_paid += delta
+
+
+class SubcontractorPaymentCounter(models.Model):
+    """Per-subcontractor sequence that hands out payment numbers under a row lock"""
+    subcontractor_expense = models.OneToOneField(
+        SubcontractorExpense,
+        on_delete=models.CASCADE,
+        related_name='payment_counter'
+    )
+    last_payment_number = models.PositiveIntegerField(default=0)
 
-        self.subcontractor_expense.amount_paid = total_paid
-        self.subcontractor_expense.save(update_fields=['amount_paid'])
+    def __str__(self):
+        return f"{self.subcontractor_expense.subcontractor_name} - last #{self.last_payment_number}"
+
+    @classmethod
+    def reserve(cls, subcontractor_expense_id, count=1):
+        """
+        Reserve `count` consecutive payment numbers and return the first one.
+        Must be called inside a transaction so the row lock is held until commit.
+        """
+        counter = cls.objects.select_for_update().filter(
+            subcontractor_expense_id=subcontractor_expense_id
+        ).first()
+        if counter is None:
+            # Seed from existing payments so numbering continues where it left off
+            last_number = SubcontractorPayment.objects.filter(
+                subcontractor_expense_id=subcontractor_expense_id
+            ).aggregate(last=Max('payment_number'))['last'] or 0
+            counter, _ = cls.objects.get_or_create(
+                subcontractor_expense_id=subcontractor_expense_id,
+                defaults={'last_payment_number': last_number}
+            )
+            counter = cls.objects.select_for_update().get(pk=counter.pk)
+
+        first_number = counter.last_payment_number + 1
+        counter.last_payment_number += count
+        counter.save(update_fields=['last_payment_number'])
+        return first_number
 
 
 class MobilizationCost(models.Model):
@@ -1025,6 +1117,220 @@ class MobilizationCost(models.Model):
         return self.quantity * self.unit_cost
 
 
+class CostPeriodSnapshot(models.Model):
+    """
+    Month-end snapshot of a project's cost position for one budget category.
+    Amounts are cumulative as of the period end, written by the close_cost_periods job.
+    """
+    project = models.ForeignKey(
+        ProjectProfile,
+        on_delete=models.CASCADE,
+        related_name='cost_snapshots'
+    )
+    category = models.CharField(max_length=3, choices=CostCategory.choices)
+    period = models.DateField(help_text="First day of the snapshot month")
+
+    planned = models.DecimalField(max_digits=15, decimal_places=2, default=0)
+    allocated = models.DecimalField(max_digits=15, decimal_places=2, default=0)
+    spent = models.DecimalField(max_digits=15, decimal_places=2, default=0)
+    committed = models.DecimalField(
+        max_digits=15, decimal_places=2, default=0,
+        help_text="Subcontract value under contract (not cancelled)"
+    )
+    mobilization = models.DecimalField(max_digits=15, decimal_places=2, default=0)
+
+    closed_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['project', 'period', 'category']
+        unique_together = ['project', 'category', 'period']
+        indexes = [
+            models.Index(fields=['project', 'period']),
+            models.Index(fields=['period']),
+        ]
+
+    def __str__(self):
+        return f"{self.project.project_name} - {self.get_category_display()} ({self.period:%Y-%m})"
+
+
+class BOQCatalogItem(models.Model):
+    """
+    Canonical work item that differently-worded BOQ lines resolve to
+    (e.g. "CHB 4in wall" and "4\" CHB Walling"). Entries are created at BOQ ingest
+    for lines that match nothing in the catalog.
+    """
+    name = models.CharField(max_length=255, help_text="Display name (first wording seen)")
+    normalized_name = models.CharField(
+        max_length=255,
+        unique=True,
+        help_text="Sorted normalized tokens; identical token sets are the same item"
+    )
+    default_uom = models.CharField(max_length=50, blank=True)
+    section_category = models.CharField(max_length=100, default='General')
+    is_active = models.BooleanField(default=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['name']
+        indexes = [
+            models.Index(fields=['created_at']),
+        ]
+        verbose_name = 'BOQ Catalog Item'
+        verbose_name_plural = 'BOQ Catalog Items'
+
+    def __str__(self):
+        return self.name
+
+
+class BOQItem(models.Model):
+    """
+    One BOQ line of a project, normalized out of ProjectProfile.boq_items so
+    items can be aggregated across every project with SQL.
+    Rows are rewritten from the JSON whenever the project's BOQ changes; uploaded
+    revisions only touch the lines whose row_hash changed.
+    """
+    project = models.ForeignKey(
+        ProjectProfile,
+        on_delete=models.CASCADE,
+        related_name='boq_item_rows'
+    )
+    project_type = models.ForeignKey(
+        ProjectType,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='boq_item_rows',
+        help_text="Copied from the project for indexed cross-project queries"
+    )
+    catalog_item = models.ForeignKey(
+        BOQCatalogItem,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='boq_items'
+    )
+    position = models.PositiveIntegerField(help_text="Order of the line in the BOQ")
+    item_number = models.CharField(max_length=50, blank=True)
+    description = models.TextField(blank=True)
+    normalized_description = models.CharField(max_length=255, blank=True)
+    section = models.CharField(max_length=255, blank=True)
+    section_category = models.CharField(max_length=100, default='General')
+    uom = models.CharField(max_length=50, blank=True)
+
+    quantity = models.DecimalField(max_digits=15, decimal_places=4, default=0)
+    unit_cost = models.DecimalField(max_digits=15, decimal_places=2, default=0)
+    total_cost = models.DecimalField(max_digits=15, decimal_places=2, default=0)
+    material_cost = models.DecimalField(max_digits=15, decimal_places=2, default=0)
+    labor_cost = models.DecimalField(max_digits=15, decimal_places=2, default=0)
+    equipment_cost = models.DecimalField(max_digits=15, decimal_places=2, default=0)
+    subcontractor_cost = models.DecimalField(max_digits=15, decimal_places=2, default=0)
+    row_hash = models.CharField(
+        max_length=40,
+        blank=True,
+        default='',
+        help_text="Content hash used to diff BOQ revisions"
+    )
+
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['project', 'position']
+        indexes = [
+            models.Index(fields=['project', 'position']),
+            models.Index(fields=['project_type', 'section_category']),
+            models.Index(fields=['project_type', 'normalized_description', 'uom']),
+            models.Index(fields=['normalized_description']),
+            models.Index(fields=['project_type', 'catalog_item', 'uom']),
+        ]
+
+    def __str__(self):
+        return f"{self.project.project_name} #{self.item_number or self.position}: {self.description[:50]}"
+
+
+class ExtractionCacheEntry(models.Model):
+    """
+    Stored result of parsing an uploaded file, addressed by the SHA-256 of its bytes
+    and the extractor that produced it. Least recently used entries are evicted once
+    the cache exceeds its size budget.
+    """
+    content_hash = models.CharField(max_length=64)
+    extractor = models.CharField(max_length=50, help_text="Extraction routine, e.g. cost_summary")
+    extractor_version = models.CharField(max_length=20)
+    payload = models.TextField(help_text="Encoded extraction result")
+    size = models.PositiveIntegerField(help_text="Payload size in bytes")
+    hits = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_accessed_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+    class Meta:
+        ordering = ['-last_accessed_at']
+        unique_together = ['content_hash', 'extractor', 'extractor_version']
+
+    def __str__(self):
+        return f"{self.extractor} v{self.extractor_version} {self.content_hash[:12]}"
+
+
+class ExtractionJob(models.Model):
+    """
+    Uploaded file waiting to be parsed, or a simulation queued, outside the request cycle.
+    Jobs are claimed and run by the run_workers management command.
+    """
+    JOB_TYPES = [
+        ('cost_summary', 'BOQ Cost Summary'),
+        ('file_preview', 'File Preview'),
+        ('cost_risk', 'BOQ Cost Risk'),
+    ]
+
+    STATUS_CHOICES = [
+        ('QUEUED', 'Queued'),
+        ('RUNNING', 'Running'),
+        ('SUCCEEDED', 'Succeeded'),
+        ('FAILED', 'Failed'),
+    ]
+
+    job_type = models.CharField(max_length=20, choices=JOB_TYPES)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='QUEUED')
+    file = models.FileField(upload_to='extraction_jobs/', blank=True)
+    file_name = models.CharField(max_length=255)
+    params = models.JSONField(default=dict, blank=True, help_text="Job options, e.g. project_type_id or project_id")
+
+    progress = models.PositiveSmallIntegerField(default=0, help_text="Percent complete")
+    progress_message = models.CharField(max_length=255, blank=True)
+    result = models.TextField(blank=True, help_text="Encoded result payload")
+    error = models.TextField(blank=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    worker = models.CharField(max_length=100, blank=True)
+
+    created_by = models.ForeignKey(UserProfile, on_delete=models.SET_NULL, null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'created_at']),
+            models.Index(fields=['job_type', 'status']),
+        ]
+
+    def __str__(self):
+        return f"{self.get_job_type_display()} #{self.pk} ({self.status})"
+
+
+class CacheVersion(models.Model):
+    """
+    Shared version counter for data each process keeps in memory (cost configuration
+    snapshot, similarity and unit-rate indexes, catalog matcher). Bumping it makes
+    every worker rebuild its copy; see cache_versions.
+    """
+    name = models.CharField(max_length=100, unique=True)
+    version = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name} v{self.version}"
+
+
 class ProjectDocument(models.Model):
     """Enhanced document attachment system for projects"""
     DOCUMENT_TYPES = [
@@ -1116,6 +1422,7 @@ class ProjectDocument(models.Model):
             models.Index(fields=['project', 'document_type']),
             models.Index(fields=['project', 'project_stage']),
             models.Index(fields=['is_mandatory', 'is_archived']),
+            models.Index(fields=['uploaded_at', 'id']),
         ]
 
     def __str__(self):
@@ -0,0 +1,71 @@
+"""
+Monte Carlo Cost Simulation Kernel
+Pure NumPy with no Django imports; callers pass plain lists of amounts and sigmas
+"""
+
+from typing import Dict, List
+
+import numpy as np
+
+# Simulations per block; bounds peak memory at CHUNK_SIZE x items float32 values
+CHUNK_SIZE = 10_000
+
+
+def simulate_totals(
+    amounts: List[float],
+    sigmas: List[float],
+    iterations: int,
+    correlation: float = 0.3,
+    seed: int = 0,
+) -> Dict[str, object]:
+    """
+    Sample total cost as sum(amount_i * exp(sigma_i * z_i)) over (iterations x items).
+
+    Each item's unit cost is lognormal around its BOQ value (median = BOQ value).
+    z_i mixes one shared factor per simulation with item noise, so
+    corr(z_i, z_j) = correlation. This models market-wide price moves that hit every line.
+    Returns the sorted totals' quantiles plus per-item variance shares.
+    """
+    amounts_arr = np.asarray(amounts, dtype=np.float64)
+    sigmas_arr = np.asarray(sigmas, dtype=np.float32)
+    items = len(amounts_arr)
+    rng = np.random.default_rng(seed)
+
+    shared_weight = np.float32(np.sqrt(correlation))
+    item_weight = np.float32(np.sqrt(1.0 - correlation))
+    amounts32 = amounts_arr.astype(np.float32)
+
+    totals = np.empty(iterations, dtype=np.float64)
+    done = 0
+    while done < iterations:
+        rows = min(CHUNK_SIZE, iterations - done)
+        z = rng.standard_normal((rows, items), dtype=np.float32)
+        z *= item_weight
+        z += shared_weight * rng.standard_normal((rows, 1), dtype=np.float32)
+        z *= sigmas_arr
+        np.exp(z, out=z)
+        totals[done:done + rows] = z @ amounts32
+        done += rows
+
+    p50, p80, p95 = np.percentile(totals, [50, 80, 95])
+
+    # Variance of each lognormal line item, used to rank risk drivers
+    sigma64 = sigmas_arr.astype(np.float64)
+    item_variance = amounts_arr ** 2 * (np.exp(sigma64 ** 2) - 1) * np.exp(sigma64 ** 2)
+    variance_total = item_variance.sum()
+    shares = item_variance / variance_total if variance_total > 0 else np.zeros(items)
+
+    histogram, edges = np.histogram(totals, bins=40)
+
+    return {
+        'iterations': iterations,
+        'mean': float(totals.mean()),
+        'std': float(totals.std()),
+        'p50': float(p50),
+        'p80': float(p80),
+        'p95': float(p95),
+        'min': float(totals.min()),
+        'max': float(totals.max()),
+        'variance_shares': shares.tolist(),
+        'histogram': {'counts': histogram.tolist(), 'edges': edges.tolist()},
+    }
@@ -1,7 +1,16 @@
 # project_profiling/signals.py
-from django.db.models.signals import post_save, post_delete
+from django.db.models.signals import pre_save, post_save, post_delete
 from django.dispatch import receiver
-from .models import ProjectCost, ProjectProfile
+from decimal import Decimal
+from .models import ProjectCost, ProjectProfile, SubcontractorPayment, SubcontractorExpense, ProjectTypeCostHistory, ProjectType, BOQItem, BOQCatalogItem, ProjectDocument
+from .cost_configuration import SizeMultiplier, LocationMultiplier, ComplexityMultiplier, CostBreakdownTemplate
+from .cost_config_snapshot import invalidate_snapshot
+from .cost_similarity import add_to_index, invalidate_index
+from .cost_statistics import invalidate_cost_statistics
+from .boq_items import sync_boq_items
+from .boq_catalog import invalidate_matcher
+from .unit_rates import invalidate_unit_rates
+from .document_stats import invalidate_document_stats
 
 def update_project_expense(project):
     """Recalculate total expenses for a project"""
@@ -18,3 +27,182 @@ def update_expense_on_save(sender, instance, **kwargs):
 def update_expense_on_delete(sender, instance, **kwargs):
     if instance.project:
         update_project_expense(instance.project)
+
+
+@receiver(post_delete, sender=SubcontractorPayment)
+def update_amount_paid_on_payment_delete(sender, instance, **kwargs):
+    """Remove a deleted payment's contribution from its subcontractor's amount_paid"""
+    contribution = SubcontractorPayment.paid_contribution(instance.status, instance.amount)
+    SubcontractorExpense.apply_paid_delta(instance.subcontractor_expense_id, -contribution)
+
+
+# ----------------------------------------
+# Cost learning (ProjectType learned base costs)
+# ----------------------------------------
+LEARNING_FIELDS = ('project_type_id', 'is_approved', 'cost_per_sqm', 'complexity_level')
+SIMILARITY_FIELDS = LEARNING_FIELDS + ('lot_size', 'location', 'project_category')
+
+
+@receiver(pre_save, sender=ProjectTypeCostHistory)
+def remember_cost_history_learning_fields(sender, instance, **kwargs):
+    """Keep the stored learning/similarity values so post_save can tell what changed"""
+    instance._previous_learning_fields = None
+    instance._previous_similarity_fields = None
+    if instance.pk:
+        previous = ProjectTypeCostHistory.objects.filter(
+            pk=instance.pk
+        ).values(*SIMILARITY_FIELDS).first()
+        if previous:
+            instance._previous_learning_fields = {field: previous[field] for field in LEARNING_FIELDS}
+            instance._previous_similarity_fields = {field: previous[field] for field in SIMILARITY_FIELDS}
+
+
+@receiver(post_save, sender=ProjectTypeCostHistory)
+def learn_from_cost_history(sender, instance, created, **kwargs):
+    """New approved records update learning in O(1); edits that affect learning trigger a rebuild"""
+    from .cost_learning import CostLearningEngine
+
+    previous = getattr(instance, '_previous_learning_fields', None)
+    if created or previous is None:
+        if instance.is_approved:
+            CostLearningEngine.learn_from_record(instance)
+        return
+
+    current = {field: getattr(instance, field) for field in LEARNING_FIELDS}
+    if current['cost_per_sqm'] is not None:
+        current['cost_per_sqm'] = Decimal(str(current['cost_per_sqm'])).quantize(Decimal('0.01'))
+    if current == previous or not (previous['is_approved'] or instance.is_approved):
+        return
+
+    CostLearningEngine.calculate_project_type_costs(instance.project_type)
+    if previous['project_type_id'] != instance.project_type_id:
+        CostLearningEngine.calculate_project_type_costs(
+            ProjectType.objects.get(pk=previous['project_type_id'])
+        )
+
+
+@receiver(post_save, sender=ProjectTypeCostHistory)
+def update_similarity_index(sender, instance, created, **kwargs):
+    """Append new approved records to the comparable-projects index; drop it after relevant edits"""
+    previous = getattr(instance, '_previous_similarity_fields', None)
+    if created or previous is None:
+        if instance.is_approved:
+            add_to_index(instance)
+        return
+
+    current = {field: getattr(instance, field) for field in SIMILARITY_FIELDS}
+    for field in ('cost_per_sqm', 'lot_size'):
+        if current[field] is not None:
+            current[field] = Decimal(str(current[field])).quantize(Decimal('0.01'))
+    if current == previous or not (previous['is_approved'] or instance.is_approved):
+        return
+
+    invalidate_index(instance.project_type_id)
+    if previous['project_type_id'] != instance.project_type_id:
+        invalidate_index(previous['project_type_id'])
+
+
+@receiver(post_save, sender=ProjectTypeCostHistory)
+@receiver(post_delete, sender=ProjectTypeCostHistory)
+def invalidate_cost_history_statistics(sender, instance, **kwargs):
+    invalidate_cost_statistics(instance.project_type_id)
+    previous = getattr(instance, '_previous_similarity_fields', None)
+    if previous and previous['project_type_id'] != instance.project_type_id:
+        invalidate_cost_statistics(previous['project_type_id'])
+
+
+@receiver(post_delete, sender=ProjectTypeCostHistory)
+def unlearn_deleted_cost_history(sender, instance, **kwargs):
+    from .cost_learning import CostLearningEngine
+
+    # Skip when the project type itself is being deleted (cascade)
+    if isinstance(kwargs.get('origin'), ProjectType):
+        return
+
+    if instance.is_approved:
+        invalidate_index(instance.project_type_id)
+
+    if instance.is_approved and ProjectType.objects.filter(pk=instance.project_type_id).exists():
+        CostLearningEngine.calculate_project_type_costs(ProjectType(pk=instance.project_type_id))
+
+
+# ----------------------------------------
+# Cost configuration snapshot (CostEstimationEngine)
+# ----------------------------------------
+PROJECT_TYPE_SNAPSHOT_FIELDS = {
+    'name', 'is_active',
+    'base_cost_low_end', 'base_cost_mid_range', 'base_cost_high_end',
+    'materials_percentage', 'labor_percentage', 'equipment_percentage',
+    'permits_percentage', 'contingency_percentage', 'overhead_percentage',
+}
+
+
+@receiver(post_save, sender=SizeMultiplier)
+@receiver(post_delete, sender=SizeMultiplier)
+@receiver(post_save, sender=LocationMultiplier)
+@receiver(post_delete, sender=LocationMultiplier)
+@receiver(post_save, sender=ComplexityMultiplier)
+@receiver(post_delete, sender=ComplexityMultiplier)
+@receiver(post_save, sender=CostBreakdownTemplate)
+@receiver(post_delete, sender=CostBreakdownTemplate)
+@receiver(post_delete, sender=ProjectType)
+def invalidate_cost_config_snapshot(sender, **kwargs):
+    invalidate_snapshot()
+
+
+@receiver(post_save, sender=ProjectType)
+def invalidate_cost_config_snapshot_on_project_type(sender, update_fields=None, **kwargs):
+    """Skip saves that only touch fields the estimation snapshot does not read"""
+    if update_fields is not None and not PROJECT_TYPE_SNAPSHOT_FIELDS.intersection(update_fields):
+        return
+    invalidate_snapshot()
+
+
+# ----------------------------------------
+# Normalized BOQ item rows
+# ----------------------------------------
+@receiver(post_save, sender=ProjectProfile)
+def sync_boq_item_rows(sender, instance, created=False, update_fields=None, **kwargs):
+    """Rewrite BOQItem rows when boq_items changed; keep their project type in step"""
+    if update_fields is not None and not {'boq_items', 'project_type'}.intersection(update_fields):
+        return
+
+    # A no-op unless the BOQ digest differs from the synced boq_version
+    synced = (update_fields is None or 'boq_items' in update_fields) and sync_boq_items(instance)
+
+    # Instances not loaded from the database have no stored type to compare against
+    type_changed = (
+        not hasattr(instance, '_stored_project_type_id')
+        or instance._stored_project_type_id != instance.project_type_id
+    )
+    if not created and not synced and type_changed:
+        BOQItem.objects.filter(project=instance).exclude(
+            project_type_id=instance.project_type_id
+        ).update(project_type_id=instance.project_type_id)
+    instance._stored_project_type_id = instance.project_type_id
+
+
+@receiver(post_save, sender=BOQCatalogItem)
+@receiver(post_delete, sender=BOQCatalogItem)
+def invalidate_boq_catalog_matcher(sender, created=False, **kwargs):
+    # New entries are picked up by every matcher without a rebuild
+    if created:
+        return
+    invalidate_matcher()
+    # Unit rates carry catalog names and lose deleted items' rows
+    invalidate_unit_rates()
+
+
+@receiver(post_delete, sender=ProjectProfile)
+def invalidate_unit_rates_on_project_delete(sender, **kwargs):
+    """The project's BOQItem rows went with it; rebuild unit rates lazily"""
+    invalidate_unit_rates()
+
+
+# ----------------------------------------
+# Document library statistics
+# ----------------------------------------
+@receiver(post_save, sender=ProjectDocument)
+@receiver(post_delete, sender=ProjectDocument)
+def invalidate_document_library_stats(sender, **kwargs):
+    invalidate_document_stats()
@@ -0,0 +1,197 @@
+"""
+Unit Rate Index
+Unit-cost statistics per canonical BOQ item and unit of measure, learned from
+every processed BOQ and served from memory for unit-cost suggestions
+"""
+
+import logging
+import threading
+from datetime import datetime
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+from django.utils import timezone
+
+from .boq_catalog import canonical_key, resolve_descriptions, tokenize
+from .cache_versions import bump_version, get_version
+from .models import BOQItem
+
+logger = logging.getLogger(__name__)
+
+VERSION_NAME = 'unit_rates'
+
+# An observation's weight halves every HALF_LIFE_DAYS of project age
+HALF_LIFE_DAYS = 365
+MAX_SUGGESTIONS = 2000
+
+
+class UnitRate(NamedTuple):
+    catalog_item_id: int
+    name: str
+    uom: str
+    samples: int
+    project_count: int
+    median: float
+    p25: float
+    p75: float
+    recency_weighted: float
+    latest: Optional[datetime]
+
+
+def normalize_uom(uom) -> str:
+    """Fold unit spellings (sq.m./m2/sqm, pcs/pc, ...) onto one key"""
+    return canonical_key(tokenize(uom))
+
+
+def _rate(catalog_item_id: int, name: str, uom: str, observations: List[Tuple], now: datetime) -> UnitRate:
+    values = np.array([float(unit_cost) for unit_cost, _, _ in observations], dtype=np.float64)
+    ages = np.array([
+        (now - created_at).total_seconds() / 86400 if created_at else 0.0
+        for _, _, created_at in observations
+    ], dtype=np.float64)
+    weights = 0.5 ** (np.maximum(ages, 0) / HALF_LIFE_DAYS)
+    p25, median, p75 = np.percentile(values, [25, 50, 75])
+    dates = [created_at for _, _, created_at in observations if created_at]
+    return UnitRate(
+        catalog_item_id=catalog_item_id,
+        name=name,
+        uom=uom,
+        samples=len(values),
+        project_count=len({project_id for _, project_id, _ in observations}),
+        median=round(float(median), 2),
+        p25=round(float(p25), 2),
+        p75=round(float(p75), 2),
+        recency_weighted=round(float(np.average(values, weights=weights)), 2),
+        latest=max(dates) if dates else None,
+    )
+
+
+class UnitRateIndex:
+    """(catalog item id, normalized uom) -> UnitRate, plus each item's most sampled unit"""
+
+    def __init__(self, version: int = 0):
+        self.version = version
+        self.rates: Dict[Tuple[int, str], UnitRate] = {}
+        self.primary_uom: Dict[int, str] = {}
+
+    @classmethod
+    def build(cls, version: int) -> 'UnitRateIndex':
+        index = cls(version)
+        index.refresh(None)
+        return index
+
+    def refresh(self, catalog_item_ids: Optional[Iterable[int]]):
+        """Recompute the rates of the given catalog items (all items when None) in one query"""
+        rows = BOQItem.objects.filter(catalog_item__isnull=False, unit_cost__gt=0)
+        if catalog_item_ids is not None:
+            catalog_item_ids = set(catalog_item_ids)
+            if not catalog_item_ids:
+                return
+            rows = rows.filter(catalog_item_id__in=catalog_item_ids)
+            self.rates = {key: rate for key, rate in self.rates.items() if key[0] not in catalog_item_ids}
+            for catalog_item_id in catalog_item_ids:
+                self.primary_uom.pop(catalog_item_id, None)
+
+        groups: Dict[Tuple[int, str], List[Tuple]] = {}
+        names: Dict[int, str] = {}
+        labels: Dict[Tuple[int, str], str] = {}
+        for catalog_item_id, name, uom, unit_cost, project_id, created_at in rows.values_list(
+            'catalog_item_id', 'catalog_item__name', 'uom', 'unit_cost', 'project_id', 'project__created_at'
+        ).iterator(chunk_size=5000):
+            key = (catalog_item_id, normalize_uom(uom))
+            groups.setdefault(key, []).append((unit_cost, project_id, created_at))
+            names[catalog_item_id] = name
+            labels.setdefault(key, uom)
+
+        now = timezone.now()
+        for key, observations in groups.items():
+            rate = _rate(key[0], names[key[0]], labels[key], observations, now)
+            self.rates[key] = rate
+            primary = self.rates.get((key[0], self.primary_uom.get(key[0])))
+            if primary is None or rate.samples > primary.samples:
+                self.primary_uom[key[0]] = key[1]
+
+    def lookup(self, catalog_item_id: int, uom) -> Tuple[Optional[UnitRate], bool]:
+        """Rate for the item in the requested unit, else in its most sampled unit; second value is the unit match"""
+        rate = self.rates.get((catalog_item_id, normalize_uom(uom)))
+        if rate is not None:
+            return rate, True
+        primary = self.primary_uom.get(catalog_item_id)
+        if primary is None:
+            return None, False
+        return self.rates[(catalog_item_id, primary)], False
+
+
+_index: Optional[UnitRateIndex] = None
+_lock = threading.Lock()
+
+
+def get_index() -> UnitRateIndex:
+    """Return the in-memory index, rebuilding it when the shared version moved"""
+    global _index
+    version = get_version(VERSION_NAME)
+    index = _index
+    if index is not None and index.version == version:
+        return index
+    with _lock:
+        if _index is None or _index.version != version:
+            _index = UnitRateIndex.build(version)
+            logger.debug("Built unit rate index (%s rates)", len(_index.rates))
+        return _index
+
+
+def refresh_unit_rates(catalog_item_ids: Iterable[int]):
+    """
+    Recompute the rates of catalog items whose BOQ lines changed. This process updates
+    its index in place; other processes see the version bump and rebuild on their next query.
+    """
+    global _index
+    with _lock:
+        version = bump_version(VERSION_NAME)
+        # Only an index that saw every earlier bump can be patched in place
+        if _index is None or _index.version != version - 1:
+            _index = None
+            return
+        _index.refresh(catalog_item_ids)
+        _index.version = version
+
+
+def invalidate_unit_rates():
+    """Drop the index after bulk changes such as project deletes; it is rebuilt lazily"""
+    global _index
+    with _lock:
+        bump_version(VERSION_NAME)
+        _index = None
+
+
+def suggest_unit_costs(lines: List[Tuple[str, str]]) -> List[Optional[Dict]]:
+    """
+    Suggested unit cost for each (description, uom) line, or None when the description
+    matches no catalog item with priced history. All lines are resolved in one catalog pass.
+    """
+    catalog_ids = resolve_descriptions(
+        ((description, uom, '') for description, uom in lines), create_missing=False
+    )
+    index = get_index()
+
+    suggestions: List[Optional[Dict]] = []
+    for (_, uom), catalog_item_id in zip(lines, catalog_ids):
+        rate, uom_matched = index.lookup(catalog_item_id, uom) if catalog_item_id else (None, False)
+        if rate is None:
+            suggestions.append(None)
+            continue
+        suggestions.append({
+            'catalog_item_id': rate.catalog_item_id,
+            'catalog_name': rate.name,
+            'uom': rate.uom,
+            'uom_matched': uom_matched,
+            'suggested_unit_cost': rate.recency_weighted,
+            'median': rate.median,
+            'p25': rate.p25,
+            'p75': rate.p75,
+            'recency_weighted': rate.recency_weighted,
+            'samples': rate.samples,
+            'project_count': rate.project_count,
+            'latest': rate.latest.isoformat() if rate.latest else None,
+        })
+    return suggestions
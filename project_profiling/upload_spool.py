@@ -0,0 +1,122 @@
+"""
+Upload Spooling
+Puts an uploaded file on disk once and memory-maps it, so every extractor reads
+the same pages through cheap seekable handles instead of private bytes copies
+"""
+
+import io
+import mmap
+import os
+import tempfile
+from typing import Optional
+
+
+class MappedFile(io.RawIOBase):
+    """Read-only seekable file object over a shared memory map; reads copy only the requested range"""
+
+    def __init__(self, mapped, name: str = ''):
+        super().__init__()
+        self._map = mapped
+        self._position = 0
+        self.name = name
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._position
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_CUR:
+            offset += self._position
+        elif whence == io.SEEK_END:
+            offset += len(self._map)
+        self._position = max(offset, 0)
+        return self._position
+
+    def read(self, size: int = -1) -> bytes:
+        end = len(self._map) if size is None or size < 0 else min(self._position + size, len(self._map))
+        data = self._map[self._position:end]
+        self._position = max(end, self._position)
+        return data
+
+    def readinto(self, buffer) -> int:
+        data = self.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+
+class SpooledUpload:
+    """
+    Context manager giving one on-disk, memory-mapped copy of an upload.
+
+    Accepts an UploadedFile (Django's temporary upload file is reused when there is one),
+    a stored FieldFile, a filesystem path or raw bytes. open() returns independent
+    handles over the same mapping; the spool file is removed on exit if it was created here.
+    """
+
+    def __init__(self, upload, name: Optional[str] = None):
+        self.upload = upload
+        self.name = name or getattr(upload, 'name', None) or (upload if isinstance(upload, str) else 'upload')
+        self.path = None
+        self.size = 0
+        self._created = False
+        self._file = None
+        self.mapped = None
+
+    def __enter__(self) -> 'SpooledUpload':
+        self.path = self._existing_path()
+        if self.path is None:
+            self._spool()
+
+        self._file = open(self.path, 'rb')
+        self.size = os.fstat(self._file.fileno()).st_size
+        # Zero-length files cannot be mapped
+        self.mapped = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if self.size else b''
+        return self
+
+    def __exit__(self, *exc_info):
+        if isinstance(self.mapped, mmap.mmap):
+            self.mapped.close()
+        if self._file is not None:
+            self._file.close()
+        if self._created and self.path:
+            try:
+                os.unlink(self.path)
+            except OSError:
+                pass
+        return False
+
+    def _existing_path(self) -> Optional[str]:
+        if isinstance(self.upload, (str, os.PathLike)):
+            return os.fspath(self.upload)
+        if hasattr(self.upload, 'temporary_file_path'):
+            return self.upload.temporary_file_path()
+        try:
+            # FieldFile on local storage
+            return self.upload.path
+        except (AttributeError, NotImplementedError, ValueError):
+            return None
+
+    def _spool(self):
+        suffix = os.path.splitext(str(self.name))[1]
+        with tempfile.NamedTemporaryFile(suffix=suffix, delete=False) as spool:
+            self.path = spool.name
+            self._created = True
+            if isinstance(self.upload, (bytes, bytearray, memoryview)):
+                spool.write(self.upload)
+            else:
+                if hasattr(self.upload, 'seek'):
+                    self.upload.seek(0)
+                chunks = self.upload.chunks() if hasattr(self.upload, 'chunks') else iter(
+                    lambda: self.upload.read(1024 * 1024), b''
+                )
+                for chunk in chunks:
+                    spool.write(chunk)
+
+    def open(self) -> MappedFile:
+        """A new handle positioned at the start of the file"""
+        return MappedFile(self.mapped, name=str(self.name))
@@ -5,7 +5,13 @@ from . import file_preview_views
 from .cost_dashboard_views import (
     project_detail_cost_dashboard,
     api_project_cost_summary,
-    api_add_quick_expense
+    api_add_quick_expense,
+    api_import_expenses,
+    api_export_cost_summary,
+    api_export_expenses,
+    api_export_tasks,
+    api_project_cost_history,
+    api_project_cost_risk
 )
 
 urlpatterns = [
@@ -108,6 +114,12 @@ path('<int:project_id>/categories/<int:category_id>/allocation/', views.get_cate
     # Cost tracking API endpoints
     path('api/projects/<int:project_id>/cost-summary/', api_project_cost_summary, name='api_project_cost_summary'),
     path('api/projects/<int:project_id>/add-expense/', api_add_quick_expense, name='api_add_quick_expense'),
+    path('api/projects/<int:project_id>/import-expenses/', api_import_expenses, name='api_import_expenses'),
+    path('api/projects/<int:project_id>/export/cost-summary/', api_export_cost_summary, name='api_export_cost_summary'),
+    path('api/projects/<int:project_id>/export/expenses/', api_export_expenses, name='api_export_expenses'),
+    path('api/projects/<int:project_id>/export/tasks/', api_export_tasks, name='api_export_tasks'),
+    path('api/projects/<int:project_id>/cost-history/', api_project_cost_history, name='api_project_cost_history'),
+    path('api/projects/<int:project_id>/cost-risk/', api_project_cost_risk, name='api_project_cost_risk'),
 
     # ==============================================
     # DRAFT PROJECTS
@@ -161,6 +173,7 @@ path('pending/<str:token>/<int:project_id>/<str:role>/review/', views.review_pen
     path('api/subcontractors/<int:subcon_id>/', views.api_subcontractor_detail, name='api_subcontractor_detail'),
     path('api/subcontractors/<int:subcon_id>/payments/', views.api_subcontractor_payments, name='api_subcontractor_payments'),
     path('api/subcontractors/<int:subcon_id>/payments/create/', views.api_create_payment, name='api_create_payment'),
+    path('api/subcontractors/<int:subcon_id>/payments/import/', views.api_import_payment_schedule, name='api_import_payment_schedule'),
 
     # Mobilization Costs - Session-based (primary) and Token-based (legacy)
     path('mobilization/', views.mobilization_costs, name='mobilization_costs_session'),
@@ -171,6 +184,9 @@ path('pending/<str:token>/<int:project_id>/<str:role>/review/', views.review_pen
     
     # Cost Estimation API
     path('api/cost-estimation/', cost_estimation_views.CostEstimationAPIView.as_view(), name='api_cost_estimation'),
+    path('api/cost-estimation/batch/', cost_estimation_views.batch_estimate_api, name='api_cost_estimation_batch'),
+    path('api/cost-estimation/comparables/<int:project_type_id>/', cost_estimation_views.comparable_projects_api, name='api_comparable_projects'),
+    path('api/cost-estimation/unit-rates/suggest/', cost_estimation_views.suggest_unit_cost_api, name='api_suggest_unit_cost'),
     path('api/cost-estimation/options/', cost_estimation_views.get_estimation_options_api, name='api_estimation_options'),
     path('<str:token>/<str:role>/api/cost-estimation/', cost_estimation_views.estimate_project_cost_api, name='api_cost_estimation_legacy'),
     
@@ -181,8 +197,10 @@ path('pending/<str:token>/<int:project_id>/<str:role>/review/', views.review_pen
     
     # BOQ Upload API
     path('api/boq-upload/', file_preview_views.BOQUploadAPIView.as_view(), name='api_boq_upload'),
+    path('api/extraction-jobs/<int:job_id>/', file_preview_views.extraction_job_status_api, name='api_extraction_job_status'),
         path('api/project-type-cost-data/<int:project_type_id>/', file_preview_views.check_project_type_cost_data, name='check_project_type_cost_data'),
         path('api/project-type-boq-breakdown/<int:project_type_id>/', file_preview_views.get_project_type_boq_breakdown, name='get_project_type_boq_breakdown'),
         path('api/project-type-auto-configure/<int:project_type_id>/', file_preview_views.auto_configure_project_type_costs, name='auto_configure_project_type_costs'),
         path('api/boq-export/<int:project_id>/', file_preview_views.export_boq_to_excel, name='export_boq_to_excel'),
+        path('api/boq-revision/<int:project_id>/', file_preview_views.boq_revision_api, name='api_boq_revision'),
 ]
\ No newline at end of file
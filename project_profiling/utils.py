@@ -1,4 +1,9 @@
-from django.db.models import Sum, F
+import base64
+import json
+from datetime import date, datetime
+from decimal import Decimal
+
+from django.db.models import Sum, F, Q
 
 def recalc_project_progress(project):
     tasks = project.tasks.all()
@@ -34,3 +39,64 @@ def recalc_project_progress(project):
         project.is_completed = False
 
     project.save(update_fields=["progress", "status", "is_completed"])
+
+
+# ----------------------------------------
+# Keyset (cursor) pagination for JSON list APIs
+# ----------------------------------------
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+def encode_cursor(value, pk):
+    """Encode the (sort value, id) of the last row into an opaque cursor string"""
+    if isinstance(value, (date, datetime)):
+        value = value.isoformat()
+    elif isinstance(value, Decimal):
+        value = str(value)
+    raw = json.dumps([value, pk]).encode()
+    return base64.urlsafe_b64encode(raw).decode()
+
+
+def decode_cursor(cursor):
+    """Decode a cursor produced by encode_cursor; raises ValueError if malformed"""
+    try:
+        value, pk = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except Exception:
+        raise ValueError("Invalid cursor")
+    return value, pk
+
+
+def get_page_size(request, default=DEFAULT_PAGE_SIZE, maximum=MAX_PAGE_SIZE):
+    """Read ?limit= from the request, clamped to [1, maximum]"""
+    try:
+        limit = int(request.GET.get('limit', default))
+    except (TypeError, ValueError):
+        limit = default
+    return max(1, min(limit, maximum))
+
+
+def keyset_paginate(queryset, sort_field, descending=True, cursor=None, limit=DEFAULT_PAGE_SIZE):
+    """
+    Return (rows, next_cursor) for one page ordered by (sort_field, id).
+    Seeks past the cursor with a WHERE clause instead of OFFSET, so every page
+    costs the same regardless of how deep into the list it is.
+    """
+    direction = '-' if descending else ''
+    queryset = queryset.order_by(f'{direction}{sort_field}', f'{direction}id')
+
+    if cursor:
+        value, pk = decode_cursor(cursor)
+        op = 'lt' if descending else 'gt'
+        queryset = queryset.filter(
+            Q(**{f'{sort_field}__{op}': value}) |
+            Q(**{sort_field: value, f'id__{op}': pk})
+        )
+
+    rows = list(queryset[:limit + 1])
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(getattr(last, sort_field), last.id)
+    return rows, next_cursor
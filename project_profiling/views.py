@@ -11,12 +11,14 @@ from django.db.models import Q
 from django.http import HttpResponseRedirect
 from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
 from decimal import Decimal, InvalidOperation
-from django.db import models
+from django.db import models, transaction
 from django.db.models import Sum, Max
 from datetime import date, datetime
 from django.urls import reverse
 from django.utils.timezone import localtime
 import json
+import logging
+from collections import Counter, defaultdict
 from django.conf import settings
 from django.core.files import File
 import os
@@ -39,10 +41,13 @@ from powermason_capstone.utils.calculate_progress import calculate_progress
 # Import cost tracking views
 from .cost_tracking_views import (
     subcontractor_list, api_subcontractor_list, api_subcontractor_detail,
-    api_subcontractor_payments, api_create_payment,
+    api_subcontractor_payments, api_create_payment, api_import_payment_schedule,
     mobilization_costs, api_mobilization_costs_list,
     api_create_mobilization_cost, api_mobilization_cost_detail
 )
+
+logger = logging.getLogger(__name__)
+
 # ----------------------------------------
 # FUNCTION
 # ----------------------------------------
@@ -900,10 +905,9 @@ def review_pending_project(request, token, project_id, role):
                         # Create project scopes and budget entries from BOQ data
                         create_project_scopes_and_budgets_from_boq(new_profile, boq_items)
                         boq_items_processed = True
-                        print(f"DEBUG: Created scopes and budget entries from BOQ data for approved project")
                         
                     except Exception as e:
-                        print(f"DEBUG: Error handling BOQ data for approved project: {e}")
+                        logger.exception("Error handling BOQ data for approved project %s", new_profile.id)
                         messages.warning(request, f"⚠️ Project approved successfully, but there was an issue processing BOQ data: {str(e)}")
 
                 # --- Handle contract file ---
@@ -1069,162 +1073,81 @@ def create_project_scopes_and_budgets_from_boq(project_profile, boq_items):
     Create actual ProjectScope and ProjectBudget entries from BOQ items for approved projects.
     This function automatically scans all BOQ items, counts duplicates by section, 
     and distributes percentages to make 100%.
+    
+    Items are grouped in a single pass; scopes and budgets are then written with a
+    handful of bulk queries in one transaction, so the cost grows with sections, not items.
     """
     from scheduling.models import ProjectScope
+    from .boq_items import budget_category, scope_name, section_weights as boq_section_weights
     from .models import ProjectBudget
     
-    print(f"DEBUG: Processing {len(boq_items)} BOQ items for project {project_profile.id}")
-    
-    # Step 1: Scan all BOQ items and group by section
-    section_analysis = {}
-    total_project_cost = 0
+    # Step 1: Scan all BOQ items, grouping cost by section and by (section, category)
+    section_costs = defaultdict(float)
+    section_counts = Counter()
+    category_totals = defaultdict(float)
+    skipped_items = 0
     
     for item in boq_items:
-        section_name = item.get('section', 'General Items').strip()
-        item_cost = float(item.get('total_cost', 0))
-        total_project_cost += item_cost
-        
-        print(f"DEBUG: Item '{item.get('description', '')}' -> Section: '{section_name}', Cost: {item_cost}")
-        
-        if section_name not in section_analysis:
-            section_analysis[section_name] = {
-                'items': [],
-                'total_cost': 0,
-                'item_count': 0
-            }
-        
-        section_analysis[section_name]['items'].append(item)
-        section_analysis[section_name]['total_cost'] += item_cost
-        section_analysis[section_name]['item_count'] += 1
-    
-    print(f"DEBUG: Section Analysis Complete:")
-    print(f"DEBUG: Total Project Cost: {total_project_cost}")
-    print(f"DEBUG: Found {len(section_analysis)} distinct sections:")
+        try:
+            section_name = scope_name(item.get('section'))
+            item_cost = float(item.get('total_cost', 0))
+            section_costs[section_name] += item_cost
+            section_counts[section_name] += 1
+            
+            if item_cost > 0:
+                category_totals[(section_name, budget_category(item))] += item_cost
+        except (TypeError, ValueError, AttributeError):
+            skipped_items += 1
     
-    # Step 2: Calculate weights and ensure they sum to 100%
-    section_weights = {}
-    weight_sum = 0
+    # Steps 2-3: Weights from each section's share of the cost, normalized to exactly 100%
+    section_weights = boq_section_weights(section_costs)
     
-    for section_name, data in section_analysis.items():
-        # Calculate percentage based on cost
-        raw_weight = (data['total_cost'] / total_project_cost) * 100 if total_project_cost > 0 else 0
-        section_weights[section_name] = raw_weight
-        weight_sum += raw_weight
-        
-        print(f"DEBUG: '{section_name}': {data['item_count']} items, ₱{data['total_cost']:,.2f} ({raw_weight:.2f}%)")
+    if logger.isEnabledFor(logging.DEBUG):
+        for section_name, cost in section_costs.items():
+            logger.debug(
+                "BOQ section %r for project %s: %s items, cost %.2f, weight %.2f%%",
+                section_name, project_profile.id, section_counts[section_name], cost, section_weights[section_name]
+            )
     
-    # Step 3: Normalize weights to ensure they sum to exactly 100%
-    if weight_sum > 0:
-        normalization_factor = 100 / weight_sum
-        section_names = list(section_weights.keys())
+    # Step 4: Create scopes and budget entries
+    with transaction.atomic():
+        # ProjectScope has no unique (project, name) constraint, so existing scopes are
+        # matched in one lookup and the rest inserted, instead of an ON CONFLICT upsert
+        existing_scopes = {}
+        for scope in ProjectScope.objects.filter(project=project_profile, name__in=section_weights).order_by('id'):
+            existing_scopes.setdefault(scope.name, scope)
         
-        # First pass: normalize and round to 2 decimal places
-        for section_name in section_names:
-            section_weights[section_name] = round(section_weights[section_name] * normalization_factor, 2)
+        for section_name, scope in existing_scopes.items():
+            scope.weight = section_weights[section_name]
+        ProjectScope.objects.bulk_update(existing_scopes.values(), ['weight'])
         
-        # Second pass: adjust for rounding errors to ensure exact 100% sum
-        current_sum = sum(section_weights.values())
-        difference = 100.0 - current_sum
+        new_scopes = ProjectScope.objects.bulk_create([
+            ProjectScope(project=project_profile, name=section_name, weight=weight)
+            for section_name, weight in section_weights.items()
+            if section_name not in existing_scopes
+        ])
+        scopes = {**existing_scopes, **{scope.name: scope for scope in new_scopes}}
         
-        if abs(difference) > 0.01:  # Only adjust if difference is significant
-            # Add the difference to the largest weight to maintain exact 100%
-            largest_section = max(section_weights.keys(), key=lambda k: section_weights[k])
-            section_weights[largest_section] = round(section_weights[largest_section] + difference, 2)
-    
-    print(f"DEBUG: Normalized weights (should sum to 100%): {sum(section_weights.values()):.2f}%")
-    
-    # Step 4: Create scopes and budget entries
-    created_scopes = []
-    
-    for section_name, data in section_analysis.items():
-        try:
-            final_weight = section_weights.get(section_name, 0)
-            
-            print(f"DEBUG: Creating scope '{section_name}' with weight {final_weight}%")
-            
-            # Create ProjectScope
-            scope, created = ProjectScope.objects.get_or_create(
-                project=project_profile,
-                name=section_name,
-                defaults={
-                    'weight': final_weight
-                }
-            )
-            
-            if created:
-                created_scopes.append(section_name)
-                print(f"DEBUG: ✓ Created new scope '{section_name}' with ID {scope.id}")
-            else:
-                print(f"DEBUG: ⚠ Scope '{section_name}' already exists, updating weight to {final_weight}%")
-                scope.weight = final_weight
-                scope.save()
-            
-            # Create budget entries for each item in this section
-            # Group items by category to avoid duplicate scope-category combinations
-            category_totals = {}
-            
-            for item in data['items']:
-                try:
-                    item_cost = float(item.get('total_cost', 0))
-                    if item_cost > 0:
-                        # Determine category based on item data - fix string/int comparison
-                        category = 'MAT'  # Default to Materials
-                        material_cost = float(item.get('material_cost', 0))
-                        labor_cost = float(item.get('labor_cost', 0))
-                        equipment_cost = float(item.get('equipment_cost', 0))
-                        subcontractor_cost = float(item.get('subcontractor_cost', 0))
-                        
-                        if material_cost > 0:
-                            category = 'MAT'
-                        elif labor_cost > 0:
-                            category = 'LAB'
-                        elif equipment_cost > 0:
-                            category = 'EQU'
-                        elif subcontractor_cost > 0:
-                            category = 'SUB'
-                        
-                        # Accumulate costs by category for this scope
-                        if category not in category_totals:
-                            category_totals[category] = 0
-                        category_totals[category] += item_cost
-                        
-                        print(f"DEBUG: ✓ Processed BOQ item '{item.get('description', '')}' (₱{item_cost:,.2f}) -> Category: {category}")
-                        
-                except Exception as item_error:
-                    print(f"DEBUG: Error processing BOQ item '{item.get('description', '')}': {item_error}")
-                    continue
-            
-            # Create one budget entry per category per scope
-            for category, total_amount in category_totals.items():
-                try:
-                    budget_entry, created = ProjectBudget.objects.get_or_create(
-                        project=project_profile,
-                        scope=scope,
-                        category=category,
-                        defaults={
-                            'planned_amount': total_amount
-                        }
-                    )
-                    
-                    if created:
-                        print(f"DEBUG: ✓ Created budget entry for scope '{scope.name}' - {category}: ₱{total_amount:,.2f}")
-                    else:
-                        # Update existing entry
-                        budget_entry.planned_amount = total_amount
-                        budget_entry.save()
-                        print(f"DEBUG: ✓ Updated budget entry for scope '{scope.name}' - {category}: ₱{total_amount:,.2f}")
-                        
-                except Exception as budget_error:
-                    print(f"DEBUG: Error creating budget entry for scope '{scope.name}' - {category}: {budget_error}")
-                    continue
-            
-        except Exception as scope_error:
-            print(f"DEBUG: Error creating scope '{section_name}': {scope_error}")
-            continue
+        # One budget entry per category per scope, upserted on the (scope, category) unique key
+        ProjectBudget.objects.bulk_create(
+            [
+                ProjectBudget(
+                    project=project_profile,
+                    scope=scopes[section_name],
+                    category=category,
+                    planned_amount=round(total_amount, 2),
+                )
+                for (section_name, category), total_amount in category_totals.items()
+            ],
+            update_conflicts=True,
+            unique_fields=['scope', 'category'],
+            update_fields=['planned_amount', 'updated_at'],
+        )
     
-    print(f"DEBUG: SUCCESS! Created {len(created_scopes)} new scopes: {created_scopes}")
-    print(f"DEBUG: Total scopes in project: {ProjectScope.objects.filter(project=project_profile).count()}")
-    print(f"DEBUG: Total budget entries created: {ProjectBudget.objects.filter(project=project_profile).count()}")
+    logger.info(
+        "Created scopes and budgets from BOQ for project %s: %s items, %s sections (%s new), %s budget entries, %s items skipped",
+        project_profile.id, len(boq_items), len(section_weights), len(new_scopes), len(category_totals), skipped_items
+    )
 
 
 @login_required
@@ -2337,43 +2260,47 @@ def document_library(request):
 @login_required
 @require_http_methods(["GET"])
 def api_document_stats(request):
-    """Get document statistics"""
+    """Get document statistics (one aggregate query, cached per user scope)"""
+    from .document_stats import get_document_stats
+
     try:
         user_profile = request.user.userprofile
 
         # Filter documents based on user role
         if user_profile.role in ['EG', 'OM']:
             documents = ProjectDocument.objects.all()
+            scope = 'all'
         elif user_profile.role == 'PM':
             documents = ProjectDocument.objects.filter(
                 Q(project__project_manager=user_profile) |
                 Q(project_staging__created_by=user_profile)
             )
+            scope = f'pm:{user_profile.id}'
         else:
             documents = ProjectDocument.objects.none()
+            scope = None
 
-        # Calculate stats
-        total_documents = documents.count()
-        contracts = documents.filter(document_type='CONTRACT').count()
-        reports = documents.filter(document_type='REPORT').count()
-
-        # Calculate total size
-        total_size_bytes = documents.aggregate(
-            total=Sum('file_size')
-        )['total'] or 0
+        if scope:
+            stats = get_document_stats(documents, scope)
+        else:
+            stats = {'total': 0, 'archived': 0, 'active': 0, 'total_size_bytes': 0, 'by_type': {}, 'by_stage': {}}
 
         # Convert to MB
-        total_size_mb = total_size_bytes / (1024 * 1024)
+        total_size_mb = stats['total_size_bytes'] / (1024 * 1024)
         if total_size_mb >= 1000:
             total_size = f"{total_size_mb / 1024:.1f} GB"
         else:
             total_size = f"{total_size_mb:.1f} MB"
 
         return JsonResponse({
-            'total_documents': total_documents,
-            'contracts': contracts,
-            'reports': reports,
-            'total_size': total_size
+            'total_documents': stats['total'],
+            'contracts': stats['by_type'].get('CONTRACT', 0),
+            'reports': stats['by_type'].get('PROGRESS', 0),
+            'total_size': total_size,
+            'active': stats['active'],
+            'archived': stats['archived'],
+            'by_type': stats['by_type'],
+            'by_stage': stats['by_stage'],
         })
 
     except Exception as e:
@@ -2382,25 +2309,37 @@ def api_document_stats(request):
 @login_required
 @require_http_methods(["GET"])
 def api_documents_list(request):
-    """Get filtered list of documents"""
+    """
+    Get filtered list of documents, newest first, one page at a time.
+    Pass the returned next_cursor as ?cursor= for the next page; ?limit= sets the page size.
+    """
+    from django.db.models.fields.json import KeyTextTransform
+    from .utils import keyset_paginate, get_page_size
+
     try:
         user_profile = request.user.userprofile
 
-        # Base queryset based on user role
-        if user_profile.role in ['EG', 'OM']:
-            documents = ProjectDocument.objects.select_related(
-                'project', 'project_staging', 'uploaded_by', 'uploaded_by__user'
-            ).all()
-        elif user_profile.role == 'PM':
+        # Only the columns the list shows; ProjectProfile and staging rows carry large JSON fields
+        documents = ProjectDocument.objects.select_related(
+            'project', 'uploaded_by__user'
+        ).only(
+            'id', 'title', 'description', 'document_type', 'project_stage', 'version', 'file',
+            'file_size', 'uploaded_at', 'tags', 'is_archived', 'project_staging_id',
+            'project__project_name', 'uploaded_by__user__first_name', 'uploaded_by__user__last_name',
+            'uploaded_by__user__email',
+        ).annotate(
+            staging_project_name=KeyTextTransform('project_name', 'project_staging__project_data')
+        )
+
+        # Restrict to the documents the user's role can see
+        if user_profile.role == 'PM':
             # Include both approved projects and pending projects created by the PM
-            documents = ProjectDocument.objects.select_related(
-                'project', 'project_staging', 'uploaded_by', 'uploaded_by__user'
-            ).filter(
+            documents = documents.filter(
                 Q(project__project_manager=user_profile) |
                 Q(project_staging__created_by=user_profile)
             )
-        else:
-            documents = ProjectDocument.objects.none()
+        elif user_profile.role not in ['EG', 'OM']:
+            documents = documents.none()
 
         # Apply filters
         search = request.GET.get('search', '').strip()
@@ -2434,16 +2373,27 @@ def api_documents_list(request):
         if not show_archived:
             documents = documents.filter(is_archived=False)
 
-        # Order by most recent
-        documents = documents.order_by('-uploaded_at')
+        # Most recent first, seeking past the cursor on (uploaded_at, id)
+        try:
+            page, next_cursor = keyset_paginate(
+                documents,
+                'uploaded_at',
+                descending=True,
+                cursor=request.GET.get('cursor'),
+                limit=get_page_size(request),
+            )
+        except ValueError as e:
+            return JsonResponse({'error': str(e)}, status=400)
+
+        type_labels = dict(ProjectDocument.DOCUMENT_TYPES)
+        stage_labels = dict(ProjectDocument.PROJECT_STAGES)
 
         # Format response
         data = []
-        for doc in documents:
+        for doc in page:
             # Get file extension
-            file_extension = ''
-            if doc.file:
-                file_extension = doc.file.name.split('.')[-1] if '.' in doc.file.name else ''
+            file_name = doc.file.name or ''
+            file_extension = file_name.rsplit('.', 1)[-1] if '.' in file_name else ''
 
             # Format file size
             file_size = doc.file_size or 0
@@ -2455,10 +2405,10 @@ def api_documents_list(request):
                 file_size_str = f"{file_size} Bytes"
 
             # Get project name from either project or project_staging
-            if doc.project:
+            if doc.project_id:
                 project_name = doc.project.project_name
-            elif doc.project_staging:
-                project_name = f"{doc.project_staging.project_data.get('project_name', 'Unnamed')} (Pending)"
+            elif doc.project_staging_id:
+                project_name = f"{doc.staging_project_name or 'Unnamed'} (Pending)"
             else:
                 project_name = 'N/A'
 
@@ -2467,9 +2417,9 @@ def api_documents_list(request):
                 'title': doc.title,
                 'description': doc.description,
                 'document_type': doc.document_type,
-                'document_type_display': doc.get_document_type_display(),
+                'document_type_display': type_labels.get(doc.document_type, doc.document_type),
                 'project_stage': doc.project_stage,
-                'project_stage_display': doc.get_project_stage_display(),
+                'project_stage_display': stage_labels.get(doc.project_stage, doc.project_stage),
                 'project_name': project_name,
                 'version': doc.version,
                 'file_size': file_size_str,
@@ -2482,7 +2432,9 @@ def api_documents_list(request):
 
         return JsonResponse({
             'documents': data,
-            'count': len(data)
+            'count': len(data),
+            'next_cursor': next_cursor,
+            'has_more': next_cursor is not None,
         })
 
     except Exception as e:
@@ -2683,9 +2635,11 @@ def api_document_upload(request):
         return JsonResponse({'error': str(e)}, status=500)
 
 @login_required
-@require_http_methods(["GET"])
+@require_http_methods(["GET", "HEAD"])
 def api_document_download(request, doc_id):
-    """Download a document"""
+    """Download a document; streamed in chunks with Range/ETag support (see file_download)"""
+    from .file_download import serve_file
+
     try:
         user_profile = request.user.userprofile
 
@@ -2707,10 +2661,8 @@ def api_document_download(request, doc_id):
             return HttpResponse('Unauthorized', status=403)
 
         # Serve the file
-        if document.file:
-            response = HttpResponse(document.file.read(), content_type='application/octet-stream')
-            response['Content-Disposition'] = f'attachment; filename="{os.path.basename(document.file.name)}"'
-            return response
+        if document.file and document.file.storage.exists(document.file.name):
+            return serve_file(request, document.file, content_type='application/octet-stream')
         else:
             return HttpResponse('File not found', status=404)
 
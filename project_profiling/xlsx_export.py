@@ -0,0 +1,96 @@
+"""
+Streaming XLSX Export
+Writes report rows from iterators (querysets, BOQ item generators) into an openpyxl
+write-only workbook spooled to a temp file, and serves it with FileResponse.
+Rows are never collected, so memory stays flat however many there are.
+"""
+
+import logging
+import re
+import tempfile
+from datetime import datetime
+from typing import Iterable, NamedTuple, Optional, Sequence
+
+from django.http import FileResponse
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+try:
+    from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.cell.cell import ILLEGAL_CHARACTERS_RE
+    from openpyxl.styles import Font
+    from openpyxl.utils import get_column_letter
+    EXCEL_AVAILABLE = True
+except ImportError:
+    EXCEL_AVAILABLE = False
+    ILLEGAL_CHARACTERS_RE = re.compile(r'[\000-\010]|[\013-\014]|[\016-\037]')
+    logger.warning("Excel processing library not available. Install openpyxl for Excel support.")
+
+XLSX_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+# Small workbooks stay in memory; larger ones roll over to disk
+SPOOL_MAX_MEMORY = 1024 * 1024
+
+
+class ExportSheet(NamedTuple):
+    title: str
+    headers: Sequence[str]
+    rows: Iterable[Sequence]
+    widths: Optional[Sequence[int]] = None
+
+
+def _cell(worksheet, value):
+    """Value openpyxl can store; text is kept literal (never a formula) and stripped of control characters"""
+    if isinstance(value, str):
+        value = ILLEGAL_CHARACTERS_RE.sub('', value)
+        if value.startswith('='):
+            cell = WriteOnlyCell(worksheet, value)
+            cell.data_type = 's'
+            return cell
+        return value
+    if isinstance(value, datetime) and timezone.is_aware(value):
+        # Excel has no time zones
+        return timezone.make_naive(value)
+    return value
+
+
+def write_xlsx(sheets: Iterable[ExportSheet]):
+    """Write the sheets into a spooled temp file, rewound and ready to read"""
+    if not EXCEL_AVAILABLE:
+        raise RuntimeError('Excel support is not available on this server')
+
+    workbook = Workbook(write_only=True)
+    header_font = Font(bold=True)
+    row_count = 0
+    for sheet in sheets:
+        worksheet = workbook.create_sheet(title=sheet.title[:31])
+        for index, width in enumerate(sheet.widths or [], start=1):
+            worksheet.column_dimensions[get_column_letter(index)].width = width
+
+        header = []
+        for title in sheet.headers:
+            cell = WriteOnlyCell(worksheet, title)
+            cell.font = header_font
+            header.append(cell)
+        worksheet.append(header)
+
+        for row in sheet.rows:
+            worksheet.append([_cell(worksheet, value) for value in row])
+            row_count += 1
+
+    output = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_MEMORY, suffix='.xlsx')
+    workbook.save(output)
+    output.seek(0)
+    logger.debug("Wrote XLSX export with %s rows", row_count)
+    return output
+
+
+def xlsx_response(sheets: Iterable[ExportSheet], filename: str) -> FileResponse:
+    """Attachment response streaming the workbook from its spool file"""
+    return FileResponse(
+        write_xlsx(sheets),
+        as_attachment=True,
+        filename=filename,
+        content_type=XLSX_CONTENT_TYPE,
+    )
@@ -74,6 +74,11 @@ class ProjectTask(models.Model):
         return f"{self.task_name} ({self.project.project_name})"
 
     def save(self, *args, **kwargs):
+        self.apply_derived_fields()
+        super().save(*args, **kwargs)
+
+    def apply_derived_fields(self):
+        """Fields save() derives; bulk_create callers must call this themselves."""
         # Auto-calculate duration_days if start and end dates exist
         if self.start_date and self.end_date:
             self.duration_days = (self.end_date - self.start_date).days + 1  # inclusive
@@ -93,8 +98,6 @@ class ProjectTask(models.Model):
             self.is_completed = False
             self.status = "PL"
 
-        super().save(*args, **kwargs)
-
     @staticmethod
     def calculate_project_progress(project):
         """
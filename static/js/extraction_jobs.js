@@ -0,0 +1,50 @@
+/**
+ * Extraction Jobs
+ * Uploads such as BOQ files and file previews are parsed by background workers.
+ * The upload endpoints answer 202 with a status URL; these helpers poll it and
+ * resolve with the same payload the endpoint used to return synchronously.
+ */
+
+const EXTRACTION_POLL_INTERVAL = 1500;
+const EXTRACTION_MAX_WAIT = 10 * 60 * 1000;
+
+async function waitForExtractionJob(statusUrl, onProgress = null) {
+    const deadline = Date.now() + EXTRACTION_MAX_WAIT;
+
+    while (Date.now() < deadline) {
+        const response = await fetch(statusUrl, {
+            headers: { 'X-Requested-With': 'XMLHttpRequest' }
+        });
+        const payload = await response.json();
+        if (!payload.success) {
+            return { success: false, error: payload.error || 'Could not read the processing status' };
+        }
+
+        const job = payload.job;
+        if (onProgress) {
+            onProgress(job);
+        }
+        if (job.status === 'SUCCEEDED') {
+            return job.result;
+        }
+        if (job.status === 'FAILED') {
+            return { success: false, error: job.error || 'Processing failed' };
+        }
+
+        await new Promise(resolve => setTimeout(resolve, EXTRACTION_POLL_INTERVAL));
+    }
+
+    return { success: false, error: 'Processing is taking longer than expected. Please try again later.' };
+}
+
+/**
+ * Result of an upload request: the job's result when it was queued (202),
+ * otherwise the response body itself (e.g. a validation error).
+ */
+async function extractionResult(response, onProgress = null) {
+    const payload = await response.json();
+    if (response.status === 202 && payload.status_url) {
+        return waitForExtractionJob(payload.status_url, onProgress);
+    }
+    return payload;
+}
@@ -186,7 +186,8 @@ class FilePreviewManager {
                 body: formData
             });
 
-            const result = await response.json();
+            // The file is parsed by a background worker; wait for its result
+            const result = await extractionResult(response);
 
             if (result.success) {
                 this.extractedData = result.data;